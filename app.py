@@ -1,7 +1,45 @@
 import streamlit as st
-from state.state import AgentState, app
-from langchain_core.messages import HumanMessage, AIMessage
-import re
+from state.state import AgentState, feedback_turn_input, get_app, get_checkpointer, run_graph
+from state.checkpoint import new_thread_config
+from state.chat_render import ChatLog, user_message
+from state.async_graph import arun_graph
+from state.jobs import ACTIVE, FAILED, JobActive, job_runner_from_env
+from state import metrics
+import asyncio
+import logging
+import os
+
+# Render tokens into the assistant bubble as they arrive (STREAM_TOKENS=0 to disable).
+STREAM_TOKENS = os.getenv("STREAM_TOKENS", "1") != "0"
+# Run the async graph (topic check overlaps the first draft); ASYNC_GRAPH=0 uses the sync graph.
+ASYNC_GRAPH = os.getenv("ASYNC_GRAPH", "1") != "0"
+# Run graph turns on a background worker pool and poll their progress (BACKGROUND_JOBS=0 runs them inline).
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "1") != "0"
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+# Chat HTML kept per session, in KB; older messages are re-read from the checkpoint on request (0 = no limit).
+SESSION_MEMORY_BUDGET_KB = float(os.getenv("SESSION_MEMORY_BUDGET_KB", "64"))
+# The checkpoint holds the transcript and drafts; a session keeps only these fields of the state.
+SESSION_FIELDS = ('topic', 'tone', 'audience', 'current_step', 'feedback')
+# Prune, expire and vacuum the checkpoint DB every N seconds (0 disables).
+MAINTENANCE_INTERVAL = float(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS", "0"))
+
+@st.cache_resource
+def start_checkpoint_maintenance():
+    # cache_resource: one scheduler per server process, not one per rerun.
+    from state.maintenance import start_scheduler
+    return start_scheduler(get_checkpointer(), MAINTENANCE_INTERVAL)
+
+if MAINTENANCE_INTERVAL > 0:
+    start_checkpoint_maintenance()
+
+@st.cache_resource
+def start_observability():
+    # Once per server process: log format/level and the /metrics endpoint (METRICS_PORT, 0 = off).
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return metrics.serve_from_env()
+
+start_observability()
 
 # Custom CSS for ChatGPT-like look, category badges, glossy spinner, Bebas Neue font, and LinkedIn background logo
 st.markdown(
@@ -140,6 +178,11 @@ st.markdown(
         color: #222;
         border: 1px solid #a29bfe;
     }
+    .badge-variant {
+        background: transparent;
+        color: #aee1fb;
+        border: 1px solid #1e90ff;
+    }
     .floating-linkedin-logo {
         position: fixed;
         top: 32px;
@@ -218,8 +261,8 @@ st.markdown("""
 # After the CSS block, add spinner functions
 spinner_placeholder = st.empty()
 
-def show_glossy_spinner(text="Loading..."):
-    spinner_placeholder.markdown(f'''
+def show_glossy_spinner(text="Loading...", target=None):
+    (target or spinner_placeholder).markdown(f'''
         <div class="custom-glossy-spinner">
             <div>
                 <div class="glossy-loader"></div>
@@ -231,38 +274,102 @@ def show_glossy_spinner(text="Loading..."):
 def hide_glossy_spinner():
     spinner_placeholder.empty()
 
-if 'history' not in st.session_state:
-    st.session_state['history'] = []
+def show_streaming_bubble(text, target=None):
+    (target or spinner_placeholder).markdown(f"""
+        <div class='speaker-label assistant-label'>Assistant</div>
+        <div class='chat-bubble assistant-bubble'>{text}</div>
+    """, unsafe_allow_html=True)
+
+on_token = show_streaming_bubble if STREAM_TOKENS else None
+
+def drive_graph(graph_input, config, on_token=on_token, on_step=None):
+    if ASYNC_GRAPH:
+        return asyncio.run(arun_graph(graph_input, config, on_token, on_step))
+    return run_graph(graph_input, config, on_token, on_step)
+
+@st.cache_resource
+def get_job_runner():
+    # One worker pool per server process, shared by all sessions.
+    return job_runner_from_env(drive_graph)
+
+def keep_thread_state(values):
+    """Log the new messages of ``values`` and keep its ``SESSION_FIELDS``; the rest stays in the checkpoint."""
+    st.session_state['log'].sync(values['history'])
+    st.session_state['state'] = {key: values.get(key) for key in SESSION_FIELDS}
+    st.session_state['chat_mode'] = bool(values.get('drafts')) or values.get('current_step') not in [None, 'input_node']
+
+def load_thread_state(config):
+    """Take the session's state and chat log from the thread's checkpoint."""
+    values = get_app().get_state(config).values
+    if values:
+        keep_thread_state(values)
+    return bool(values)
+
+def active_job(config):
+    """The thread's queued or running job, if any (always ``None`` with BACKGROUND_JOBS=0)."""
+    return get_job_runner().active(config['configurable']['thread_id']) if BACKGROUND_JOBS else None
+
+def start_turn(graph_input, config, spinner_text):
+    """Run one graph turn: queued on the worker pool, or inline with BACKGROUND_JOBS=0."""
+    if BACKGROUND_JOBS:
+        try:
+            st.session_state['job_id'] = get_job_runner().submit(graph_input, config)
+        except JobActive as busy:
+            st.session_state['job_id'] = busy.job_id
+            st.session_state['job_notice'] = str(busy)
+        return
+    show_glossy_spinner(spinner_text)
+    response = drive_graph(graph_input, config)
+    hide_glossy_spinner()
+    keep_thread_state(response)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress():
+    # Reruns on its own every JOB_POLL_SECONDS; the rest of the page only reruns once the job ends.
+    job = get_job_runner().store.get(st.session_state['job_id'])
+    if job is not None and job['status'] in ACTIVE:
+        progress = st.empty()
+        if STREAM_TOKENS and job['partial']:
+            show_streaming_bubble(job['partial'], target=progress)
+        else:
+            show_glossy_spinner(job['step'] or "Working on your post...", target=progress)
+        return
+    st.session_state.pop('job_id', None)
+    if job is not None and job['status'] == FAILED:
+        st.session_state['job_error'] = job['error']
+    load_thread_state(st.session_state['thread_config'])
+    st.rerun()
+
+if 'log' not in st.session_state:
+    st.session_state['log'] = ChatLog(int(SESSION_MEMORY_BUDGET_KB * 1024))
 if 'state' not in st.session_state:
-    st.session_state['state'] = AgentState(
-        user_id="",
-        topic="",
-        tone=[],
-        audience=[],
-        drafts=[],
-        best_post=None,
-        feedback=None,
-        history=[],
-        current_step=None,
-        validation=None,
-        on="",
-        analysis=""
-    )
+    st.session_state['state'] = {'topic': "", 'tone': [], 'audience': [], 'current_step': None, 'feedback': None}
 if 'chat_mode' not in st.session_state:
     st.session_state['chat_mode'] = False
 
-config = {"configurable": {"thread_id": 1}}
+# Each browser session writes checkpoints into its own graph thread. The thread
+# id is kept in the URL, so a refresh or reconnect resumes the conversation and
+# picks up a turn that is still running.
+if 'thread_config' not in st.session_state:
+    st.session_state['thread_config'] = new_thread_config(st.query_params.get("thread"))
+    st.query_params["thread"] = st.session_state['thread_config']['configurable']['thread_id']
+    if load_thread_state(st.session_state['thread_config']) and (job := active_job(st.session_state['thread_config'])):
+        st.session_state['job_id'] = job['id']
+config = st.session_state['thread_config']
 
 # --- Process pending feedback if present ---
+if 'pending_feedback' in st.session_state and (busy := active_job(config)) is not None:
+    # A turn started from another tab is still running: leave the checkpoint alone.
+    st.session_state.pop('pending_feedback')
+    st.session_state['job_id'] = busy['id']
+    st.session_state['job_notice'] = str(JobActive(busy['id']))
 if 'pending_feedback' in st.session_state:
     user_input = st.session_state.pop('pending_feedback')
-    st.session_state['history'].append(HumanMessage(content=user_input))
-    st.session_state['state']['history'] = st.session_state['history']
+    message = user_message(user_input)
+    st.session_state['log'].append(message)
     if st.session_state['state']['current_step'] in ['Collecting feedback from human', 'post_validation']:
         st.session_state['state']['feedback'] = user_input
-    response = app.invoke(st.session_state['state'], config)
-    st.session_state['state'] = response
-    st.session_state['history'] = response['history']
+    start_turn(feedback_turn_input(st.session_state['state'], config, new_messages=[message]), config, "Processing feedback...")
 
 # --- FAQ Tab for Viral LinkedIn Posts & Hacks ---
 faq_qas = [
@@ -312,46 +419,20 @@ with selected_tab[0]:
     # Scrollable conversation history
     st.markdown('<div class="scrollable-history">', unsafe_allow_html=True)
 
-    def get_message_category(msg):
-        if isinstance(msg, AIMessage):
-            if re.match(r"^Generated Post: ", msg.content):
-                return 'original'
-            elif re.match(r"^Generated post based on feedback:", msg.content):
-                return 'feedback'
-            elif re.match(r"^Post Validation Node:", msg.content):
-                return 'validation'
-            elif re.match(r"^Positive feedback received:", msg.content) or re.match(r"^Negative feedback received:", msg.content):
-                return 'feedback-user'
-        return None
-
-    def get_badge_html(category):
-        if category == 'original':
-            return '<span class="badge badge-original">Original Post</span>'
-        elif category == 'feedback':
-            return '<span class="badge badge-feedback">Generated Post Based on Feedback</span>'
-        elif category == 'validation':
-            return '<span class="badge badge-validation">Validation</span>'
-        elif category == 'feedback-user':
-            return '<span class="badge badge-feedback-user">User Feedback</span>'
-        return ''
-
-    for msg in st.session_state['history']:
-        badge_html = ''
-        category = get_message_category(msg)
-        if category:
-            badge_html = get_badge_html(category)
-        if isinstance(msg, HumanMessage):
-            st.markdown(f"""
-                <div class='speaker-label user-label'>User</div>
-                <div class='chat-bubble user-bubble'>{msg.content}</div>
-            """, unsafe_allow_html=True)
-        elif isinstance(msg, AIMessage):
-            st.markdown(f"""
-                <div class='speaker-label assistant-label'>Assistant</div>
-                <div class='chat-bubble assistant-bubble'>{badge_html}{msg.content}</div>
-            """, unsafe_allow_html=True)
+    # Messages are rendered once, when logged; what fell out of the session's budget is read back from the checkpoint.
+    log = st.session_state['log']
+    if log.evicted and st.toggle(f"Show {log.evicted} earlier messages", key="show_earlier"):
+        st.markdown(log.earlier_html(get_app().get_state(config).values.get('history') or []), unsafe_allow_html=True)
+    st.markdown(log.html, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    if 'job_error' in st.session_state:
+        st.error(f"Something went wrong: {st.session_state.pop('job_error')}")
+    if 'job_notice' in st.session_state:
+        st.warning(st.session_state.pop('job_notice'))
+    if 'job_id' in st.session_state:
+        job_progress()
+
     # Hybrid UI: Dropdowns at start, chat for feedback/review
     if (not st.session_state['chat_mode']) and st.session_state['state']['current_step'] in [None, 'input_node']:
         topic = st.text_input("Enter your LinkedIn post topic:", value=st.session_state['state']['topic'] if st.session_state['state']['topic'] else "")
@@ -365,19 +446,30 @@ with selected_tab[0]:
         )
         tone = st.multiselect("Select tone(s) for your post (up to 3):", tone_options, default=st.session_state['state']['tone'] if st.session_state['state']['tone'] else [], max_selections=3)
         if st.button("Generate LinkedIn Post"):
-            show_glossy_spinner("Generating your LinkedIn post...")
             st.session_state['state']['topic'] = topic
             st.session_state['state']['audience'] = audience
             st.session_state['state']['tone'] = tone
-            st.session_state['history'].append(HumanMessage(content=f"Topic: {topic}, Audience: {', '.join(audience)}, Tone: {', '.join(tone)}"))
-            st.session_state['state']['history'] = st.session_state['history']
-            response = app.invoke(st.session_state['state'], config)
-            st.session_state['state'] = response
-            st.session_state['history'] = response['history']
-            hide_glossy_spinner()
+            message = user_message(f"Topic: {topic}, Audience: {', '.join(audience)}, Tone: {', '.join(tone)}")
+            st.session_state['log'].append(message)
+            # ``history`` and ``drafts`` are append-only: only the new message goes in.
+            graph_input = AgentState(
+                user_id="",
+                topic=topic,
+                tone=tone,
+                audience=audience,
+                drafts=[],
+                best_post=None,
+                feedback=None,
+                history=[message],
+                current_step=None,
+                validation=None,
+                on="",
+                analysis=""
+            )
+            start_turn(graph_input, config, "Generating your LinkedIn post...")
             st.session_state['chat_mode'] = True
             st.rerun()
-    else:
+    elif 'job_id' not in st.session_state:
         st.markdown('<div class="input-container">', unsafe_allow_html=True)
         with st.form(key="chat_input_form", clear_on_submit=True):
             user_input = st.text_input("", placeholder="Type your message and press Enter...", key="user_input_box")
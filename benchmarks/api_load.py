@@ -0,0 +1,92 @@
+"""Load test of the HTTP API (``state.api``): concurrent sessions, each one a
+new thread followed by feedback turns, on ``FakeChatModel``.
+
+By default the app runs in-process through ``httpx.ASGITransport``; ``--url``
+points the same load at a running server instead, e.g. one started with
+several workers on a shared checkpoint DB:
+
+    LLM_BACKEND=fake uvicorn state.api:app --workers 4 --port 8000
+    python benchmarks/api_load.py --url http://127.0.0.1:8000 --sessions 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(tempfile.mkdtemp(), "api_load.sqlite"))
+
+import httpx  # noqa: E402
+
+from graph_bench import percentile  # noqa: E402
+
+FEEDBACK = ["Make the hook shorter.", "Add a question at the end.", "Use fewer hashtags."]
+
+
+async def session(client, index: int, turns: int, stream: bool, timings: dict):
+    async def timed(name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        timings[name].append(time.perf_counter() - start)
+        return response
+
+    suffix = "?stream=1" if stream else ""
+    thread_id = f"load-{os.getpid()}-{index}"
+    await timed("create", "POST", f"/threads{suffix}", json={
+        "topic": f"Lessons from project #{index}", "tone": ["professional"], "audience": ["engineers"],
+        "thread_id": thread_id,
+    })
+    for turn in range(turns):
+        await timed("feedback", "POST", f"/threads/{thread_id}/feedback{suffix}",
+                    json={"feedback": FEEDBACK[turn % len(FEEDBACK)]})
+    await timed("get", "GET", f"/threads/{thread_id}")
+
+
+async def run(args) -> tuple:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        from state.api import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=120)
+    timings = defaultdict(list)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(index):
+        async with semaphore:
+            await session(client, index, args.turns, args.stream, timings)
+
+    async with client:
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+    return timings, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="running API server; default is in-process")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=2, help="feedback turns per session")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="use the SSE variants of the POST endpoints")
+    args = parser.parse_args()
+
+    timings, elapsed = asyncio.run(run(args))
+    requests = sum(len(values) for values in timings.values())
+    print(f"{args.sessions} sessions, {requests} requests in {elapsed:.2f}s: "
+          f"{requests / elapsed:.1f} req/s, {args.sessions / elapsed:.1f} sessions/s")
+    print(f"{'':10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, values in timings.items():
+        print(f"{name:10} {len(values):>6} {percentile(values, 50) * 1000:>8.1f} "
+              f"{percentile(values, 95) * 1000:>8.1f} {percentile(values, 99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Load test: many simulated sessions driving ``app.invoke`` in parallel.
+
+The ``cached_*_llm`` helpers are replaced by stubs that sleep for
+``--llm-latency`` seconds, so the numbers reflect graph and checkpoint
+overhead rather than provider speed.  Each session gets its own thread ID and
+the run is repeated with the old single-connection ``SqliteSaver`` for
+comparison.
+
+    python benchmarks/checkpoint_load.py --sessions 48 --concurrency 1 8 32
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langgraph.checkpoint.sqlite import SqliteSaver  # noqa: E402
+
+import state.state as graph_module  # noqa: E402
+from state.checkpoint import PooledSqliteSaver, SqliteConnectionPool, new_thread_config  # noqa: E402
+
+
+def stub_llm_helpers(latency):
+    def delayed(value):
+        def helper(*args, **kwargs):
+            time.sleep(latency)
+            return value
+        return helper
+
+    graph_module.cached_validator_llm = delayed("Valid")
+    graph_module.cached_generate_post_llm = delayed("A benchmark post. #one #two #three")
+    graph_module.cached_post_validation_llm = delayed("Valid")
+    graph_module.cached_feedback_sentiment_llm = delayed("positive")
+    graph_module.cached_collect_feedback_llm = delayed("An improved benchmark post.")
+
+
+def initial_state(i):
+    return graph_module.AgentState(
+        user_id="", topic=f"Topic {i}", tone=["professional"], audience=["developers"],
+        drafts=[], best_post=None, feedback="looks good", history=[],
+        current_step=None, validation=None, on="", analysis="",
+    )
+
+
+def run(saver, sessions, concurrency):
+    app = graph_module.get_graph().compile(checkpointer=saver)
+
+    def one(i):
+        app.invoke(initial_state(i), new_thread_config())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(sessions)))
+    return sessions / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    stub_llm_helpers(args.llm_latency)
+    print(f"{'concurrency':>11} {'shared conn (sess/s)':>21} {'pooled (sess/s)':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for level in args.concurrency:
+            shared_db = os.path.join(tmp, f"shared-{level}.sqlite")
+            shared = SqliteSaver(sqlite3.connect(shared_db, check_same_thread=False))
+            pooled = PooledSqliteSaver(SqliteConnectionPool(
+                os.path.join(tmp, f"pooled-{level}.sqlite"), size=args.pool_size))
+            baseline = run(shared, args.sessions, level)
+            tuned = run(pooled, args.sessions, level)
+            pooled.pool.close()
+            print(f"{level:>11} {baseline:>21.1f} {tuned:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Upstream calls and errors under a burst, with and without the LLM gateway.
+
+A thread pool fires ``--requests`` generation requests at once, drawn from
+only ``--topics`` distinct topics (many sessions submitting the same thing).
+The fake provider enforces ``--quota`` calls per second and answers anything
+beyond that with a 429.  The burst runs three times: straight to the provider,
+with single-flight only, and with single-flight, a token bucket just under the
+quota and jittered retries.
+
+    python benchmarks/gateway_bench.py --requests 200 --topics 10 --quota 20
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from pydantic import PrivateAttr  # noqa: E402
+
+import state.state as core  # noqa: E402
+from graph_bench import percentile  # noqa: E402
+from state.cache import MemoryResponseCache  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+from state.gateway import LLMGateway  # noqa: E402
+
+
+class CountingFakeChatModel(FakeChatModel):
+    _attempts: itertools.count = PrivateAttr(default_factory=itertools.count)
+
+    def _maybe_fail(self):
+        next(self._attempts)
+        super()._maybe_fail()
+
+    @property
+    def attempts(self) -> int:
+        return next(self._attempts)
+
+
+def burst(gateway, args) -> dict:
+    llm = CountingFakeChatModel(latency=args.latency, quota_per_second=args.quota)
+    core.set_llm(llm)
+    core.set_response_cache(MemoryResponseCache())
+    core.set_gateway(gateway)
+    prompts = [core.generate_post_prompt(f"Topic #{i % args.topics}", "['bold']", "founders")
+               for i in range(args.requests)]
+    latencies, errors = [], 0
+
+    def one(prompt):
+        start = time.perf_counter()
+        try:
+            core.cached_llm_call(prompt, task="generate")
+            return time.perf_counter() - start, False
+        except Exception:
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for elapsed, failed in pool.map(one, prompts):
+            latencies.append(elapsed)
+            errors += failed
+    return {"upstream": llm.attempts, "errors": errors, "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95), "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=10, help="distinct prompts in the burst")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--quota", type=int, default=20, help="provider calls per second before 429s")
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    runs = [
+        ("direct", LLMGateway(coalesce=False, max_retries=0)),
+        ("single-flight", LLMGateway(max_retries=0)),
+        ("single-flight + limits", LLMGateway(rpm=args.quota * 60 * 0.9, max_retries=5,
+                                              base_delay=0.1, max_delay=2.0)),
+    ]
+    print(f"{args.requests} requests, {args.topics} distinct, quota {args.quota}/s")
+    print(f"{'':24} {'upstream':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8}")
+    for name, gateway in runs:
+        r = burst(gateway, args)
+        print(f"{name:24} {r['upstream']:>8} {r['errors']:>7} {r['p50'] * 1000:>8.1f} "
+              f"{r['p95'] * 1000:>8.1f} {r['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
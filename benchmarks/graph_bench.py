@@ -0,0 +1,155 @@
+"""Offline benchmark of the compiled graph on ``FakeChatModel``.
+
+Drives validate -> generate -> validate -> feedback -> rewrite for every
+iteration on a fresh thread. It reports per-node latency, checkpoint write
+time and size, and end-to-end p50/p99.  No network access is needed, so it
+can run in CI; ``--json`` writes the numbers for regression tracking.
+
+    python benchmarks/graph_bench.py --iterations 50 --latency 0.01 --json bench.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import state.state as core  # noqa: E402
+from state.cache import ResponseCache  # noqa: E402
+from state.checkpoint import PooledSqliteSaver, SqliteConnectionPool, new_thread_config  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+    }
+
+
+class MeasuredSaver(PooledSqliteSaver):
+    """Records the duration and serialized size of every checkpoint write."""
+
+    def __init__(self, pool, serde=None):
+        super().__init__(pool, serde=serde)
+        self.put_seconds, self.put_bytes = [], []
+        self.write_seconds, self.write_bytes = [], []
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        start = time.perf_counter()
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self.put_seconds.append(time.perf_counter() - start)
+        self.put_bytes.append(len(self.serde.dumps_typed(checkpoint)[1]))
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        start = time.perf_counter()
+        super().put_writes(config, writes, task_id, task_path)
+        self.write_seconds.append(time.perf_counter() - start)
+        self.write_bytes.append(sum(len(self.serde.dumps_typed(value)[1]) for _, value in writes))
+
+
+def timed_nodes(timings):
+    def wrap(name, node):
+        def timed(state):
+            start = time.perf_counter()
+            try:
+                return node(state)
+            finally:
+                timings[name].append(time.perf_counter() - start)
+        return timed
+    return {name: wrap(name, node) for name, node in core.GRAPH_NODES.items()}
+
+
+def run(args):
+    core.set_llm(FakeChatModel(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, failure_rate=args.failure_rate,
+    ))
+    core.set_response_cache(ResponseCache())
+    timings = defaultdict(list)
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = MeasuredSaver(SqliteConnectionPool(os.path.join(tmp, "bench.sqlite")))
+        graph_app = core.build_graph(timed_nodes(timings)).compile(
+            checkpointer=saver, interrupt_before=core.INTERRUPT_BEFORE)
+        end_to_end, errors = [], 0
+        for i in range(args.iterations):
+            config = new_thread_config()
+            state = core.AgentState(
+                user_id="", topic=f"Benchmark topic {i}", tone=["professional"], audience=["developers"],
+                drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+                validation=None, on="", analysis="",
+            )
+            start = time.perf_counter()
+            try:
+                state = graph_app.invoke(state, config)
+                for _ in range(args.feedback_turns):
+                    feedback = "Make the hook shorter."
+                    state['history'].append(HumanMessage(content=feedback))
+                    state['feedback'] = feedback
+                    state = graph_app.invoke(core.feedback_turn_input(state, config, graph_app), config)
+            except Exception:
+                errors += 1
+                continue
+            end_to_end.append(time.perf_counter() - start)
+        saver.pool.close()
+    return {
+        "iterations": args.iterations,
+        "errors": errors,
+        "end_to_end_seconds": summarize(end_to_end),
+        "node_seconds": {name: summarize(values) for name, values in timings.items()},
+        "checkpoint_put_seconds": summarize(saver.put_seconds),
+        "checkpoint_put_bytes": summarize(saver.put_bytes),
+        "checkpoint_writes_seconds": summarize(saver.write_seconds),
+        "checkpoint_writes_bytes": summarize(saver.write_bytes),
+    }
+
+
+def print_report(report):
+    ms = lambda s: f"{s * 1000:8.2f}"  # noqa: E731
+    print(f"{report['iterations']} iterations, {report['errors']} errors")
+    print(f"{'':28} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, stats in report["node_seconds"].items():
+        print(f"{name:28} {ms(stats['mean'])} {ms(stats['p50'])} {ms(stats['p99'])}")
+    for label in ("checkpoint_put_seconds", "checkpoint_writes_seconds", "end_to_end_seconds"):
+        stats = report[label]
+        print(f"{label:28} {ms(stats['mean'])} {ms(stats['p50'])} {ms(stats['p99'])}")
+    for label in ("checkpoint_put_bytes", "checkpoint_writes_bytes"):
+        stats = report[label]
+        print(f"{label:28} mean {stats['mean']:.0f} B, p99 {stats['p99']:.0f} B over {stats['count']} writes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--feedback-turns", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake LLM seconds per call")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Checkpoint bytes written per feedback turn as a conversation grows.
+
+The same turns run through two graphs:
+
+* ``delta``: the app's saver, with ``history`` and ``drafts`` as append-only
+  delta channels, so each turn writes only its new messages;
+* ``baseline``: a plain ``SqliteSaver`` with the default serializer, with both
+  fields as full-value channels, so every checkpoint re-serializes them (how
+  state was stored before the delta channels).
+
+Bytes are what each turn added to the ``checkpoints`` and ``writes`` tables.
+
+    python benchmarks/history_growth.py --turns 60
+    CHECKPOINT_COMPRESS_MIN_BYTES=512 python benchmarks/history_growth.py
+"""
+import argparse
+import operator
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import closing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.channels.binop import BinaryOperatorAggregate  # noqa: E402
+from langgraph.checkpoint.sqlite import SqliteSaver  # noqa: E402
+
+import state.state as core  # noqa: E402
+from state.cache import ResponseCache  # noqa: E402
+from state.checkpoint import (  # noqa: E402
+    APPEND_FIELDS,
+    PooledSqliteSaver,
+    SqliteConnectionPool,
+    new_thread_config,
+    serde_from_env,
+)
+from state.fake_llm import FakeChatModel  # noqa: E402
+
+
+def stored_bytes(database: str) -> int:
+    with closing(sqlite3.connect(database)) as conn:
+        checkpoints = conn.execute("SELECT SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints").fetchone()[0]
+        writes = conn.execute("SELECT SUM(LENGTH(value)) FROM writes").fetchone()[0]
+    return (checkpoints or 0) + (writes or 0)
+
+
+def baseline_app(database: str):
+    """The graph with full-value ``history``/``drafts`` on a plain ``SqliteSaver``."""
+    saver = SqliteSaver(sqlite3.connect(database, check_same_thread=False))
+    graph_app = core.get_graph().compile(checkpointer=saver, interrupt_before=core.INTERRUPT_BEFORE)
+    for field in APPEND_FIELDS:
+        channel = BinaryOperatorAggregate(list, operator.add)
+        channel.key = field
+        graph_app.channels[field] = channel
+    return graph_app
+
+
+class Session:
+    """One conversation on one graph, tracking the bytes each turn stores."""
+
+    def __init__(self, graph_app, database: str):
+        self.graph_app = graph_app
+        self.database = database
+        self.config = new_thread_config()
+        self.state = graph_app.invoke(core.AgentState(
+            user_id="", topic="Growing a remote team", tone=["professional"], audience=["managers"],
+            drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+            validation=None, on="", analysis="",
+        ), self.config)
+        self.stored = stored_bytes(database)
+
+    def turn(self, feedback: str) -> int:
+        """Run one feedback turn; return the bytes it stored."""
+        message = HumanMessage(content=feedback)
+        self.state['feedback'] = feedback
+        graph_input = core.feedback_turn_input(self.state, self.config, self.graph_app, new_messages=[message])
+        self.state = self.graph_app.invoke(graph_input, self.config)
+        before, self.stored = self.stored, stored_bytes(self.database)
+        return self.stored - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--every", type=int, default=5, help="print every Nth turn")
+    args = parser.parse_args()
+
+    core.set_llm(FakeChatModel())
+    core.set_response_cache(ResponseCache())
+    with tempfile.TemporaryDirectory() as tmp:
+        delta_db, baseline_db = os.path.join(tmp, "delta.sqlite"), os.path.join(tmp, "baseline.sqlite")
+        saver = PooledSqliteSaver(SqliteConnectionPool(delta_db), serde=serde_from_env())
+        delta = Session(core.get_graph().compile(checkpointer=saver, interrupt_before=core.INTERRUPT_BEFORE),
+                        delta_db)
+        baseline = Session(baseline_app(baseline_db), baseline_db)
+
+        print(f"{'turn':>5} {'messages':>9} {'delta B':>10} {'baseline B':>11}")
+        totals = [0, 0]
+        for turn in range(1, args.turns + 1):
+            feedback = f"Change #{turn}: make the hook shorter."
+            written = delta.turn(feedback), baseline.turn(feedback)
+            totals = [total + n for total, n in zip(totals, written)]
+            if turn == 1 or turn % args.every == 0:
+                print(f"{turn:>5} {len(delta.state['history']):>9} {written[0]:>10} {written[1]:>11}")
+        print(f"total {'':>9} {totals[0]:>10} {totals[1]:>11}")
+        saver.pool.close()
+        baseline.graph_app.checkpointer.conn.close()
+
+
+if __name__ == "__main__":
+    main()
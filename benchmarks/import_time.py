@@ -0,0 +1,70 @@
+"""Cold-start cost of importing the app's modules.
+
+Each module is imported in a fresh interpreter. The script reports the
+median wall time and the heaviest imports from ``python -X importtime``.
+``--budget-ms`` exits non-zero when a module's median exceeds it, so CI can
+catch a heavy dependency creeping back into import time.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules state.state --runs 10 --budget-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wall_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(module: str, top: int) -> list:
+    """``(cumulative µs, name)`` of the modules imported directly by ``module``."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    children, pending = [], []
+    # Lines come children-first; each nesting level indents the name by two spaces.
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pending.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                children = pending
+            pending = []
+    return sorted(children, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["state.state", "state.async_graph", "state.batch"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports listed per module")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    over_budget = False
+    print(f"python {sys.version.split()[0]}")
+    for module in args.modules:
+        median_ms = statistics.median(wall_time(module) for _ in range(args.runs)) * 1000
+        print(f"\nimport {module}: {median_ms:.0f} ms median of {args.runs}")
+        for us, name in heaviest_imports(module, args.top):
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        if args.budget_ms is not None and median_ms > args.budget_ms:
+            print(f"  over budget ({args.budget_ms:.0f} ms)")
+            over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Compare the multi-call and fused pipelines: LLM calls and latency per completed post.
+
+Each topic is driven through a first draft, one change request and one
+approval.  The response cache is disabled so every call reaches the model.  Pass
+``--fake-latency`` to run offline against ``FakeChatModel``.
+
+    python benchmarks/pipeline_modes.py --topics "AI in hiring" "Remote onboarding"
+    python benchmarks/pipeline_modes.py --fake-latency 0.5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+
+import state.state as core  # noqa: E402
+from state.cache import ResponseCache  # noqa: E402
+from state.checkpoint import new_thread_config  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+
+
+class CountingLLM:
+    """Wraps the chat model and counts every request sent to it."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.model = llm.model
+        self.calls = 0
+
+    def invoke(self, *args, **kwargs):
+        self.calls += 1
+        return self.llm.invoke(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        self.calls += 1
+        yield from self.llm.stream(*args, **kwargs)
+
+    def with_structured_output(self, schema):
+        structured = self.llm.with_structured_output(schema)
+        counter = self
+
+        class Structured:
+            def invoke(self, *args, **kwargs):
+                counter.calls += 1
+                return structured.invoke(*args, **kwargs)
+
+        return Structured()
+
+
+def drive_post(graph_app, topic):
+    config = new_thread_config()
+    state = core.AgentState(
+        user_id="", topic=topic, tone=["professional"], audience=["professionals"],
+        drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+        validation=None, on="", analysis="",
+    )
+    state = graph_app.invoke(state, config)
+    for feedback in ("Make the hook shorter and punchier.", "Looks great, no changes needed."):
+        if not state.get('drafts'):
+            break
+        state['history'].append(HumanMessage(content=feedback))
+        state['feedback'] = feedback
+        state = graph_app.invoke(core.feedback_turn_input(state, config, graph_app), config)
+    return state
+
+
+def measure(name, graph, topics, counter):
+    graph_app = graph.compile(checkpointer=InMemorySaver(), interrupt_before=core.INTERRUPT_BEFORE)
+    calls, latencies = [], []
+    for topic in topics:
+        before = counter.calls
+        start = time.perf_counter()
+        drive_post(graph_app, topic)
+        latencies.append(time.perf_counter() - start)
+        calls.append(counter.calls - before)
+    print(f"{name:>6}: {statistics.mean(calls):.1f} LLM calls/post, "
+          f"{statistics.mean(latencies):.2f}s mean, {max(latencies):.2f}s max per post")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", nargs="+", default=[
+        "AI in hiring", "Lessons from my first year as a manager", "Why documentation matters",
+    ])
+    parser.add_argument("--fake-latency", type=float, default=None,
+                        help="use FakeChatModel with this per-call latency instead of the live model")
+    args = parser.parse_args()
+
+    if args.fake_latency is not None:
+        core.set_llm(FakeChatModel(latency=args.fake_latency))
+    core.set_response_cache(ResponseCache())
+    counter = CountingLLM(core.get_llm())
+    core.set_llm(counter)
+    measure("multi", core.build_graph(core.GRAPH_NODES), args.topics, counter)
+    measure("fused", core.build_fused_graph(), args.topics, counter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Prompt tokens served from the provider's prefix cache, per prompt template.
+
+Drives ``--topics`` distinct topics through a first draft and one change
+request each, with the response cache off so every call reaches the model,
+then prints what ``state.metrics`` recorded per template: calls, mean prompt
+tokens, the share of prompt tokens that were cached, and prefix-cache hits.
+Offline it runs on ``FakeChatModel`` with a simulated block prefix cache
+(``--block`` words per block, about what providers use in tokens).
+
+    python benchmarks/prompt_cache_bench.py --topics 20
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+
+import state.state as core  # noqa: E402
+from state import metrics, prompts  # noqa: E402
+from state.cache import ResponseCache  # noqa: E402
+from state.checkpoint import new_thread_config  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+
+
+def drive(graph_app, topic):
+    config = new_thread_config()
+    state = graph_app.invoke(core.AgentState(
+        user_id="", topic=topic, tone=["professional"], audience=["engineers"],
+        drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+        validation=None, on="", analysis="",
+    ), config)
+    if state.get('drafts'):
+        feedback = "Could you make the hook a little shorter?"
+        state['history'].append(HumanMessage(content=feedback))
+        state['feedback'] = feedback
+        graph_app.invoke(core.feedback_turn_input(state, config, graph_app), config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--block", type=int, default=16, help="words per simulated cache block")
+    args = parser.parse_args()
+
+    core.set_llm(FakeChatModel(prefix_cache_words=args.block))
+    core.set_response_cache(ResponseCache())
+    graph_app = core.get_graph().compile(checkpointer=InMemorySaver(), interrupt_before=core.INTERRUPT_BEFORE)
+    for i in range(args.topics):
+        drive(graph_app, f"Lessons from shipping project number {i}")
+
+    print(f"{'template':18} {'calls':>6} {'prompt tokens':>14} {'prefix hits':>12}")
+    for name in prompts.TEMPLATES:
+        hits = metrics.LLM_PREFIX_CACHE.value(prompt=name, result="hit")
+        calls = hits + metrics.LLM_PREFIX_CACHE.value(prompt=name, result="miss")
+        if calls:
+            count, total = metrics.LLM_PROMPT_TOKENS.value(prompt=name)
+            print(f"{name:18} {calls:>6.0f} {total / count:>14.0f} {hits / calls:>12.0%}")
+    print(f"\n{'task':18} {'prompt tokens':>21} {'cached':>12}")
+    for task in ("validate", "generate", "sentiment", "rewrite"):
+        prompt = metrics.LLM_TOKENS.value(task=task, kind="prompt")
+        if prompt:
+            cached = metrics.LLM_TOKENS.value(task=task, kind="cached_prompt")
+            print(f"{task:18} {prompt:>21.0f} {cached / prompt:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
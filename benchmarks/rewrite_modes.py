@@ -0,0 +1,115 @@
+"""Compare full and edit-based rewrites: model output and stored draft size per feedback turn.
+
+Each topic gets a first draft followed by ``--turns`` small change requests.
+For every mode the script reports the rewrite latency, the characters the
+model returned per turn (output tokens are roughly a quarter of that, and they
+dominate rewrite latency on a real provider) and the bytes the rewritten
+versions add to ``drafts``.  The response cache is disabled so every call
+reaches the model.  Pass ``--fake-latency`` to run offline against
+``FakeChatModel``, whose timing does not depend on the answer size.  Both
+the sync graph and the async one (``arun_graph``, what the app and the API
+run by default) are measured.
+
+    python benchmarks/rewrite_modes.py --turns 3
+    python benchmarks/rewrite_modes.py --fake-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(tempfile.mkdtemp(), "rewrite_modes.sqlite"))
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+
+import state.state as core  # noqa: E402
+from state.async_graph import arun_graph  # noqa: E402
+from state.cache import ResponseCache  # noqa: E402
+from state.checkpoint import new_thread_config  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+
+FEEDBACK = [
+    "Make the hook shorter.",
+    "Remove the last hashtag.",
+    "Add a question at the end.",
+    "Replace 'leverage' with a plainer word.",
+]
+
+
+class RecordingCache(ResponseCache):
+    """Caches nothing; remembers the size of every model answer."""
+
+    def __init__(self):
+        super().__init__()
+        self.sizes = []
+
+    def set(self, key, value, ttl=None):
+        self.sizes.append(len(value if isinstance(value, str) else json.dumps(value)))
+
+
+def runners(graph):
+    """``(run, graph_app)``: how a turn is driven, and the app ``feedback_turn_input`` prepares threads with."""
+    if graph == "sync":
+        graph_app = core.get_graph().compile(checkpointer=InMemorySaver(), interrupt_before=core.INTERRUPT_BEFORE)
+        return graph_app.invoke, graph_app
+    # arun_graph checkpoints to CHECKPOINT_DB, where get_app() reads and prepares threads.
+    loop = asyncio.new_event_loop()
+    return (lambda graph_input, config: loop.run_until_complete(arun_graph(graph_input, config))), core.get_app()
+
+
+def measure(mode, graph, topics, turns, cache):
+    core.REWRITE_MODE = mode
+    run, graph_app = runners(graph)
+    latencies, answers, stored = [], [], []
+    for topic in topics:
+        config = new_thread_config()
+        state = run(core.AgentState(
+            user_id="", topic=topic, tone=["professional"], audience=["professionals"],
+            drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+            validation=None, on="", analysis="",
+        ), config)
+        first_drafts = len(state.get('drafts') or [])
+        for turn in range(turns):
+            if not state.get('drafts'):
+                break
+            feedback = FEEDBACK[turn % len(FEEDBACK)]
+            state['history'].append(HumanMessage(content=feedback))
+            state['feedback'] = feedback
+            del cache.sizes[:]
+            start = time.perf_counter()
+            state = run(core.feedback_turn_input(state, config, graph_app), config)
+            latencies.append(time.perf_counter() - start)
+            answers.append(sum(cache.sizes))
+        stored.extend(len(version.encode("utf-8")) for version in (state.get('drafts') or [])[first_drafts:])
+    print(f"{mode:>5} {graph:>5}: {statistics.mean(latencies) * 1000:8.1f} ms/turn, "
+          f"{statistics.mean(answers):7.0f} chars returned/turn, "
+          f"{statistics.mean(stored) if stored else 0:7.0f} bytes stored/version")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", nargs="+", default=[
+        "AI in hiring", "Lessons from my first year as a manager", "Why documentation matters",
+    ])
+    parser.add_argument("--turns", type=int, default=3, help="change requests per topic")
+    parser.add_argument("--fake-latency", type=float, default=None,
+                        help="use FakeChatModel with this per-call latency instead of the live model")
+    args = parser.parse_args()
+
+    if args.fake_latency is not None:
+        core.set_llm(FakeChatModel(latency=args.fake_latency))
+    cache = RecordingCache()
+    core.set_response_cache(cache)
+    for mode in ("full", "edit"):
+        for graph in ("sync", "async"):
+            measure(mode, graph, args.topics, args.turns, cache)
+
+
+if __name__ == "__main__":
+    main()
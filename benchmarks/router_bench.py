@@ -0,0 +1,69 @@
+"""Tail latency and errors with a single model vs. the failover/hedging router.
+
+The primary ``FakeChatModel`` is fast but has occasional slow calls and
+injected failures, and a slower backup is always healthy.  The same call
+sequence runs against the primary alone, against the router with failover
+only, and against the router with hedging.
+
+    python benchmarks/router_bench.py --calls 300 --slow-rate 0.03 --failure-rate 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from graph_bench import percentile  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+from state.router import LLMRouter, Route  # noqa: E402
+
+
+def models(args):
+    primary = FakeChatModel(model="primary", latency=args.latency, slow_rate=args.slow_rate,
+                            slow_latency=args.slow_latency, failure_rate=args.failure_rate, seed=1)
+    backup = FakeChatModel(model="backup", latency=args.backup_latency, seed=2)
+    return primary, backup
+
+
+def drive(invoke, calls):
+    latencies, errors = [], 0
+    for i in range(calls):
+        start = time.perf_counter()
+        try:
+            invoke([HumanMessage(content=f"Write post #{i}")])
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return {pct: percentile(latencies, pct) for pct in (50, 95, 99)}, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="primary latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="share of primary calls that are slow")
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="share of primary calls that fail")
+    parser.add_argument("--backup-latency", type=float, default=0.04)
+    parser.add_argument("--timeout", type=float, default=0.25, help="router timeout per attempt (s)")
+    args = parser.parse_args()
+
+    primary, _ = models(args)
+    runs = [("primary only", primary.invoke)]
+    for name, hedge in (("router failover", False), ("router + hedging", True)):
+        primary, backup = models(args)
+        router = LLMRouter({"default": [Route("primary", primary), Route("backup", backup)]},
+                           timeout=args.timeout, hedge=hedge, hedge_min_samples=20)
+        runs.append((name, router.for_task().invoke))
+
+    print(f"{'':18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, invoke in runs:
+        stats, errors = drive(invoke, args.calls)
+        print(f"{name:18} {stats[50] * 1000:8.1f} {stats[95] * 1000:8.1f} {stats[99] * 1000:8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
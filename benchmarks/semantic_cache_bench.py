@@ -0,0 +1,99 @@
+"""Generations saved by canonical keys and the semantic post index.
+
+Replays a stream of first-draft requests in which users reorder tones and
+audiences, change case and spacing, or reword the topic ("AI in hiring" /
+"AI for hiring"). The same stream runs three times on ``FakeChatModel``: with
+the exact response cache on the raw fields (how keys were built before), on
+canonical fields, and on canonical fields plus the semantic index. For each run
+it reports the LLM calls, reused and adapted posts, and total time.
+
+    python benchmarks/semantic_cache_bench.py --requests 200 --latency 0.05
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+import state.state as core  # noqa: E402
+from state.cache import MemoryResponseCache  # noqa: E402
+from state.fake_llm import FakeChatModel  # noqa: E402
+from state.semantic_cache import SemanticPostIndex  # noqa: E402
+
+TOPICS = [
+    ["AI in hiring", "AI for hiring", "ai in Hiring", "Using AI in hiring"],
+    ["Remote work tips", "Tips for remote work", "remote-work tips"],
+    ["Leadership lessons from startups", "Startup leadership lessons"],
+    ["Data privacy in marketing", "Marketing data privacy", "data privacy for marketers"],
+    ["Burnout in tech", "Tech burnout", "burnout in the tech industry"],
+    ["Why mentorship matters", "The value of mentorship"],
+]
+TONES = [["professional", "inspiring"], ["friendly", "bold"]]
+AUDIENCES = [["founders", "HR managers"], ["engineers", "students"]]
+
+
+def request_stream(count: int, seed=7) -> list:
+    rng = random.Random(seed)
+    stream = []
+    for _ in range(count):
+        topic = rng.choice(rng.choice(TOPICS))
+        tone = rng.sample(rng.choice(TONES), 2)
+        audience = [a.upper() if rng.random() < 0.2 else a for a in rng.sample(rng.choice(AUDIENCES), 2)]
+        if rng.random() < 0.3:
+            topic = f"  {topic} "
+        stream.append((topic, tone, audience))
+    return stream
+
+
+def raw_fields(topic, tone, audience):
+    return topic, str(tone), ", ".join(audience)
+
+
+def canonical_fields(topic, tone, audience):
+    return core.prompt_fields({"topic": topic, "tone": tone, "audience": audience})
+
+
+def run(stream, fields, index, latency: float) -> dict:
+    llm = FakeChatModel(latency=latency)
+    core.set_llm(llm)
+    core.set_response_cache(MemoryResponseCache())
+    core.set_semantic_index(index)
+    calls = 0
+    start = time.perf_counter()
+    for request in stream:
+        cache = core.get_response_cache()
+        misses = cache.misses
+        post = core.cached_generate_post_llm(*fields(*request))
+        # The graph indexes a draft once it passes post-validation; every fake draft would.
+        core.remember_post(*fields(*request), post)
+        calls += cache.misses - misses
+    stats = index.stats() if index else {"reused": 0, "adapted": 0}
+    return {"calls": calls, "reused": stats["reused"], "adapted": stats["adapted"],
+            "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per generation (s)")
+    args = parser.parse_args()
+
+    stream = request_stream(args.requests)
+    index = SemanticPostIndex(os.path.join(tempfile.mkdtemp(), "semantic.sqlite"))
+    runs = [
+        ("exact, raw fields", run(stream, raw_fields, None, args.latency)),
+        ("exact, canonical", run(stream, canonical_fields, None, args.latency)),
+        ("canonical + semantic", run(stream, canonical_fields, index, args.latency)),
+    ]
+    print(f"{args.requests} requests")
+    print(f"{'':22} {'LLM calls':>9} {'reused':>7} {'adapted':>8} {'total s':>8}")
+    for name, result in runs:
+        print(f"{name:22} {result['calls']:>9} {result['reused']:>7} {result['adapted']:>8} {result['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Evaluate the local feedback classifier against the labelled set.
+
+Reports how many messages the local fast path decides on its own (the LLM
+calls it saves), its accuracy on those, and the per-message cost.
+
+    python benchmarks/sentiment_eval.py --thresholds 0.7 0.85 0.95
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state.sentiment import classify, read_labelled  # noqa: E402
+
+DEFAULT_EVAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data", "feedback_eval.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eval-set", default=DEFAULT_EVAL)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.85, 0.95])
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    rows = read_labelled(args.eval_set)
+    start = time.perf_counter()
+    predictions = [classify(row["text"]) for row in rows]
+    per_message_us = (time.perf_counter() - start) / len(rows) * 1e6
+
+    print(f"{len(rows)} labelled messages, {per_message_us:.1f} µs per local classification")
+    print(f"{'threshold':>9} {'handled locally':>16} {'local accuracy':>15} {'LLM calls saved':>16}")
+    for threshold in args.thresholds:
+        handled = [(row, label) for row, (label, confidence) in zip(rows, predictions)
+                   if confidence >= threshold]
+        correct = sum(label == row["label"] for row, label in handled)
+        accuracy = correct / len(handled) if handled else 0.0
+        print(f"{threshold:>9.2f} {len(handled):>16} {accuracy:>15.1%} {len(handled) / len(rows):>16.1%}")
+        if args.show_errors:
+            for row, label in handled:
+                if label != row["label"]:
+                    print(f"          wrong: {row['text']!r} -> {label}")
+
+
+if __name__ == "__main__":
+    main()
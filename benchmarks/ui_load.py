@@ -0,0 +1,196 @@
+"""UI-side load test of ``app.py``: many sessions through ``streamlit.testing``'s ``AppTest``.
+
+Each simulated session opens the page, enters a topic, generates a post and
+sends ``--turns`` feedback messages, with ``FakeChatModel`` standing in for
+the LLM (no latency by default, so what is measured is the script, not the
+model).  ``--concurrency`` sessions are open at once and take turns rerunning
+(``AppTest`` runs one script at a time per process), while their graph turns
+run concurrently on the app's background job pool; they share the process's
+cached resources like sessions of one server would.
+
+The report has script rerun latency percentiles per kind of rerun (page
+load, generate, feedback, job polls), how many bytes of markdown each rerun
+emits, the session-state size and process RSS growth per session, and
+session throughput.  ``--json`` writes it for regression tracking:
+
+    python benchmarks/ui_load.py --sessions 40 --concurrency 8 --turns 3 --json ui_load.json
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(_tmp, "ui_load.sqlite"))
+os.environ.setdefault("JOBS_DB", os.path.join(_tmp, "ui_load_jobs.sqlite"))
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_tmp, "ui_load_cache.sqlite"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from graph_bench import percentile  # noqa: E402
+
+FEEDBACK = ["Make the hook shorter.", "Add a question at the end.", "Use fewer hashtags.", "Less formal, please."]
+
+
+def summarize(values) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux); peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def session_state_bytes(at) -> int:
+    """Pickled size of the session's state; entries that don't pickle are skipped."""
+    size = 0
+    for key in at.session_state._state.filtered_state:
+        try:
+            size += len(pickle.dumps(at.session_state[key]))
+        except Exception:
+            pass
+    return size
+
+
+class Recorder:
+    def __init__(self):
+        self.seconds = defaultdict(list)
+        self.emitted = defaultdict(list)
+        self.errors = 0
+
+    def run(self, at, kind: str):
+        start = time.perf_counter()
+        at.run()
+        self.seconds[kind].append(time.perf_counter() - start)
+        self.emitted[kind].append(sum(len(m.value) for m in at.markdown))
+        if at.exception:
+            self.errors += 1
+
+
+def session(index: int, turns: int, recorder, result: dict):
+    """One user's visit as a generator: each ``next`` does one rerun.
+
+    While a background turn runs it yields without rerunning until the poll
+    interval has passed, as the page's polling fragment would.
+    """
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    start = time.perf_counter()
+    recorder.run(at, "load")
+    yield
+    at.text_input[0].input(f"Lessons from project #{index}")
+    at.multiselect[0].select("developers")
+    at.multiselect[1].select("professional")
+    at.button[0].click()
+    recorder.run(at, "generate")
+    for turn in range(turns + 1):
+        while "job_id" in at.session_state:
+            yield "waiting"
+            recorder.run(at, "poll")
+        if turn == turns:
+            break
+        yield
+        at.text_input[0].input(FEEDBACK[turn % len(FEEDBACK)])
+        at.button[0].click()
+        recorder.run(at, "feedback")
+    result.update(seconds=time.perf_counter() - start, state_bytes=session_state_bytes(at), app=at)
+
+
+def drive(count: int, concurrency: int, turns: int, poll_seconds: float, recorder) -> list:
+    """Run ``count`` sessions with up to ``concurrency`` open at once, rerunning them round-robin."""
+    results = [{} for _ in range(count)]
+    pending = deque(range(count))
+    active = deque()
+    while pending or active:
+        while pending and len(active) < concurrency:
+            index = pending.popleft()
+            active.append(session(index, turns, recorder, results[index]))
+        waiting = 0
+        for _ in range(len(active)):
+            current = active.popleft()
+            try:
+                waiting += next(current) == "waiting"
+                active.append(current)
+            except StopIteration:
+                pass
+        if active and waiting == len(active):
+            time.sleep(poll_seconds)
+    return results
+
+
+def run(args) -> dict:
+    recorder = Recorder()
+    # Warm-up: imports, script compile and cached resources are not per-session costs.
+    drive(1, 1, 0, args.poll_seconds, Recorder())
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    sessions = drive(args.sessions, args.concurrency, args.turns, args.poll_seconds, recorder)
+    elapsed = time.perf_counter() - start
+    # The sessions are still referenced here, as they would be on a live server.
+    rss_after = rss_bytes()
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "turns": args.turns,
+        "errors": recorder.errors,
+        "elapsed_seconds": elapsed,
+        "sessions_per_second": args.sessions / elapsed,
+        "reruns_per_second": sum(len(v) for v in recorder.seconds.values()) / elapsed,
+        "session_seconds": summarize([s["seconds"] for s in sessions]),
+        "rerun_seconds": {kind: summarize(values) for kind, values in recorder.seconds.items()},
+        "emitted_bytes": {kind: summarize(values) for kind, values in recorder.emitted.items()},
+        "session_state_bytes": summarize([s["state_bytes"] for s in sessions]),
+        "rss_growth_bytes_per_session": (rss_after - rss_before) / args.sessions,
+    }
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions x {report['turns']} feedback turns, concurrency {report['concurrency']}: "
+          f"{report['elapsed_seconds']:.2f}s, {report['sessions_per_second']:.2f} sessions/s, "
+          f"{report['reruns_per_second']:.1f} reruns/s, {report['errors']} errors")
+    print(f"{'rerun':10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'emitted KB':>11}")
+    for kind, stats in report["rerun_seconds"].items():
+        emitted = report["emitted_bytes"][kind]["mean"] / 1024
+        print(f"{kind:10} {stats['count']:>6} {stats['p50'] * 1000:>8.1f} {stats['p95'] * 1000:>8.1f} "
+              f"{stats['p99'] * 1000:>8.1f} {emitted:>11.1f}")
+    print(f"session state {report['session_state_bytes']['mean'] / 1024:.1f} KB mean, "
+          f"RSS growth {report['rss_growth_bytes_per_session'] / 1024:.0f} KB per session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions open at once")
+    parser.add_argument("--turns", type=int, default=3, help="feedback turns per session")
+    parser.add_argument("--poll-seconds", type=float, default=0.05,
+                        help="pause between polls while every open session waits on a background turn")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
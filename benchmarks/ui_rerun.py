@@ -0,0 +1,79 @@
+"""Streamlit rerun time of ``app.py`` as the chat history grows.
+
+Each history length gets a fresh session driven by ``streamlit.testing``'s
+``AppTest``, its ``ChatLog`` seeded with the conversation. Messages are
+rendered when they are logged, so rerun cost should not depend on the history
+length.
+
+    python benchmarks/ui_rerun.py --sizes 5 50 200 --reruns 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(tempfile.mkdtemp(), "ui_rerun.sqlite"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from state.chat_render import FEEDBACK, FEEDBACK_USER, ORIGINAL, ChatLog, ai_message, user_message  # noqa: E402
+
+POST = ("Curiosity beats credentials. " * 12).strip() + "\n\nWhat would you add?\n\n#hiring #careers #growth"
+
+
+def conversation(size: int) -> list:
+    history = [user_message("Topic: AI in hiring, Audience: managers, Tone: professional"),
+               ai_message(f"Generated Post: {POST}", ORIGINAL)]
+    turn = 0
+    while len(history) < size:
+        turn += 1
+        history += [
+            user_message(f"Change #{turn}: make the hook shorter."),
+            ai_message(f"Negative feedback received: Change #{turn}", FEEDBACK_USER),
+            ai_message(f"Generated post based on feedback: {POST}", FEEDBACK),
+        ]
+    return history[:size]
+
+
+def measure(size: int, reruns: int):
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    log = ChatLog()
+    log.sync(conversation(size))
+    at.session_state['log'] = log
+    at.session_state['chat_mode'] = True
+    at.session_state['state'] = {
+        "topic": "AI in hiring", "tone": ["professional"], "audience": ["managers"],
+        "current_step": "post_validation", "feedback": None,
+    }
+    start = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - start
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    return first, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    measure(1, 1)  # warm-up: imports and the first script compile
+    print(f"{'messages':>8} {'first run ms':>13} {'rerun p50 ms':>13}")
+    for size in args.sizes:
+        first, rerun = measure(size, args.reruns)
+        print(f"{size:>8} {first * 1000:>13.1f} {rerun * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
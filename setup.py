@@ -6,9 +6,9 @@ setup(
     packages=find_packages(),
     install_requires=[
         "langchain",
-        "langgraph",
+        "langgraph>=1.2",
         "langchain_community",
-        "langchain_groq",
     ],
-    include_package_data=True
+    include_package_data=True,
+    package_data={"state": ["sentiment_model.json"]},
 )
@@ -0,0 +1,232 @@
+"""HTTP API for the LinkedIn graph, for clients other than the Streamlit UI.
+
+    uvicorn state.api:app --workers 4 --port 8000
+
+    POST /threads                       {"topic", "tone", "audience"[, "thread_id"]}
+    POST /threads/{thread_id}/feedback  {"feedback"}
+    GET  /threads/{thread_id}
+    GET  /healthz
+    GET  /metrics
+
+``POST /threads`` runs validate -> generate -> validate up to the feedback
+pause; ``/feedback`` runs one feedback turn on a saved thread.  Both answer
+with the thread's state, or, with ``?stream=1``, with Server-Sent Events:
+``token`` events carrying text deltas as the post is written (``start`` when
+a new draft begins), then one ``state`` event (or ``error``).
+
+Threads live in the checkpoint DB (``CHECKPOINT_DB``), not in the process, so
+any worker can serve any request for a thread.  Turns on the same thread are
+serialised within a worker; clients should not send concurrent turns for one
+thread to different workers.
+"""
+import asyncio
+import json
+import os
+import weakref
+
+from langchain_core.messages import HumanMessage
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import state.state as core
+from state import metrics
+from state.async_graph import arun_graph
+from state.batch import split_list
+from state.chat_render import message_category, user_message
+from state.checkpoint import new_thread_config
+from state.edits import resolve_drafts
+
+# Same switch as the UI: the async graph overlaps the topic check with the first draft.
+ASYNC_GRAPH = os.getenv("ASYNC_GRAPH", "1") != "0"
+
+_thread_locks = weakref.WeakValueDictionary()
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Conflict(Exception):
+    pass
+
+
+def thread_lock(thread_id: str) -> asyncio.Lock:
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    return lock
+
+
+async def drive_graph(graph_input, config: dict, on_token=None):
+    if ASYNC_GRAPH:
+        return await arun_graph(graph_input, config, on_token)
+    return await run_in_threadpool(core.run_graph, graph_input, config, on_token)
+
+
+def message_json(msg) -> dict:
+    return {
+        "id": msg.id,
+        "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+        "content": msg.content,
+        "category": message_category(msg),
+    }
+
+
+def state_json(thread_id: str, values: dict, next_nodes=None) -> dict:
+    drafts = resolve_drafts(values.get("drafts"))
+    body = {
+        "thread_id": thread_id,
+        "topic": values.get("topic"),
+        "tone": values.get("tone"),
+        "audience": values.get("audience"),
+        "current_step": values.get("current_step"),
+        "validation": values.get("validation"),
+        "post_validation": values.get("on") or None,
+        "analysis": values.get("analysis") or None,
+        "attempts": values.get("attempts") or 0,
+        "draft": drafts[-1] if drafts else None,
+        "best_post": values.get("best_post"),
+        "drafts": drafts,
+        "history": [message_json(msg) for msg in values.get("history") or []],
+    }
+    if next_nodes is not None:
+        body["next"] = list(next_nodes)
+    return body
+
+
+async def read_json(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("request body must be JSON") from None
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be a JSON object")
+    return body
+
+
+def wants_stream(request: Request) -> bool:
+    return request.query_params.get("stream", "0").lower() in ("1", "true", "yes")
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(thread_id: str, run_turn):
+    """SSE for one turn: ``run_turn(on_token)`` is awaited while its tokens are forwarded."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    # on_token may be called from a worker thread (sync graph) or the loop itself.
+    task = asyncio.ensure_future(run_turn(lambda text: loop.call_soon_threadsafe(queue.put_nowait, text)))
+    task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+    sent = ""
+    while (text := await queue.get()) is not None:
+        # on_token gets the text streamed so far; it restarts with each new draft.
+        if not text.startswith(sent):
+            yield sse("start", {})
+            sent = ""
+        if len(text) > len(sent):
+            yield sse("token", {"text": text[len(sent):]})
+            sent = text
+    try:
+        yield sse("state", state_json(thread_id, await task))
+    except Exception as error:
+        yield sse("error", {"error": str(error)})
+
+
+async def respond(request: Request, thread_id: str, run_turn):
+    if wants_stream(request):
+        return StreamingResponse(event_stream(thread_id, run_turn), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return JSONResponse(state_json(thread_id, await run_turn(None)))
+
+
+async def create_thread(request: Request):
+    body = await read_json(request)
+    topic = str(body.get("topic") or "").strip()
+    tone, audience = split_list(body.get("tone")), split_list(body.get("audience"))
+    if not topic or not tone or not audience:
+        raise BadRequest("topic, tone and audience are required")
+    config = new_thread_config(body.get("thread_id"))
+    thread_id = config["configurable"]["thread_id"]
+    graph_input = core.AgentState(
+        user_id="", topic=topic, tone=tone, audience=audience, drafts=[], best_post=None,
+        feedback=None, current_step=None, validation=None, on="", analysis="",
+        history=[user_message(f"Topic: {topic}, Audience: {', '.join(audience)}, Tone: {', '.join(tone)}")],
+    )
+
+    async def ensure_new():
+        if (await run_in_threadpool(core.get_app().get_state, config)).values:
+            raise Conflict(f"thread {thread_id!r} already exists")
+
+    # Checked up front so a streaming client gets a 409 too; the check under
+    # the lock is the one that counts when two requests create the same id.
+    await ensure_new()
+
+    async def run_turn(on_token):
+        async with thread_lock(thread_id):
+            await ensure_new()
+            return await drive_graph(graph_input, config, on_token)
+
+    return await respond(request, thread_id, run_turn)
+
+
+async def submit_feedback(request: Request):
+    thread_id = request.path_params["thread_id"]
+    body = await read_json(request)
+    feedback = str(body.get("feedback") or "").strip()
+    if not feedback:
+        raise BadRequest("feedback is required")
+    config = new_thread_config(thread_id)
+    if not (await run_in_threadpool(core.get_app().get_state, config)).values:
+        return JSONResponse({"error": f"unknown thread {thread_id!r}"}, status_code=404)
+
+    async def run_turn(on_token):
+        async with thread_lock(thread_id):
+            snapshot = await run_in_threadpool(core.get_app().get_state, config)
+            state = dict(snapshot.values)
+            state["history"] = list(state.get("history") or []) + [user_message(feedback)]
+            state["feedback"] = feedback
+            graph_input = await run_in_threadpool(core.feedback_turn_input, state, config)
+            return await drive_graph(graph_input, config, on_token)
+
+    return await respond(request, thread_id, run_turn)
+
+
+async def get_thread(request: Request):
+    thread_id = request.path_params["thread_id"]
+    snapshot = await run_in_threadpool(core.get_app().get_state, new_thread_config(thread_id))
+    if not snapshot.values:
+        return JSONResponse({"error": f"unknown thread {thread_id!r}"}, status_code=404)
+    return JSONResponse(state_json(thread_id, snapshot.values, snapshot.next))
+
+
+async def healthz(request: Request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics_endpoint(request: Request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def bad_request(request: Request, error: BadRequest):
+    return JSONResponse({"error": str(error)}, status_code=400)
+
+
+async def conflict(request: Request, error: Conflict):
+    return JSONResponse({"error": str(error)}, status_code=409)
+
+
+app = Starlette(
+    routes=[
+        Route("/threads", create_thread, methods=["POST"]),
+        Route("/threads/{thread_id}", get_thread, methods=["GET"]),
+        Route("/threads/{thread_id}/feedback", submit_feedback, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", metrics_endpoint, methods=["GET"]),
+    ],
+    exception_handlers={BadRequest: bad_request, Conflict: conflict},
+)
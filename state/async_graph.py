@@ -0,0 +1,229 @@
+"""Async variant of the LinkedIn graph.
+
+The nodes mirror the ones in ``state.state`` but await ``llm.ainvoke`` /
+``llm.astream``.  ``avalidator_node`` starts the first draft speculatively
+while the topic check is still running; the draft is kept for
+``agenerate_post_node`` when the topic is valid and cancelled otherwise.
+
+The graph is compiled once, with the same pooled checkpointer as
+``state.state.get_app()``, and reused by every turn on any event loop.
+"""
+import asyncio
+import logging
+import threading
+
+from langchain_core.messages import HumanMessage
+
+import state.state as core
+from state.cache import cache_key
+from state import metrics, prompts
+from state.edits import EditError
+from state.ranking import rank_variants
+
+logger = logging.getLogger(__name__)
+
+
+async def acached_llm_call(prompt, schema=None, field=None, stream=False, sample=0, task=None):
+    """Async counterpart of ``state.state.cached_llm_call``, sharing its cache."""
+    llm = core.get_llm(task)
+    response_cache = core.get_response_cache()
+    key_params, llm_kwargs = core.sample_params(sample)
+    key = cache_key(llm.model, prompt, schema, **key_params)
+    writer = core.token_writer() if stream else None
+    with metrics.llm_call(task, llm.model, sample, prompts.template_name(prompt)) as call:
+        cached = response_cache.get(key)
+        call.cache_hit = cached is not None
+        if cached is not None:
+            if writer:
+                writer({"event": "start"})
+                writer({"token": cached})
+            return cached
+        streamed = []
+
+        async def upstream():
+            if schema is None and writer:
+                writer({"event": "start"})
+                result = ""
+                async for chunk in llm.astream([HumanMessage(content=prompt)], **llm_kwargs):
+                    if chunk.content:
+                        writer({"token": chunk.content})
+                        streamed.append(True)
+                        result += chunk.content
+            elif schema is None:
+                result = (await llm.ainvoke([HumanMessage(content=prompt)], **llm_kwargs)).content
+            else:
+                structured_llm = llm.with_structured_output(schema)
+                output = await structured_llm.ainvoke([HumanMessage(content=prompt)], **llm_kwargs)
+                result = output.model_dump() if field is None else getattr(output, field)
+            response_cache.set(key, result)
+            return result
+
+        result, shared = await core.get_gateway().acall(key, llm.model, prompt, upstream, task=task,
+                                                        usage=call.usage, started=lambda: bool(streamed))
+        if shared and writer:
+            writer({"event": "start"})
+            writer({"token": result})
+        return result
+
+
+async def acached_generate_post_llm(topic, tone, audience, attempt=0, stream=True):
+    """Async counterpart of ``state.state.cached_generate_post_llm`` (semantic cache included)."""
+    post, prompt = core.generate_post_request(topic, tone, audience, attempt)
+    if post is not None:
+        if stream:
+            core.emit_text(post)
+        return post
+    return await acached_llm_call(prompt, stream=stream, sample=attempt, task="generate")
+
+
+async def avalidator_node(state: core.AgentState) -> dict:
+    topic, tone, audience_str = core.prompt_fields(state)
+    draft = asyncio.ensure_future(acached_generate_post_llm(topic, tone, audience_str))
+    try:
+        validation = await acached_llm_call(core.validator_prompt(topic, tone, audience_str), task="validate")
+        update = core.record_validation(state, validation)
+    except BaseException:
+        draft.cancel()
+        raise
+    if update['validation'] != 'Valid':
+        # Stop generating (and streaming) a post for a rejected topic.
+        draft.cancel()
+        return update
+    try:
+        update['speculative_draft'] = await draft
+    except Exception as error:
+        # A failed speculative draft is simply regenerated by agenerate_post_node.
+        logger.info("speculative draft failed (%s); generating it again", error)
+    return update
+
+
+async def adraft_and_validate(topic, tone, audience, sample, stream, draft=None):
+    """Generate (unless ``draft`` is given) and validate one variant."""
+    if draft is None:
+        draft = await acached_generate_post_llm(topic, tone, audience, sample, stream=stream)
+    validation = await acached_llm_call(core.post_validation_prompt(topic, tone, audience, draft),
+                                        core.PostValidator, "response", task="validate")
+    return draft, validation
+
+
+async def agenerate_variants(topic, tone, audience, attempt=0, speculative_draft=None) -> list:
+    """Async ``state.state.generate_variants``; a speculative draft stands in for the first variant."""
+    samples = core.variant_samples(attempt)
+    results = await asyncio.gather(*(
+        adraft_and_validate(topic, tone, audience, sample, i == 0, speculative_draft if i == 0 else None)
+        for i, sample in enumerate(samples)
+    ))
+    return rank_variants([post for post, _ in results], [validation for _, validation in results])
+
+
+async def agenerate_post_node(state: core.AgentState) -> dict:
+    post_content = state.get('speculative_draft')
+    if core.DRAFT_VARIANTS > 1:
+        topic, tone, audience_str = core.prompt_fields(state)
+        ranked = await agenerate_variants(topic, tone, audience_str, state.get('attempts') or 0, post_content)
+        return {**core.record_variants(state, ranked), 'speculative_draft': None}
+    if post_content is None:
+        topic, tone, audience_str = core.prompt_fields(state)
+        post_content = await acached_generate_post_llm(topic, tone, audience_str, state.get('attempts') or 0)
+    return {**core.record_draft(state, post_content), 'speculative_draft': None}
+
+
+async def apost_validation_node(state: core.AgentState) -> dict:
+    core.check_post_validation_inputs(state)
+    topic, tone, audience_str = core.prompt_fields(state)
+    response = await acached_llm_call(
+        core.post_validation_prompt(topic, tone, audience_str, core.current_draft(state)),
+        core.PostValidator, "response", task="validate")
+    return core.record_post_validation(state, response)
+
+
+async def ahuman_feedback_node(state: core.AgentState) -> dict:
+    core.check_feedback_inputs(state)
+    human_feedback = state.get('feedback', '')
+    sentiment = core.local_sentiment(human_feedback) or await acached_llm_call(
+        core.feedback_sentiment_prompt(human_feedback), core.FeedbackGrader, "sentiment", task="sentiment")
+    return core.record_feedback(state, human_feedback, sentiment)
+
+
+async def arewrite_post(feedback, last_draft, topic, tone, audience) -> str:
+    """Async ``state.state.rewrite_post``."""
+    if core.REWRITE_MODE == "edit":
+        result = await acached_llm_call(core.edit_feedback_prompt(feedback, last_draft, topic, tone, audience),
+                                        core.PostEdits, task="rewrite")
+        try:
+            post = core.edited_post(last_draft, result)
+        except EditError as error:
+            logger.info("edit rewrite unusable (%s); regenerating the post", error)
+        else:
+            core.emit_text(post)
+            return post
+    return await acached_llm_call(core.collect_feedback_prompt(feedback, last_draft, topic, tone, audience),
+                                  stream=True, task="rewrite")
+
+
+async def acollect_feedback_node(state: core.AgentState) -> dict:
+    topic, tone, audience_str = core.prompt_fields(state)
+    improved_post = await arewrite_post(state['feedback'], core.current_draft(state), topic, tone, audience_str)
+    return core.record_rewrite(state, improved_post)
+
+
+ASYNC_GRAPH_NODES = {
+    "input_node": core.input_node,
+    "validator_node": avalidator_node,
+    "generate_post_node": agenerate_post_node,
+    "post_validation_node": apost_validation_node,
+    "human_feedback_node": ahuman_feedback_node,
+    "collect_feedback_node": acollect_feedback_node,
+    "post": core.post,
+}
+
+_async_graph = None
+
+
+# The fused pipeline has no independent calls to overlap; its sync nodes run
+# in LangGraph's executor when driven through arun_graph.
+def get_async_graph():
+    global _async_graph
+    if _async_graph is None:
+        _async_graph = core.get_graph() if core.PIPELINE_MODE == "fused" else core.build_graph(ASYNC_GRAPH_NODES)
+    return _async_graph
+
+
+_async_app = None
+_async_app_lock = threading.Lock()
+
+
+def get_async_app():
+    """The async graph compiled with the shared checkpointer (``state.state.get_checkpointer()``), built on first use."""
+    global _async_app
+    if _async_app is None:
+        with _async_app_lock:
+            if _async_app is None:
+                _async_app = get_async_graph().compile(checkpointer=core.get_checkpointer(),
+                                                       interrupt_before=core.INTERRUPT_BEFORE)
+    return _async_app
+
+
+async def arun_graph(graph_input, config: dict, on_token=None, on_step=None) -> core.AgentState:
+    """Async entry point: run the graph to its next pause.
+
+    The checkpointer is the one ``state.state.get_app()`` uses, so
+    ``feedback_turn_input`` can prepare a thread for either entry point.
+    """
+    app = get_async_app()
+    with metrics.graph_run("async"):
+        if on_token is None and on_step is None:
+            return await app.ainvoke(graph_input, config)
+        result = None
+        text = ""
+        async for mode, chunk in app.astream(graph_input, config, stream_mode=["custom", "values"]):
+            if mode == "values":
+                if on_step and chunk.get("current_step") != (result or {}).get("current_step"):
+                    on_step(chunk.get("current_step"))
+                result = chunk
+            elif chunk.get("event") == "start":
+                text = ""
+            elif "token" in chunk and on_token:
+                text += chunk["token"]
+                on_token(text)
+        return result
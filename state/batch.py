@@ -0,0 +1,185 @@
+"""Batch generation: run many topic/tone/audience rows through the compiled graph.
+
+    python -m state.batch jobs.jsonl drafts.jsonl --concurrency 8
+
+Input is JSONL or CSV with ``topic``, ``tone`` and ``audience`` columns (lists,
+or comma/semicolon separated strings) and an optional ``id``.  Every row runs
+on its own checkpoint thread, derived from its id, and stops where the
+interactive flow would ask for feedback.  Results are appended to the output
+JSONL as rows finish.  Re-running the same command after a crash skips rows
+already written and resumes unfinished rows from their last checkpoint; rows
+that ended in an error are tried again, so the last line per ``id`` counts.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import state.state as core
+from state import metrics
+from state.checkpoint import new_thread_config
+from state.edits import latest_draft
+from state.gateway import is_rate_limit
+
+logger = logging.getLogger(__name__)
+
+
+def split_list(value):
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in re.split(r"[;,]", value or "") if part.strip()]
+
+
+def read_jobs(path: str) -> list:
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    jobs = []
+    for row in rows:
+        job = {
+            "topic": row["topic"].strip(),
+            "tone": split_list(row.get("tone")),
+            "audience": split_list(row.get("audience")),
+        }
+        digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        job["id"] = str(row.get("id") or digest)
+        jobs.append(job)
+    return jobs
+
+
+def finished_ids(path: str) -> set:
+    """Ids with a result in ``path``; ``error`` rows don't count, so a re-run retries them.
+
+    Lines that are not valid JSON (a row cut off by a crash) are skipped, so
+    their rows run again.
+    """
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("%s:%d is not valid JSON, its row will be run again", path, number)
+                    continue
+                if row.get("status") != "error":
+                    done.add(row["id"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def ends_mid_line(path: str) -> bool:
+    """True when ``path`` ends in a partial line, which the next append must not extend."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if not f.tell():
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def initial_state(job: dict) -> core.AgentState:
+    return core.AgentState(
+        user_id="", topic=job["topic"], tone=job["tone"], audience=job["audience"],
+        drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+        validation=None, on="", analysis="",
+    )
+
+
+def run_job(job: dict, max_retries=5, base_delay=2.0) -> dict:
+    """Drive one row to its first draft, backing off on provider rate limits."""
+    config = new_thread_config(f"batch-{job['id']}")
+    start = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        snapshot = core.get_app().get_state(config)
+        values = snapshot.values
+        try:
+            if not values:
+                values = core.run_graph(initial_state(job), config)
+            elif snapshot.next and "human_feedback_node" not in snapshot.next:
+                # An earlier run stopped part-way (crash or rate limit): resume it.
+                values = core.run_graph(None, config)
+            break
+        except Exception as error:
+            if attempt == max_retries or not is_rate_limit(error):
+                return {**job, "status": "error", "error": str(error),
+                        "thread_id": config["configurable"]["thread_id"],
+                        "elapsed": round(time.perf_counter() - start, 3)}
+            metrics.LLM_RETRIES.inc(task="batch", reason="rate_limit")
+            time.sleep(base_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+    drafts = values.get("drafts") or []
+    return {
+        **job,
+        "status": "ok" if drafts else "invalid",
+        "draft": latest_draft(drafts),
+        "validation": values.get("on") or values.get("validation"),
+        "attempts": values.get("attempts") or 0,
+        "thread_id": config["configurable"]["thread_id"],
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(jobs: list, output_path: str, concurrency=4, max_retries=5, on_result=None) -> int:
+    """Run ``jobs`` with at most ``concurrency`` in flight, appending results to ``output_path``.
+
+    Returns the number of rows processed; rows already in the output are
+    skipped unless they ended in an error.
+    """
+    done = finished_ids(output_path)
+    pending = [job for job in jobs if job["id"] not in done]
+    write_lock = threading.Lock()
+    partial = ends_mid_line(output_path)
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if partial:
+            out.write("\n")
+        futures = [pool.submit(run_job, job, max_retries) for job in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            if on_result:
+                on_result(result)
+    return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate LinkedIn drafts for a JSONL/CSV of jobs.")
+    parser.add_argument("input", help="JSONL or CSV with topic, tone, audience (and optional id)")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=5, help="retries per row on rate-limit errors")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+    metrics.serve_from_env()
+
+    jobs = read_jobs(args.input)
+    start = time.perf_counter()
+    count = run_batch(
+        jobs, args.output, args.concurrency, args.max_retries,
+        on_result=lambda r: print(f"[{r['status']}] {r['id']} {r['topic']!r} ({r['elapsed']}s)"),
+    )
+    elapsed = time.perf_counter() - start
+    print(f"{count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.2f} rows/s), "
+          f"{len(jobs) - count} skipped as already done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Response cache for the ``cached_*_llm`` helpers.
+
+Entries are keyed on a hash of the model name, the prompt (only leading and
+trailing whitespace stripped: inner whitespace can change what the model
+writes) and the structured-output schema, so any caller (Streamlit, batch
+jobs, scripts) gets the same hits.  The SQLite backend can be shared by
+several processes; every entry carries an expiry time and the table is
+trimmed back to ``max_entries`` by least-recent use.  Hits update that
+recency in batches rather than with a write per hit.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from state.checkpoint import SqliteConnectionPool
+
+DEFAULT_CACHE_DB = "llm_cache.sqlite"
+
+
+def canonical_labels(values):
+    """Tone/audience lists in a stable order, whitespace-normalised and without
+    case-insensitive duplicates, so ``["Tech", "founders"]`` and
+    ``["founders", "tech "]`` build the same prompt (and cache key)."""
+    if not isinstance(values, (list, tuple)):
+        return values
+    labels = {}
+    for value in values:
+        label = " ".join(str(value).split())
+        if label:
+            labels.setdefault(label.casefold(), label)
+    return [labels[key] for key in sorted(labels)]
+
+
+def cache_key(model: str, prompt: str, schema=None, **params) -> str:
+    """Stable key for one LLM request; ``params`` (e.g. a sample index) are part of the key."""
+    schema_part = ""
+    if schema is not None:
+        schema_part = json.dumps(schema.model_json_schema(), sort_keys=True)
+    parts = [model or "", prompt.strip(), schema_part]
+    if params:
+        parts.append(json.dumps(params, sort_keys=True))
+    payload = "\x1f".join(parts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Interface shared by the cache backends; also the no-op backend."""
+
+    def __init__(self, default_ttl=None):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _expiry(self, ttl):
+        ttl = self.default_ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else None
+
+    def get(self, key):
+        self._count(False)
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache, for tests and single-process tools."""
+
+    def __init__(self, max_entries=1024, default_ttl=None):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._count(entry is not None)
+        return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, self._expiry(ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteResponseCache(ResponseCache):
+    """Disk-backed cache that several processes can share through one SQLite file.
+
+    A hit is only noted in memory; the access times and hit counts are
+    written together every ``touch_interval`` seconds and before entries are
+    evicted, so reads don't take the write lock.
+    """
+
+    def __init__(self, database=DEFAULT_CACHE_DB, max_entries=10000, default_ttl=None, pool_size=4,
+                 touch_interval=30.0):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._touched = {}  # key -> (accessed_at, hits) not yet written
+        self._touch_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self.pool = SqliteConnectionPool(database, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at);
+                """
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is not None:
+                self._touch(conn, key, now)
+        self._count(row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def _touch(self, conn, key, now):
+        with self._touch_lock:
+            _, hits = self._touched.get(key, (now, 0))
+            self._touched[key] = (now, hits + 1)
+            due = time.monotonic() - self._flushed_at >= self.touch_interval
+        if due:
+            self._flush(conn)
+
+    def _flush(self, conn):
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        if touched:
+            conn.executemany(
+                "UPDATE llm_cache SET accessed_at = MAX(accessed_at, ?), hits = hits + ? WHERE key = ?",
+                [(accessed_at, hits, key) for key, (accessed_at, hits) in touched.items()],
+            )
+            conn.commit()
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self.pool.connection() as conn:
+            self._flush(conn)  # evict by up-to-date recency
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, self._expiry(ttl), now),
+            )
+            conn.execute(
+                "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._touch_lock:
+            self._touched.clear()
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self.pool.connection() as conn:
+            self._flush(conn)
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
+
+
+def cache_from_env() -> ResponseCache:
+    """Build the cache from ``LLM_CACHE_BACKEND`` (sqlite, memory or none) and friends."""
+    backend = os.getenv("LLM_CACHE_BACKEND", "sqlite").lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")) or None
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    if backend == "sqlite":
+        return SqliteResponseCache(
+            os.getenv("LLM_CACHE_DB", DEFAULT_CACHE_DB),
+            max_entries=max_entries,
+            default_ttl=ttl,
+        )
+    if backend == "memory":
+        return MemoryResponseCache(max_entries=max_entries, default_ttl=ttl)
+    return ResponseCache()
@@ -0,0 +1,135 @@
+"""Chat-history HTML for the Streamlit UI, rendered once per message.
+
+Messages carry a stable ``id`` and their badge category in
+``additional_kwargs["category"]``, set where they are created (``ai_message``
+and ``user_message``).  ``ChatLog`` is a session's only copy of the
+conversation: a slotted record per message and the HTML of the recent ones.
+Messages are rendered once, when they are added, so a rerun costs the same for
+a 5- or a 200-message conversation, and beyond the session's memory budget the
+oldest messages are left to the checkpoint and rendered again only on request.
+"""
+import re
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+ORIGINAL = "original"
+FEEDBACK = "feedback"
+VALIDATION = "validation"
+FEEDBACK_USER = "feedback-user"
+VARIANT = "variant"
+
+BADGES = {
+    ORIGINAL: '<span class="badge badge-original">Original Post</span>',
+    FEEDBACK: '<span class="badge badge-feedback">Generated Post Based on Feedback</span>',
+    VALIDATION: '<span class="badge badge-validation">Validation</span>',
+    FEEDBACK_USER: '<span class="badge badge-feedback-user">User Feedback</span>',
+    VARIANT: '<span class="badge badge-variant">Alternative Draft</span>',
+}
+
+# Content prefixes of messages saved before categories were stored on the message.
+LEGACY_PREFIXES = re.compile(
+    r"^(?:(?P<original>Generated Post: )|(?P<feedback>Generated post based on feedback:)|"
+    r"(?P<validation>Post Validation Node:)|(?P<feedback_user>(?:Positive|Negative) feedback received:))"
+)
+
+
+def ai_message(content: str, category=None) -> AIMessage:
+    """Assistant message for ``history`` with a stable ID and its badge category."""
+    kwargs = {"category": category} if category else {}
+    return AIMessage(content=content, id=str(uuid4()), additional_kwargs=kwargs)
+
+
+def user_message(content: str) -> HumanMessage:
+    return HumanMessage(content=content, id=str(uuid4()))
+
+
+def message_category(msg):
+    if not isinstance(msg, AIMessage):
+        return None
+    if "category" in msg.additional_kwargs:
+        return msg.additional_kwargs["category"]
+    match = LEGACY_PREFIXES.match(msg.content)
+    return match.lastgroup.replace("_", "-") if match else None
+
+
+def message_key(msg) -> str:
+    return msg.id or f"{msg.type}:{hash(msg.content)}"
+
+
+def message_html(msg) -> str:
+    if isinstance(msg, HumanMessage):
+        return (
+            "<div class='speaker-label user-label'>User</div>\n"
+            f"<div class='chat-bubble user-bubble'>{msg.content}</div>\n"
+        )
+    if isinstance(msg, AIMessage):
+        badge_html = BADGES.get(message_category(msg), "")
+        return (
+            "<div class='speaker-label assistant-label'>Assistant</div>\n"
+            f"<div class='chat-bubble assistant-bubble'>{badge_html}{msg.content}</div>\n"
+        )
+    return ""
+
+
+class MessageRecord:
+    """One message of a ``ChatLog``: who said it, its badge and where its HTML sits."""
+
+    __slots__ = ("id", "role", "category", "start", "end")
+
+    def __init__(self, id, role, category, start, end):
+        self.id = id
+        self.role = role
+        self.category = category
+        self.start = start  # offsets in the HTML of the whole conversation
+        self.end = end
+
+
+class ChatLog:
+    """The session's conversation: ``MessageRecord``s plus the HTML of the recent messages.
+
+    With a ``budget`` (characters of HTML, 0 = unlimited) the oldest messages
+    are evicted once the HTML outgrows it: their records stay, so ``sync``
+    still lines the log up with the checkpointed history, but their HTML is
+    dropped. ``earlier_html`` renders them again from that history.
+    """
+
+    def __init__(self, budget=0):
+        self.budget = budget
+        self.records = []
+        self.html = ""
+        self.base = 0  # offset of html[0] in the HTML of the whole conversation
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, msg):
+        html = message_html(msg)
+        start = self.base + len(self.html)
+        role = "user" if isinstance(msg, HumanMessage) else "assistant"
+        self.records.append(MessageRecord(message_key(msg), role, message_category(msg), start, start + len(html)))
+        self.html += html
+        self._trim()
+
+    def sync(self, history) -> str:
+        """Add the messages of ``history`` not in the log yet; return the HTML to show."""
+        count = len(self.records)
+        if count > len(history) or (count and message_key(history[count - 1]) != self.records[-1].id):
+            # Not an extension of what was logged (new thread, reset): start over.
+            self.records, self.html, self.base, self.evicted = [], "", 0, 0
+        for msg in history[len(self.records):]:
+            self.append(msg)
+        return self.html
+
+    def earlier_html(self, history) -> str:
+        """HTML of the evicted messages, rendered from the checkpointed ``history``."""
+        return "".join(message_html(msg) for msg in history[:self.evicted])
+
+    def _trim(self):
+        # Keep at least the latest message, whatever its size.
+        while self.budget and len(self.html) > self.budget and self.evicted < len(self.records) - 1:
+            cut = self.records[self.evicted].end - self.base
+            self.html = self.html[cut:]
+            self.base += cut
+            self.evicted += 1
@@ -0,0 +1,234 @@
+"""SQLite checkpoint storage shared by every Streamlit session.
+
+``SqliteSaver`` funnels every read and write through one connection guarded by
+one lock, so concurrent sessions queue behind each other.  ``PooledSqliteSaver``
+keeps the same schema and on-disk format but checks a connection out of a small
+pool for each operation, which lets WAL readers run next to the single writer.
+Its async methods run the same pooled operations in a worker thread, so the
+sync and the async graph share one checkpointer, pool and set of pragmas.
+"""
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from uuid import uuid4
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from state import metrics
+
+DEFAULT_DB = "linkedin.sqlite"
+
+# AgentState fields stored as append-only delta channels: checkpoints hold only
+# the items each step adds, plus a periodic full snapshot.
+APPEND_FIELDS = ("drafts", "history")
+
+
+def append_items(current, writes):
+    """Reducer for the append-only fields: extend ``current`` with every written list."""
+    items = list(current or [])
+    for write in writes:
+        items.extend(write or [])
+    return items
+
+
+class SqliteConnectionPool:
+    """A bounded pool of SQLite connections opened with the same pragmas."""
+
+    def __init__(self, database=DEFAULT_DB, *, size=8, journal_mode="WAL",
+                 synchronous="NORMAL", busy_timeout_ms=5000):
+        self.database = database
+        self.size = size
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        # Only takes effect on a new, empty DB (before journal_mode writes its
+        # header): it then vacuums incrementally without ever needing a full
+        # VACUUM (see state.maintenance).
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return self._connect()
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the calling thread.
+
+        Re-entrant: nested calls on the same thread reuse the connection that
+        is already checked out, so a saver method can open a second cursor on it.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def current(self):
+        return getattr(self._local, "conn", None)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """``SqliteSaver`` that takes a pooled connection per operation instead of a global lock."""
+
+    def __init__(self, pool: SqliteConnectionPool, *, serde=None):
+        self.pool = pool
+        self._setup_lock = threading.Lock()
+        super().__init__(None, serde=serde)
+
+    @property
+    def conn(self):
+        conn = self.pool.current()
+        if conn is None:
+            raise RuntimeError("PooledSqliteSaver.conn used outside of cursor()")
+        return conn
+
+    @conn.setter
+    def conn(self, value):
+        # SqliteSaver.__init__ assigns a connection; ours come from the pool.
+        pass
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        with self._setup_lock:
+            if self.is_setup:
+                return
+            super().setup()
+            # SqliteSaver.setup forces WAL; honour the configured journal mode.
+            self.conn.execute(f"PRAGMA journal_mode={self.pool.journal_mode}")
+            self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with metrics.checkpoint_write("put"):
+            return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with metrics.checkpoint_write("put_writes"):
+            return super().put_writes(config, writes, task_id, task_path)
+
+    # --- async: the pooled sync operations, off the event loop ---
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        with self.pool.connection() as conn:
+            self.setup()
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                if transaction:
+                    conn.commit()
+                cur.close()
+
+
+class CompressingSerializer(JsonPlusSerializer):
+    """``JsonPlusSerializer`` that zlib-compresses blobs of at least ``min_bytes``.
+
+    Compressed blobs are stored with a ``+zlib`` suffix on their type tag, and
+    untagged blobs load as before, so compression can be switched on (or off)
+    for an existing database.
+    """
+
+    SUFFIX = "+zlib"
+
+    def __init__(self, min_bytes=1024, level=6, **kwargs):
+        super().__init__(**kwargs)
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def dumps_typed(self, obj):
+        type_, data = super().dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return type_ + self.SUFFIX, compressed
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, blob = data
+        if type_.endswith(self.SUFFIX):
+            return super().loads_typed((type_[:-len(self.SUFFIX)], zlib.decompress(blob)))
+        return super().loads_typed(data)
+
+
+def serde_from_env():
+    """Serializer for checkpoint blobs; ``CHECKPOINT_COMPRESS_MIN_BYTES=0`` disables compression."""
+    min_bytes = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "0"))
+    return CompressingSerializer(min_bytes=min_bytes) if min_bytes > 0 else None
+
+
+def saver_from_env() -> PooledSqliteSaver:
+    """Build the checkpointer from ``CHECKPOINT_DB`` and the ``SQLITE_*`` settings."""
+    pool = SqliteConnectionPool(
+        os.getenv("CHECKPOINT_DB", DEFAULT_DB),
+        size=int(os.getenv("SQLITE_POOL_SIZE", "8")),
+        journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    )
+    return PooledSqliteSaver(pool, serde=serde_from_env())
+
+
+def new_thread_config(thread_id=None) -> dict:
+    """Graph config for one conversation; every session gets its own thread."""
+    if thread_id is None:
+        thread_id = str(uuid4())
+    return {"configurable": {"thread_id": str(thread_id)}}
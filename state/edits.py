@@ -0,0 +1,103 @@
+"""Line edits and compact draft versions.
+
+Edit-based rewrites (``REWRITE_MODE=edit``) ask the model for a few operations
+against the numbered lines of the current draft instead of a whole new post;
+``apply_edits`` carries them out locally.  Operations use 1-based line
+numbers of the draft they were made for:
+
+- ``replace`` lines ``start``..``end`` with ``text``
+- ``insert`` ``text`` after line ``start`` (0 inserts at the top)
+- ``delete`` lines ``start``..``end``
+
+Every rewritten version is appended to ``drafts`` as a diff against the
+version before it (``encode_version``), so a one-line change costs a few bytes
+per checkpoint instead of a copy of the post.  ``resolve_drafts`` and
+``latest_draft`` turn the list back into full posts.
+"""
+import difflib
+import json
+
+DIFF_PREFIX = "@@diff "
+
+OPS = ("replace", "insert", "delete")
+
+
+class EditError(ValueError):
+    """Edits that cannot be applied to the draft they target."""
+
+
+def number_lines(post: str) -> str:
+    """The draft as the model sees it for an edit: one ``[n]`` prefix per line."""
+    return "\n".join(f"[{i}] {line}" for i, line in enumerate(post.split("\n"), start=1))
+
+
+def apply_edits(post: str, edits: list) -> str:
+    """Apply ``{"op", "start", "end", "text"}`` edits to ``post``; raise ``EditError`` if they don't fit."""
+    if not edits:
+        raise EditError("no edits")
+    lines = post.split("\n")
+    spans = []
+    for edit in edits:
+        op, start = edit.get("op"), edit.get("start")
+        end = edit.get("end") or start
+        if op not in OPS or not isinstance(start, int) or not isinstance(end, int):
+            raise EditError(f"malformed edit {edit!r}")
+        if op == "insert":
+            if not 0 <= start <= len(lines):
+                raise EditError(f"insert position {start} outside 0..{len(lines)}")
+            # An empty span just after ``start``.
+            spans.append((start, start, edit.get("text") or ""))
+        else:
+            if not 1 <= start <= end <= len(lines):
+                raise EditError(f"lines {start}..{end} outside 1..{len(lines)}")
+            spans.append((start - 1, end, None if op == "delete" else edit.get("text") or ""))
+    spans.sort(key=lambda span: (span[0], span[1]))
+    for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < previous_end:
+            raise EditError("overlapping edits")
+    # Back to front, so earlier line numbers stay valid.
+    for start, end, text in reversed(spans):
+        lines[start:end] = [] if text is None else text.split("\n")
+    return "\n".join(lines)
+
+
+def is_diff(version: str) -> bool:
+    return isinstance(version, str) and version.startswith(DIFF_PREFIX)
+
+
+def encode_version(previous: str, post: str) -> str:
+    """``post`` as a diff against ``previous``, or in full when that is shorter."""
+    old, new = previous.split("\n"), post.split("\n")
+    ops = [[i1, i2, new[j1:j2]]
+           for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+           if tag != "equal"]
+    diff = DIFF_PREFIX + json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+    return diff if len(diff) < len(post) else post
+
+
+def apply_diff(previous: str, diff: str) -> str:
+    lines = previous.split("\n")
+    for i1, i2, replacement in reversed(json.loads(diff[len(DIFF_PREFIX):])):
+        lines[i1:i2] = replacement
+    return "\n".join(lines)
+
+
+def resolve_drafts(drafts: list) -> list:
+    """Every entry of ``drafts`` as a full post."""
+    posts = []
+    for version in drafts or []:
+        posts.append(apply_diff(posts[-1], version) if is_diff(version) and posts else version)
+    return posts
+
+
+def latest_draft(drafts: list):
+    """The last entry of ``drafts`` as a full post (``None`` without drafts)."""
+    if not drafts:
+        return None
+    base = len(drafts) - 1
+    while base > 0 and is_diff(drafts[base]):
+        base -= 1
+    post = drafts[base]
+    for version in drafts[base + 1:]:
+        post = apply_diff(post, version)
+    return post
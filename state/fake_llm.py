@@ -0,0 +1,220 @@
+"""Deterministic, offline stand-in for the Gemini chat model.
+
+``FakeChatModel`` answers every prompt with text derived from a hash of the
+prompt (and sampling kwargs such as ``temperature``).  The same request always
+gets the same answer.  Latency, token rate and failures are configurable, so
+the graph and checkpoint overhead can be measured, and error paths exercised,
+without network access:
+
+    from state.fake_llm import FakeChatModel
+    from state.state import set_llm
+
+    set_llm(FakeChatModel(latency=0.2, tokens_per_second=80, failure_rate=0.05))
+
+Set ``LLM_BACKEND=fake`` to start the app with this model.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Iterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+WORDS = (
+    "teams leaders growth insight data trust culture product customers learning "
+    "strategy impact hiring remote feedback career craft momentum clarity focus "
+    "experiments habits mentorship scale outcomes ownership curiosity"
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    """Raised for injected failures; the message mimics a provider rate limit."""
+
+
+class FakeChatModel(BaseChatModel):
+    model: str = "fake-chat"
+    latency: float = 0.0
+    """Seconds before the first token."""
+    tokens_per_second: float = 0.0
+    """Generation speed; 0 returns the whole answer at once."""
+    post_words: int = 60
+    failure_rate: float = 0.0
+    """Probability that a call raises ``FakeLLMError``."""
+    slow_rate: float = 0.0
+    """Probability that a call waits ``slow_latency`` instead of ``latency`` (tail-latency spikes)."""
+    slow_latency: float = 0.0
+    quota_per_second: int = 0
+    """Provider-side quota: calls beyond this many in the last second raise a 429 (0 = none)."""
+    prefix_cache_words: int = 0
+    """Simulated provider prefix cache: prompt prefixes are cached in blocks of this many words,
+    and the longest block seen before is reported as ``cache_read`` input tokens (0 = off)."""
+    seed: int = 0
+    structured_values: dict = {}
+    """Field values for structured output, e.g. ``{"sentiment": "positive"}``."""
+
+    _rng: random.Random = PrivateAttr()
+    _rng_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _recent_calls: deque = PrivateAttr(default_factory=deque)
+    _cached_prefixes: set = PrivateAttr(default_factory=set)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    # --- deterministic content ---
+    def _digest(self, messages, kwargs) -> bytes:
+        text = "\n".join(str(m.content) for m in messages)
+        sampling = ",".join(f"{k}={kwargs[k]}" for k in sorted(kwargs) if k in ("temperature", "seed"))
+        return hashlib.sha256(f"{text}\x1f{sampling}".encode("utf-8")).digest()
+
+    def _post(self, digest: bytes) -> str:
+        rng = random.Random(digest)
+        words = [rng.choice(WORDS) for _ in range(self.post_words)]
+        hook = " ".join(words[:8]).capitalize() + "."
+        body = " ".join(words[8:]).capitalize() + "."
+        tags = " ".join(f"#{w}" for w in rng.sample(WORDS, 4))
+        return f"{hook}\n\n{body}\n\nWhat would you add?\n\n{tags}"
+
+    def _answer(self, messages, kwargs) -> str:
+        prompt = str(messages[-1].content) if messages else ""
+        if "reply ONLY with 'Valid'" in prompt or "just reply with 'Valid' or 'Invalid'" in prompt:
+            return "Valid"
+        return self._post(self._digest(messages, kwargs))
+
+    def _maybe_fail(self):
+        if self.quota_per_second:
+            with self._rng_lock:
+                now = time.monotonic()
+                while self._recent_calls and self._recent_calls[0] <= now - 1.0:
+                    self._recent_calls.popleft()
+                over_quota = len(self._recent_calls) >= self.quota_per_second
+                if not over_quota:
+                    self._recent_calls.append(now)
+            if over_quota:
+                raise FakeLLMError("429 Too many requests (quota_per_second of FakeChatModel)")
+        if self.failure_rate:
+            with self._rng_lock:
+                failed = self._rng.random() < self.failure_rate
+            if failed:
+                raise FakeLLMError("429 Resource exhausted (injected by FakeChatModel)")
+
+    def _cache_read(self, words: list) -> int:
+        block = self.prefix_cache_words
+        if not block:
+            return 0
+        digests = [hashlib.sha256(" ".join(words[:end]).encode("utf-8")).digest()
+                   for end in range(block, len(words) + 1, block)]
+        with self._rng_lock:
+            hits = 0
+            while hits < len(digests) and digests[hits] in self._cached_prefixes:
+                hits += 1
+            self._cached_prefixes.update(digests)
+        return hits * block
+
+    def _usage(self, messages, text: str) -> dict:
+        words = [word for m in messages for word in str(m.content).split()]
+        completion_tokens = len(text.split())
+        return {
+            "input_tokens": len(words),
+            "output_tokens": completion_tokens,
+            "total_tokens": len(words) + completion_tokens,
+            "input_token_details": {"cache_read": self._cache_read(words)},
+        }
+
+    def _chunks(self, text: str) -> list:
+        words = text.split(" ")
+        return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+    def _first_token_delay(self) -> float:
+        if self.slow_rate:
+            with self._rng_lock:
+                slow = self._rng.random() < self.slow_rate
+            if slow:
+                return self.slow_latency
+        return self.latency
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    # --- BaseChatModel hooks ---
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self._maybe_fail()
+        text = self._answer(messages, kwargs)
+        time.sleep(self._first_token_delay() + self._token_delay() * len(self._chunks(text)))
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self._maybe_fail()
+        text = self._answer(messages, kwargs)
+        await asyncio.sleep(self._first_token_delay() + self._token_delay() * len(self._chunks(text)))
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self._maybe_fail()
+        text = self._answer(messages, kwargs)
+        time.sleep(self._first_token_delay())
+        for piece in self._chunks(text):
+            time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._maybe_fail()
+        text = self._answer(messages, kwargs)
+        await asyncio.sleep(self._first_token_delay())
+        for piece in self._chunks(text):
+            await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+    # --- structured output ---
+    def _structured(self, schema, messages, kwargs):
+        digest = self._digest(messages, kwargs)
+        values = {}
+        for name in schema.model_fields:
+            if name in self.structured_values:
+                values[name] = self.structured_values[name]
+            elif name == "sentiment":
+                values[name] = "negative"
+            elif name == "response" or name.endswith("_valid"):
+                values[name] = "Valid"
+            elif name == "mode":
+                values[name] = "edit"
+            elif name == "edits":
+                # A new hook, as for "shorten the hook".
+                values[name] = [{"op": "replace", "start": 1, "end": 1, "text": self._post(digest).split("\n")[0]}]
+            elif name == "post" and "edits" in schema.model_fields:
+                values[name] = ""
+            else:
+                values[name] = self._post(digest)
+        return schema(**values)
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, **kwargs: Any):
+        def invoke(messages, **call_kwargs):
+            self.invoke(messages, **call_kwargs)
+            return self._structured(schema, messages, call_kwargs)
+
+        async def ainvoke(messages, **call_kwargs):
+            await self.ainvoke(messages, **call_kwargs)
+            return self._structured(schema, messages, call_kwargs)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
@@ -0,0 +1,251 @@
+"""Gateway between the ``cached_*_llm`` helpers and the provider.
+
+Three things happen to every request that misses the response cache:
+
+- **Single-flight.** Identical requests (same cache key) already in flight in
+  this process are not sent again; later callers wait for the first one and
+  share its answer.  A burst of sessions submitting the same topic costs one
+  upstream call.
+- **Rate limiting.** Per model, token buckets for requests and tokens per
+  minute (``LLM_RPM``, ``LLM_TPM``), allowing bursts of ``LLM_BURST_SECONDS``
+  worth.  Tokens are reserved from an estimate
+  before the call and settled against the usage the model reports afterwards.
+- **Retries.** Rate-limit errors (429, quota, resource exhausted) are retried
+  with full-jitter exponential backoff, so a burst spreads out instead of
+  failing.  Streams are only retried before their first token.
+
+Limits and coalescing are per process; with several workers, divide the
+provider's limits between them.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+
+from state import metrics
+
+RATE_LIMIT_PATTERN = re.compile(r"429|rate.?limit|resource.?exhausted|quota", re.IGNORECASE)
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return bool(RATE_LIMIT_PATTERN.search(f"{type(error).__name__} {error}"))
+
+
+def estimate_tokens(prompt: str, completion_tokens=300) -> int:
+    """Rough token count of a request (about four characters per token) plus its answer."""
+    return len(prompt) // 4 + completion_tokens
+
+
+class TokenBucket:
+    """``per_minute`` refill with bursts of up to ``burst_seconds`` worth; reservations may go into debt."""
+
+    def __init__(self, per_minute: float, burst_seconds=1.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` now; return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def settle(self, delta: float):
+        """Correct an earlier reservation by ``delta`` (actual minus estimate)."""
+        with self._lock:
+            self.level -= delta
+
+
+class Abandoned(Exception):
+    """The leading caller was cancelled before its request finished."""
+
+
+class Flight:
+    """One upstream call that other callers of the same key can wait on."""
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+        self._waiters = []  # (loop, future) of async followers
+        self._lock = threading.Lock()
+
+    def finish(self, result=None, error=None):
+        self.result, self.error = result, error
+        with self._lock:
+            self._done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def value(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def wait(self):
+        self._done.wait()
+        return self.value()
+
+    async def await_value(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._done.is_set():
+                return self.value()
+            self._waiters.append((loop, future))
+        await future
+        return self.value()
+
+
+class LLMGateway:
+    def __init__(self, rpm=0, tpm=0, max_retries=3, base_delay=1.0, max_delay=30.0, completion_tokens=300,
+                 coalesce=True, burst_seconds=1.0):
+        self.coalesce = coalesce
+        self.burst_seconds = burst_seconds
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+        self._buckets = {}  # model -> (requests, tokens)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    # --- bookkeeping ---
+    def _join(self, key):
+        """``(flight, leader)``: the in-flight call for ``key``, and whether this caller runs it."""
+        if not self.coalesce:
+            return Flight(), True
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def _land(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is not None and not isinstance(error, Exception):
+            # Cancelled or interrupted, not failed: a waiting caller takes over.
+            error = Abandoned()
+        flight.finish(result, error)
+
+    def _buckets_for(self, model):
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = (TokenBucket(self.rpm, self.burst_seconds) if self.rpm else None,
+                                        TokenBucket(self.tpm, self.burst_seconds) if self.tpm else None)
+            return self._buckets[model]
+
+    def _reserve(self, model, estimate) -> float:
+        requests, tokens = self._buckets_for(model)
+        wait = requests.reserve(1) if requests else 0.0
+        if tokens:
+            wait = max(wait, tokens.reserve(estimate))
+        if wait:
+            metrics.LLM_RATE_LIMIT_WAIT.observe(wait, model=model)
+        return wait
+
+    def _settle(self, model, estimate, usage):
+        _, tokens = self._buckets_for(model)
+        if tokens and usage is not None and usage.total_tokens:
+            tokens.settle(usage.total_tokens - estimate)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _should_retry(self, error, attempt, started) -> bool:
+        return attempt < self.max_retries and not started() and is_rate_limit(error)
+
+    # --- sync ---
+    def call(self, key, model, prompt, upstream, task=None, usage=None, started=lambda: False):
+        """Run ``upstream()`` once per ``key`` in flight; return ``(result, shared)``.
+
+        ``shared`` is true for callers that got the answer of another caller's
+        request.  ``started()`` tells whether a streaming ``upstream`` already
+        emitted tokens, after which it is no longer retried.
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = flight.wait()
+            except Abandoned:
+                continue
+            metrics.LLM_COALESCED.inc(task=task or "default")
+            return result, True
+        estimate = estimate_tokens(prompt, self.completion_tokens)
+        try:
+            for attempt in range(self.max_retries + 1):
+                time.sleep(self._reserve(model, estimate))
+                try:
+                    result = upstream()
+                    break
+                except Exception as error:
+                    if not self._should_retry(error, attempt, started):
+                        raise
+                    metrics.LLM_RETRIES.inc(task=task or "default", reason="rate_limit")
+                    time.sleep(self._backoff(attempt))
+        except BaseException as error:
+            self._land(key, flight, error=error)
+            raise
+        self._settle(model, estimate, usage)
+        self._land(key, flight, result)
+        return result, False
+
+    # --- async ---
+    async def acall(self, key, model, prompt, upstream, task=None, usage=None, started=lambda: False):
+        """Async ``call``; ``upstream`` is a coroutine function."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = await flight.await_value()
+            except Abandoned:
+                continue
+            metrics.LLM_COALESCED.inc(task=task or "default")
+            return result, True
+        estimate = estimate_tokens(prompt, self.completion_tokens)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await asyncio.sleep(self._reserve(model, estimate))
+                try:
+                    result = await upstream()
+                    break
+                except Exception as error:
+                    if not self._should_retry(error, attempt, started):
+                        raise
+                    metrics.LLM_RETRIES.inc(task=task or "default", reason="rate_limit")
+                    await asyncio.sleep(self._backoff(attempt))
+        except BaseException as error:
+            # Cancellation included: followers must not wait forever.
+            self._land(key, flight, error=error)
+            raise
+        self._settle(model, estimate, usage)
+        self._land(key, flight, result)
+        return result, False
+
+
+def gateway_from_env() -> LLMGateway:
+    return LLMGateway(
+        coalesce=os.getenv("LLM_SINGLE_FLIGHT", "1") != "0",
+        rpm=float(os.getenv("LLM_RPM", "0")),
+        tpm=float(os.getenv("LLM_TPM", "0")),
+        burst_seconds=float(os.getenv("LLM_BURST_SECONDS", "1")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+        base_delay=float(os.getenv("LLM_RETRY_BASE_SECONDS", "1")),
+        max_delay=float(os.getenv("LLM_RETRY_MAX_SECONDS", "30")),
+    )
@@ -0,0 +1,211 @@
+"""Background graph runs for the Streamlit app.
+
+``JobRunner.submit`` records a job in the ``jobs`` table and runs the graph
+turn on a worker thread, so the Streamlit script returns at once instead of
+holding a server thread for every LLM call of the turn.  While it runs, the
+job row carries the current step and the text streamed so far; the UI polls
+it from a fragment.  The graph state itself is checkpointed as usual, so a
+finished job's result is read back from the checkpointer by thread id and
+survives reruns, refreshes and reconnects.
+
+Jobs run in the process that submitted them.  Rows of jobs that stopped
+updating for ``JOB_STALE_SECONDS`` (the process died mid-run) are reported as
+failed.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from state.checkpoint import SqliteConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Not the checkpoint DB: progress is written from inside graph runs, which
+# hold write transactions on the checkpoint file.
+DEFAULT_JOBS_DB = "jobs.sqlite"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobActive(RuntimeError):
+    """A thread already has a queued or running job; ``job_id`` is that job."""
+
+    def __init__(self, job_id: str):
+        super().__init__("Your previous message is still being processed; send this one once it finishes.")
+        self.job_id = job_id
+
+
+COLUMNS = ("id", "thread_id", "kind", "status", "step", "partial", "error",
+           "created_at", "updated_at", "finished_at")
+
+
+class JobStore:
+    """The ``jobs`` table; one row per graph turn run in the background."""
+
+    def __init__(self, database=DEFAULT_JOBS_DB, stale_seconds=600.0, pool_size=4):
+        self.stale_seconds = stale_seconds
+        self.pool = SqliteConnectionPool(database, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    thread_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    step TEXT,
+                    partial TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_thread ON jobs (thread_id, created_at);
+                """
+            )
+
+    def create(self, thread_id: str, kind: str) -> str:
+        job_id = str(uuid4())
+        now = time.time()
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, thread_id, kind, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, thread_id, kind, QUEUED, now, now),
+            )
+            conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        if fields.get("status") in (DONE, FAILED):
+            fields["finished_at"] = fields["updated_at"]
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.pool.connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        if job["status"] in ACTIVE and time.time() - job["updated_at"] > self.stale_seconds:
+            job["status"], job["error"] = FAILED, "The worker running this job stopped."
+        return job
+
+    def get(self, job_id: str):
+        with self.pool.connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def latest(self, thread_id: str):
+        """The thread's most recent job, or ``None``."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE thread_id = ? ORDER BY created_at DESC LIMIT 1",
+                (thread_id,),
+            ).fetchone()
+        return self._row(row)
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than ``older_than_seconds``; return how many."""
+        with self.pool.connection() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - older_than_seconds,),
+            ).rowcount
+            conn.commit()
+        return deleted
+
+
+class JobRunner:
+    """Runs graph turns on a thread pool and reports their progress in a ``JobStore``.
+
+    ``drive(graph_input, config, on_token, on_step)`` runs one turn, e.g.
+    ``state.state.run_graph``.  Threads rather than processes: a turn mostly
+    waits on the LLM, and workers share the process's graph, caches and
+    gateway.
+    """
+
+    def __init__(self, store: JobStore, drive, max_workers=4, progress_interval=0.25):
+        self.store = store
+        self.drive = drive
+        self.progress_interval = progress_interval
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graph-job")
+        self._lock = threading.Lock()
+
+    def active(self, thread_id: str):
+        """The thread's queued or running job, or ``None``."""
+        job = self.store.latest(thread_id)
+        return job if job is not None and job["status"] in ACTIVE else None
+
+    def submit(self, graph_input, config: dict, kind="turn") -> str:
+        """Queue one graph turn for ``config``'s thread; return the job id.
+
+        A thread runs one turn at a time: while one is queued or running,
+        ``JobActive`` is raised instead.  Check ``active`` before changing the
+        thread's checkpoint for the turn.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            current = self.active(thread_id)
+            if current is not None:
+                raise JobActive(current["id"])
+            job_id = self.store.create(thread_id, kind)
+        self.pool.submit(self._run, job_id, graph_input, config)
+        return job_id
+
+    def _run(self, job_id, graph_input, config):
+        last_write = 0.0
+
+        def progress(**fields):
+            # Best effort: a busy jobs table must not fail the turn itself.
+            try:
+                self.store.update(job_id, **fields)
+            except sqlite3.OperationalError as error:
+                logger.debug("Progress of job %s not saved: %s", job_id, error)
+
+        def on_token(text):
+            # Tokens arrive far faster than anyone polls; write a snapshot every progress_interval.
+            nonlocal last_write
+            now = time.monotonic()
+            if now - last_write >= self.progress_interval:
+                last_write = now
+                progress(partial=text)
+
+        def on_step(step):
+            progress(step=step, partial=None)
+
+        try:
+            self.store.update(job_id, status=RUNNING)
+            self.drive(graph_input, config, on_token, on_step)
+        except Exception as error:
+            logger.exception("Graph job %s failed", job_id)
+            self._finish(job_id, status=FAILED, error=str(error) or type(error).__name__)
+        else:
+            self._finish(job_id, status=DONE, partial=None)
+
+    def _finish(self, job_id, **fields):
+        try:
+            self.store.update(job_id, **fields)
+        except sqlite3.Error:
+            # Left active; reported as failed once it is JOB_STALE_SECONDS old.
+            logger.exception("Final status of job %s not saved", job_id)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+def job_store_from_env() -> JobStore:
+    return JobStore(
+        os.getenv("JOBS_DB", DEFAULT_JOBS_DB),
+        stale_seconds=float(os.getenv("JOB_STALE_SECONDS", "600")),
+    )
+
+
+def job_runner_from_env(drive) -> JobRunner:
+    return JobRunner(job_store_from_env(), drive, max_workers=int(os.getenv("JOB_WORKERS", "4")))
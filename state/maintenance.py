@@ -0,0 +1,327 @@
+"""Retention, compaction and vacuum for the checkpoint database.
+
+Every node of every session writes a checkpoint, and nothing else ever deletes
+them.  This module keeps ``linkedin.sqlite`` bounded:
+
+* ``prune``  keeps the newest ``--keep`` checkpoints of each thread.  The oldest
+  kept checkpoint gets a full snapshot of the append-only fields, so the
+  thread's state is unchanged after its ancestors are deleted.
+* ``expire`` deletes threads whose last checkpoint is older than ``--ttl-hours``.
+* ``vacuum`` truncates the WAL and returns free pages to the filesystem.  On
+  a DB created before ``auto_vacuum=INCREMENTAL`` was set, that needs one full
+  ``VACUUM`` (``vacuum --full``), which blocks every writer while it runs, so
+  it is only done on request; until then scheduled runs only truncate the WAL.
+* ``report`` prints the DB/WAL size and row counts of the largest threads.
+* ``run`` does expire, prune and vacuum; ``--every SECONDS`` repeats it.
+
+    python -m state.maintenance report
+    python -m state.maintenance run --keep 20 --ttl-hours 168 --every 3600
+
+The app can run the same job on a background thread; see
+``CHECKPOINT_MAINTENANCE_INTERVAL_SECONDS``.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from langgraph.channels.delta import DeltaChannel
+
+from state.checkpoint import (
+    APPEND_FIELDS,
+    DEFAULT_DB,
+    PooledSqliteSaver,
+    SqliteConnectionPool,
+    append_items,
+    serde_from_env,
+)
+
+KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+THREAD_TTL_HOURS = float(os.getenv("CHECKPOINT_THREAD_TTL_HOURS", "168"))
+VACUUM_PAGES = int(os.getenv("CHECKPOINT_VACUUM_PAGES", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+def file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def threads(saver: PooledSqliteSaver) -> list:
+    with saver.cursor(transaction=False) as cur:
+        cur.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints")
+        return cur.fetchall()
+
+
+def latest_checkpoint(saver: PooledSqliteSaver, thread_id: str, checkpoint_ns: str = ""):
+    """Deserialized newest checkpoint of a thread (without replaying its deltas)."""
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1",
+            (thread_id, checkpoint_ns),
+        )
+        row = cur.fetchone()
+    return saver.serde.loads_typed(row) if row else None
+
+
+def report(saver: PooledSqliteSaver, top: int = 10) -> dict:
+    """DB and WAL size, free pages, and per-thread row counts (largest threads first)."""
+    with saver.cursor(transaction=False) as cur:
+        page_size = cur.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = cur.execute("PRAGMA freelist_count").fetchone()[0]
+        cur.execute(
+            "SELECT thread_id, COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata)) "
+            "FROM checkpoints GROUP BY thread_id"
+        )
+        checkpoints = {thread_id: (count, size or 0) for thread_id, count, size in cur.fetchall()}
+        cur.execute("SELECT thread_id, COUNT(*), SUM(LENGTH(value)) FROM writes GROUP BY thread_id")
+        writes = {thread_id: (count, size or 0) for thread_id, count, size in cur.fetchall()}
+    rows = []
+    for thread_id in set(checkpoints) | set(writes):
+        n_checkpoints, checkpoint_bytes = checkpoints.get(thread_id, (0, 0))
+        n_writes, write_bytes = writes.get(thread_id, (0, 0))
+        rows.append({
+            "thread_id": thread_id,
+            "checkpoints": n_checkpoints,
+            "writes": n_writes,
+            "bytes": checkpoint_bytes + write_bytes,
+        })
+    rows.sort(key=lambda row: row["bytes"], reverse=True)
+    database = saver.pool.database
+    return {
+        "db_bytes": file_size(database),
+        "wal_bytes": file_size(database + "-wal"),
+        "free_bytes": free_pages * page_size,
+        "threads": len(rows),
+        "checkpoints": sum(row["checkpoints"] for row in rows),
+        "writes": sum(row["writes"] for row in rows),
+        "largest_threads": rows[:top],
+    }
+
+
+def delete_thread(saver: PooledSqliteSaver, thread_id: str):
+    with saver.cursor() as cur:
+        cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+
+def prune_thread(saver: PooledSqliteSaver, thread_id: str, checkpoint_ns: str = "", keep: int = KEEP_LAST) -> int:
+    """Keep the newest ``keep`` checkpoints on the thread's current branch; return rows deleted.
+
+    The scan, the compaction and the deletes run in one ``BEGIN IMMEDIATE``
+    transaction, so a session cannot commit a checkpoint in between, and only
+    checkpoints the scan saw (up to its newest one) are ever deleted.
+    """
+    keep = max(1, keep)
+    with saver.cursor(transaction=False) as cur:
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = _prune_thread(saver, cur, thread_id, checkpoint_ns, keep)
+        except BaseException:
+            saver.conn.rollback()
+            raise
+        saver.conn.commit()
+    return deleted
+
+
+def _prune_thread(saver: PooledSqliteSaver, cur, thread_id: str, checkpoint_ns: str, keep: int) -> int:
+    cur.execute(
+        "SELECT checkpoint_id, parent_checkpoint_id FROM checkpoints "
+        "WHERE thread_id = ? AND checkpoint_ns = ?",
+        (thread_id, checkpoint_ns),
+    )
+    parents = dict(cur.fetchall())
+    if len(parents) <= keep:
+        return 0
+    newest = max(parents)
+    kept = [newest]
+    while len(kept) < keep and parents.get(kept[-1]) in parents:
+        kept.append(parents[kept[-1]])
+    oldest = kept[-1]
+    if parents[oldest] is not None:
+        compact(saver, thread_id, checkpoint_ns, oldest)
+
+    placeholders = ",".join("?" * len(kept))
+    cur.execute(
+        f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+        f"AND checkpoint_id <= ? AND checkpoint_id NOT IN ({placeholders})",
+        (thread_id, checkpoint_ns, newest, *kept),
+    )
+    deleted = cur.rowcount
+    cur.execute(
+        f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+        f"AND checkpoint_id <= ? AND checkpoint_id NOT IN ({placeholders})",
+        (thread_id, checkpoint_ns, newest, *kept),
+    )
+    return deleted
+
+
+def compact(saver: PooledSqliteSaver, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+    """Make ``checkpoint_id`` self-contained so its ancestors can be deleted.
+
+    The append-only fields are rebuilt from the ancestor writes and stored in
+    the checkpoint as plain values (``DeltaChannel`` restores those as is), and
+    its parent link is cleared.  Does not commit: ``prune_thread`` calls it
+    inside its transaction.
+    """
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        checkpoint = saver.serde.loads_typed(cur.fetchone())
+    missing = [channel for channel in APPEND_FIELDS if channel not in checkpoint["channel_values"]]
+    config = {"configurable": {
+        "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+    }}
+    history = saver.get_delta_channel_history(config=config, channels=missing) if missing else {}
+    for channel, entry in history.items():
+        seed = entry.get("seed")
+        if seed is None and not entry["writes"]:
+            continue
+        if seed is not None:
+            # unwraps a stored snapshot; a plain value comes back unchanged
+            seed = DeltaChannel(append_items).from_checkpoint(seed).value
+        checkpoint["channel_values"][channel] = append_items(seed, [write for _, _, write in entry["writes"]])
+    type_, blob = saver.serde.dumps_typed(checkpoint)
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            "UPDATE checkpoints SET type = ?, checkpoint = ?, parent_checkpoint_id = NULL "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (type_, blob, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+
+def prune(saver: PooledSqliteSaver, keep: int = KEEP_LAST) -> int:
+    return sum(prune_thread(saver, thread_id, checkpoint_ns, keep) for thread_id, checkpoint_ns in threads(saver))
+
+
+def expire(saver: PooledSqliteSaver, ttl_hours: float = THREAD_TTL_HOURS, now=None) -> list:
+    """Delete threads idle for longer than ``ttl_hours``; return their IDs."""
+    if ttl_hours <= 0:
+        return []
+    now = now or datetime.now(timezone.utc)
+    expired = []
+    for thread_id, checkpoint_ns in threads(saver):
+        checkpoint = latest_checkpoint(saver, thread_id, checkpoint_ns)
+        if checkpoint is None:
+            continue
+        idle = now - datetime.fromisoformat(checkpoint["ts"])
+        if idle.total_seconds() > ttl_hours * 3600:
+            delete_thread(saver, thread_id)
+            expired.append(thread_id)
+    return expired
+
+
+def vacuum(saver: PooledSqliteSaver, pages: int = VACUUM_PAGES, full: bool = False) -> str:
+    """Checkpoint and truncate the WAL, then return free pages to the filesystem.
+
+    Incremental vacuum needs ``auto_vacuum=INCREMENTAL``, which SQLite only
+    applies to an existing DB after a full ``VACUUM``.  That rewrites the whole
+    file and blocks every writer, so it only runs with ``full=True``; without
+    it such a DB is left as is.  ``pages=0`` frees every free page.
+    """
+    with saver.pool.connection() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if full:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            action = "full vacuum"
+        elif mode != 2:
+            action = "vacuum skipped: auto_vacuum is not INCREMENTAL (run `vacuum --full` once)"
+        else:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+            conn.commit()
+            action = "incremental vacuum"
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return action
+
+
+def run_maintenance(saver: PooledSqliteSaver, keep: int = KEEP_LAST, ttl_hours: float = THREAD_TTL_HOURS,
+                    pages: int = VACUUM_PAGES, full: bool = False) -> dict:
+    """Expire idle threads, prune the rest, then vacuum. Returns what was done."""
+    start = time.perf_counter()
+    expired = expire(saver, ttl_hours)
+    pruned = prune(saver, keep)
+    action = vacuum(saver, pages, full)
+    return {
+        "expired_threads": len(expired),
+        "pruned_checkpoints": pruned,
+        "vacuum": action,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def start_scheduler(saver: PooledSqliteSaver, interval: float, **kwargs) -> threading.Event:
+    """Run ``run_maintenance`` every ``interval`` seconds on a daemon thread; set the event to stop.
+
+    Scheduled runs never do a full ``VACUUM``.
+    """
+    stop = threading.Event()
+    kwargs.pop("full", None)
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                logger.info("checkpoint maintenance: %s", run_maintenance(saver, **kwargs))
+            except Exception:  # keep the schedule alive; the next run retries
+                logger.exception("checkpoint maintenance failed")
+
+    threading.Thread(target=loop, name="checkpoint-maintenance", daemon=True).start()
+    return stop
+
+
+def print_report(stats: dict):
+    mb = lambda n: f"{n / 1e6:.1f} MB"  # noqa: E731
+    print(f"db {mb(stats['db_bytes'])}, wal {mb(stats['wal_bytes'])}, free {mb(stats['free_bytes'])}")
+    print(f"{stats['threads']} threads, {stats['checkpoints']} checkpoints, {stats['writes']} writes")
+    print(f"{'thread_id':38} {'checkpoints':>11} {'writes':>7} {'bytes':>10}")
+    for row in stats["largest_threads"]:
+        print(f"{row['thread_id']:38} {row['checkpoints']:>11} {row['writes']:>7} {row['bytes']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune, expire and vacuum the checkpoint database.")
+    parser.add_argument("command", choices=["report", "prune", "expire", "vacuum", "run"])
+    parser.add_argument("--db", default=os.getenv("CHECKPOINT_DB", DEFAULT_DB))
+    parser.add_argument("--keep", type=int, default=KEEP_LAST, help="checkpoints kept per thread")
+    parser.add_argument("--ttl-hours", type=float, default=THREAD_TTL_HOURS,
+                        help="delete threads idle longer than this (0 = never)")
+    parser.add_argument("--pages", type=int, default=VACUUM_PAGES, help="pages per incremental vacuum (0 = all)")
+    parser.add_argument("--full", action="store_true",
+                        help="run a full VACUUM (switches on incremental vacuum; blocks writers while it runs)")
+    parser.add_argument("--top", type=int, default=10, help="threads listed by report")
+    parser.add_argument("--every", type=float, default=0, help="repeat `run` every N seconds")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"{args.db} does not exist")
+        return 1
+    saver = PooledSqliteSaver(SqliteConnectionPool(args.db, size=1), serde=serde_from_env())
+    try:
+        if args.command == "report":
+            print_report(report(saver, args.top))
+        elif args.command == "prune":
+            print(f"deleted {prune(saver, args.keep)} checkpoints")
+        elif args.command == "expire":
+            print(f"expired {len(expire(saver, args.ttl_hours))} threads")
+        elif args.command == "vacuum":
+            print(vacuum(saver, args.pages, args.full))
+        else:
+            while True:
+                print(run_maintenance(saver, args.keep, args.ttl_hours, args.pages, args.full))
+                args.full = False  # a repeated run only needs the conversion once
+                if not args.every:
+                    break
+                time.sleep(args.every)
+    finally:
+        saver.pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
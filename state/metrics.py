@@ -0,0 +1,402 @@
+"""Timing, cache, token and cost metrics for the graph, in Prometheus text format.
+
+Every graph node (``instrument_node``), every ``cached_*_llm`` helper
+(``llm_call``), every checkpoint write (``checkpoint_write``) and every user
+turn (``graph_run``) is recorded in ``REGISTRY``.  ``render()`` returns the
+Prometheus exposition text; ``serve_from_env()`` serves it on
+``METRICS_PORT`` from a background thread:
+
+    METRICS_PORT=9464 streamlit run app.py
+    curl localhost:9464/metrics
+
+Token counts come from the ``usage_metadata`` the chat model reports, picked
+up by a callback handler that LangChain attaches to every model call made
+inside ``llm_call``; that includes prompt tokens served from the provider's
+prefix cache (``input_token_details.cache_read``), per prompt template.  When the ``opentelemetry`` package is installed, nodes,
+LLM calls and runs are also OpenTelemetry spans (no-ops until an SDK and
+exporter are configured).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from inspect import iscoroutinefunction
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # spans are optional
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram; each label set holds ``[bucket counts, count, sum]``."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def value(self, **labels) -> tuple:
+        """``(count, sum)`` of the observations with these labels."""
+        entry = self._values.get(self._key(labels))
+        return (entry[1], entry[2]) if entry else (0, 0.0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(buckets), count, total)) for key, (buckets, count, total) in self._values.items())
+        lines = []
+        for key, (buckets, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', f'{bound:g}')])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+NODE_SECONDS = REGISTRY.histogram(
+    "viral_post_node_seconds", "Wall time of graph nodes.", ["node"])
+NODE_ERRORS = REGISTRY.counter(
+    "viral_post_node_errors_total", "Graph node calls that raised.", ["node"])
+LLM_SECONDS = REGISTRY.histogram(
+    "viral_post_llm_call_seconds", "Wall time of cached LLM helpers, cache hits included.", ["task", "cache"])
+LLM_CACHE = REGISTRY.counter(
+    "viral_post_llm_cache_total", "Response cache lookups by result (hit/miss).", ["task", "result"])
+LLM_ERRORS = REGISTRY.counter(
+    "viral_post_llm_errors_total", "Cached LLM helper calls that raised.", ["task"])
+LLM_TOKENS = REGISTRY.counter(
+    "viral_post_llm_tokens_total",
+    "Tokens reported by the chat model, by kind (prompt/completion, and cached_prompt: the part of prompt "
+    "served from the provider's prefix cache).",
+    ["task", "kind"])
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "viral_post_llm_prompt_tokens", "Prompt tokens per LLM call, by prompt template.", ["prompt"],
+    buckets=TOKEN_BUCKETS)
+LLM_PREFIX_CACHE = REGISTRY.counter(
+    "viral_post_llm_prefix_cache_total",
+    "LLM calls whose prompt prefix was (hit) or was not (miss) served from the provider's cache, by prompt template.",
+    ["prompt", "result"])
+LLM_COST = REGISTRY.counter(
+    "viral_post_llm_cost_usd_total", "Estimated LLM spend from LLM_PRICES.", ["task"])
+LLM_RETRIES = REGISTRY.counter(
+    "viral_post_llm_retries_total",
+    "Extra LLM attempts: regenerations after a rejected draft (resample), router failovers and hedges, "
+    "and retries after rate limits.",
+    ["task", "reason"])
+LLM_COALESCED = REGISTRY.counter(
+    "viral_post_llm_coalesced_total", "LLM requests answered by an identical request already in flight.", ["task"])
+LLM_RATE_LIMIT_WAIT = REGISTRY.histogram(
+    "viral_post_llm_rate_limit_wait_seconds", "Time requests waited for the LLM_RPM/LLM_TPM token buckets.", ["model"])
+CHECKPOINT_WRITE_SECONDS = REGISTRY.histogram(
+    "viral_post_checkpoint_write_seconds", "Duration of checkpoint writes.", ["op"])
+RUN_SECONDS = REGISTRY.histogram(
+    "viral_post_run_seconds", "Wall time of one user turn through the graph.", ["entry"])
+RUN_TOKENS = REGISTRY.histogram(
+    "viral_post_run_tokens", "Tokens used by one user turn.", ["entry"], buckets=TOKEN_BUCKETS)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# --- spans ---
+def span(name: str, **attributes):
+    """OpenTelemetry span when ``opentelemetry`` is installed, otherwise a no-op context."""
+    if otel_trace is None:
+        return nullcontext()
+    return otel_trace.get_tracer("viral_post").start_as_current_span(name, attributes=attributes)
+
+
+# --- tokens ---
+class TokenUsage(BaseCallbackHandler):
+    """Sums the ``usage_metadata`` of every chat-model response it sees."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens=0):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_prompt_tokens += cached_prompt_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    details = usage.get("input_token_details") or {}
+                    self.add(usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                             details.get("cache_read") or 0)
+
+
+# LangChain attaches the handler in this variable to every model call made while
+# it is set; ``llm_call`` sets a fresh one per helper call.
+_call_usage = ContextVar("viral_post_call_usage", default=None)
+register_configure_hook(_call_usage, inheritable=True)
+# Usage of the current graph run, added up across its LLM calls.
+_run_usage = ContextVar("viral_post_run_usage", default=None)
+
+
+def load_prices() -> dict:
+    """``LLM_PRICES``: JSON of model -> ``[input, output]`` or ``[input, output, cached input]``
+    USD per million tokens."""
+    try:
+        return json.loads(os.getenv("LLM_PRICES", "") or "{}")
+    except ValueError:
+        logger.warning("LLM_PRICES is not valid JSON; cost metrics are off")
+        return {}
+
+
+PRICES = load_prices()
+
+
+def price_for(model: str):
+    """Price entry for ``model``, matched without a ``provider:`` or ``models/`` prefix."""
+    name = (model or "").split(":")[-1].split("/")[-1]
+    return PRICES.get(model) or PRICES.get(name)
+
+
+def cost(usage: TokenUsage, price) -> float:
+    """USD for ``usage`` at a ``price_for`` entry; cached prompt tokens at the cached rate when given."""
+    cached_rate = price[2] if len(price) > 2 else price[0]
+    fresh_prompt = usage.prompt_tokens - usage.cached_prompt_tokens
+    return (fresh_prompt * price[0] + usage.cached_prompt_tokens * cached_rate
+            + usage.completion_tokens * price[1]) / 1e6
+
+
+class LLMCall:
+    def __init__(self, task, model, prompt="adhoc"):
+        self.task = task or "default"
+        self.model = model
+        self.prompt = prompt
+        self.cache_hit = None
+        self.usage = TokenUsage()
+
+
+@contextmanager
+def llm_call(task, model, sample=0, prompt="adhoc"):
+    """Record one ``cached_*_llm`` call of template ``prompt``; the caller sets ``call.cache_hit``."""
+    call = LLMCall(task, model, prompt)
+    if sample:
+        LLM_RETRIES.inc(task=call.task, reason="resample")
+    token = _call_usage.set(call.usage)
+    start = time.perf_counter()
+    try:
+        with span("llm_call", task=call.task, model=str(model)):
+            yield call
+    except Exception:
+        LLM_ERRORS.inc(task=call.task)
+        raise
+    finally:
+        _call_usage.reset(token)
+        elapsed = time.perf_counter() - start
+        cache = "hit" if call.cache_hit else "miss"
+        if call.cache_hit is not None:
+            LLM_CACHE.inc(task=call.task, result=cache)
+        LLM_SECONDS.observe(elapsed, task=call.task, cache=cache)
+        usage = call.usage
+        if usage.total_tokens:
+            LLM_TOKENS.inc(usage.prompt_tokens, task=call.task, kind="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens, task=call.task, kind="completion")
+            LLM_TOKENS.inc(usage.cached_prompt_tokens, task=call.task, kind="cached_prompt")
+            if usage.prompt_tokens:
+                LLM_PROMPT_TOKENS.observe(usage.prompt_tokens, prompt=call.prompt)
+                LLM_PREFIX_CACHE.inc(prompt=call.prompt, result="hit" if usage.cached_prompt_tokens else "miss")
+            price = price_for(model)
+            if price:
+                LLM_COST.inc(cost(usage, price), task=call.task)
+            run_usage = _run_usage.get()
+            if run_usage is not None:
+                run_usage.add(usage.prompt_tokens, usage.completion_tokens, usage.cached_prompt_tokens)
+        logger.debug("llm %s: cache %s, %.1f ms, %d+%d tokens (%d cached)", call.task, cache, elapsed * 1000,
+                     usage.prompt_tokens, usage.completion_tokens, usage.cached_prompt_tokens)
+
+
+# --- nodes, runs, checkpoints ---
+def instrument_node(name: str, node):
+    """Wrap a sync or async graph node so each call is timed (and a span)."""
+    def record(start, failed):
+        elapsed = time.perf_counter() - start
+        NODE_SECONDS.observe(elapsed, node=name)
+        if failed:
+            NODE_ERRORS.inc(node=name)
+        logger.debug("node %s: %.1f ms%s", name, elapsed * 1000, " (failed)" if failed else "")
+
+    if iscoroutinefunction(node):
+        @wraps(node)
+        async def timed_async(state):
+            start, failed = time.perf_counter(), True
+            try:
+                with span(f"node {name}", node=name):
+                    result = await node(state)
+                failed = False
+                return result
+            finally:
+                record(start, failed)
+        return timed_async
+
+    @wraps(node)
+    def timed(state):
+        start, failed = time.perf_counter(), True
+        try:
+            with span(f"node {name}", node=name):
+                result = node(state)
+            failed = False
+            return result
+        finally:
+            record(start, failed)
+    return timed
+
+
+@contextmanager
+def graph_run(entry: str):
+    """Time one user turn and add up the tokens its LLM calls used."""
+    usage = TokenUsage()
+    token = _run_usage.set(usage)
+    start = time.perf_counter()
+    try:
+        with span("graph_run", entry=entry):
+            yield usage
+    finally:
+        _run_usage.reset(token)
+        RUN_SECONDS.observe(time.perf_counter() - start, entry=entry)
+        RUN_TOKENS.observe(usage.total_tokens, entry=entry)
+
+
+@contextmanager
+def checkpoint_write(op: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHECKPOINT_WRITE_SECONDS.observe(time.perf_counter() - start, op=op)
+
+
+# --- exposition ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port: int, addr="0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` on a daemon thread; later calls return the running server."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info("serving metrics on http://%s:%d/metrics", addr, port)
+    return _server
+
+
+def serve_from_env():
+    """Start the metrics server when ``METRICS_PORT`` is set (``0``/unset = off)."""
+    port = int(os.getenv("METRICS_PORT", "0"))
+    return start_server(port, os.getenv("METRICS_ADDR", "0.0.0.0")) if port else None
@@ -0,0 +1,73 @@
+"""Prompt templates laid out for provider prefix caching.
+
+Providers cache the longest prefix a request shares with recent ones
+(Gemini implicit caching, Groq and OpenAI-compatible prompt caching), so every
+template is static instructions first and the per-request fields last: all
+calls of one template share their instructions byte for byte, whatever the
+topic, tone, audience or draft.
+
+Templates are registered once at import (``register``) and compiled into
+literal/field pieces, so ``render`` only joins strings.  The result is a
+``Prompt``: a plain ``str`` (cache keys, token estimates and models see the
+same text as before) that also knows its template and static prefix.
+Cached-prefix hits are read from the usage the model reports and recorded in
+``state.metrics``.
+"""
+from string import Formatter
+
+SEPARATOR = "\n\n"
+
+
+class Prompt(str):
+    """Rendered prompt text that remembers the template it came from."""
+
+    template = None
+
+    def __new__(cls, text: str, template=None):
+        prompt = super().__new__(cls, text)
+        prompt.template = template
+        return prompt
+
+    @property
+    def static_prefix(self) -> str:
+        return self.template.prefix if self.template is not None else ""
+
+
+class PromptTemplate:
+    """Static ``instructions`` followed by a ``variables`` section with ``{field}`` placeholders."""
+
+    def __init__(self, name: str, instructions: str, variables: str):
+        self.name = name
+        self.prefix = instructions.strip() + SEPARATOR
+        self._pieces = [(literal, field) for literal, field, _, _ in Formatter().parse(variables.strip())]
+        self.fields = tuple(field for _, field in self._pieces if field)
+
+    def render(self, **values) -> Prompt:
+        missing = set(self.fields) - values.keys()
+        if missing:
+            raise KeyError(f"prompt {self.name!r} needs {', '.join(sorted(missing))}")
+        parts = [self.prefix]
+        for literal, field in self._pieces:
+            parts.append(literal)
+            if field:
+                parts.append(str(values[field]))
+        return Prompt("".join(parts), self)
+
+
+TEMPLATES = {}
+
+
+def register(name: str, instructions: str, variables: str) -> PromptTemplate:
+    """Compile and register a template; registering a name again replaces it."""
+    TEMPLATES[name] = template = PromptTemplate(name, instructions, variables)
+    return template
+
+
+def render(name: str, **values) -> Prompt:
+    return TEMPLATES[name].render(**values)
+
+
+def template_name(prompt) -> str:
+    """Metric label for ``prompt``: its template name, or ``adhoc`` for plain strings."""
+    template = getattr(prompt, "template", None)
+    return template.name if template is not None else "adhoc"
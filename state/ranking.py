@@ -0,0 +1,103 @@
+"""Cheap local scoring of LinkedIn drafts, used to rank parallel variants.
+
+``score_post`` rates a draft between 0 and 1 on the things the generation
+prompt asks for and readers notice first: a short hook, 3-7 hashtags, short
+sentences, line breaks between paragraphs and a question or call to action at
+the end.  ``rank_variants`` puts drafts that passed ``PostValidator`` first and
+orders each group by that score.  No model calls, so ranking N variants costs
+microseconds.
+"""
+import re
+from typing import NamedTuple
+
+HASHTAG = re.compile(r"(?<!\w)#\w+")
+SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)")
+CALL_TO_ACTION = re.compile(
+    r"\?|\b(comment|share|tell me|let me know|what do you think|thoughts|agree|join|follow|dm me|reach out)\b",
+    re.IGNORECASE,
+)
+
+HOOK_MAX_WORDS = 15
+HASHTAGS_MIN, HASHTAGS_MAX = 3, 7
+SENTENCE_WORDS_MAX = 20
+PARAGRAPH_WORDS_MAX = 60
+
+WEIGHTS = {"hook": 0.3, "hashtags": 0.2, "readability": 0.2, "line_breaks": 0.15, "call_to_action": 0.15}
+
+
+def paragraphs(post: str) -> list:
+    return [p.strip() for p in re.split(r"\n\s*\n", post or "") if p.strip()]
+
+
+def hook_score(post: str) -> float:
+    """1 for a first line of at most ``HOOK_MAX_WORDS`` words, falling off for longer ones."""
+    lines = [line for line in (post or "").strip().splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    words = len(HASHTAG.sub("", lines[0]).split())
+    return 1.0 if words <= HOOK_MAX_WORDS else HOOK_MAX_WORDS / words
+
+
+def hashtag_score(post: str) -> float:
+    count = len(HASHTAG.findall(post or ""))
+    if HASHTAGS_MIN <= count <= HASHTAGS_MAX:
+        return 1.0
+    distance = HASHTAGS_MIN - count if count < HASHTAGS_MIN else count - HASHTAGS_MAX
+    return max(0.0, 1.0 - distance / HASHTAGS_MIN)
+
+
+def readability_score(post: str) -> float:
+    """Average words per sentence, ignoring hashtags; 1 up to ``SENTENCE_WORDS_MAX``."""
+    text = HASHTAG.sub("", post or "")
+    words = len(text.split())
+    if not words:
+        return 0.0
+    sentences = max(1, len(SENTENCE_END.findall(text)))
+    per_sentence = words / sentences
+    return 1.0 if per_sentence <= SENTENCE_WORDS_MAX else SENTENCE_WORDS_MAX / per_sentence
+
+
+def line_break_score(post: str) -> float:
+    """Several short paragraphs rather than one block."""
+    parts = paragraphs(post)
+    if not parts:
+        return 0.0
+    spread = min(1.0, (len(parts) - 1) / 2)
+    longest = max(len(p.split()) for p in parts)
+    compact = 1.0 if longest <= PARAGRAPH_WORDS_MAX else PARAGRAPH_WORDS_MAX / longest
+    return spread * compact
+
+
+def call_to_action_score(post: str) -> float:
+    parts = [HASHTAG.sub("", p).strip() for p in paragraphs(post)]
+    parts = [p for p in parts if p]
+    return 1.0 if parts and CALL_TO_ACTION.search(parts[-1]) else 0.0
+
+
+def score_details(post: str) -> dict:
+    return {
+        "hook": hook_score(post),
+        "hashtags": hashtag_score(post),
+        "readability": readability_score(post),
+        "line_breaks": line_break_score(post),
+        "call_to_action": call_to_action_score(post),
+    }
+
+
+def score_post(post: str) -> float:
+    details = score_details(post)
+    return round(sum(WEIGHTS[name] * value for name, value in details.items()), 4)
+
+
+class Variant(NamedTuple):
+    post: str
+    valid: bool
+    score: float
+
+
+def rank_variants(posts: list, validations: list) -> list:
+    """``Variant``s best first: valid before invalid, then by ``score_post``; ties keep generation order."""
+    variants = [Variant(post, str(validation).strip() == "Valid", score_post(post))
+                for post, validation in zip(posts, validations)]
+    order = sorted(range(len(variants)), key=lambda i: (not variants[i].valid, -variants[i].score, i))
+    return [variants[i] for i in order]
@@ -0,0 +1,552 @@
+"""Route LLM calls across providers and models, per task.
+
+Each task (``validate``, ``generate``, ``sentiment``, ``rewrite``) has an
+ordered list of models, e.g. a fast, cheap model for the checks and a
+stronger one for drafting:
+
+    LLM_ROUTE_DEFAULT=gemini:gemini-2.0-flash
+    LLM_ROUTE_VALIDATE=groq:llama-3.1-8b-instant,gemini:gemini-2.0-flash
+    LLM_ROUTE_GENERATE=gemini:gemini-2.0-flash,groq:llama-3.3-70b-versatile
+
+A call goes to the first healthy model of its task. On an error or a timeout
+it fails over to the next one.  With hedging on, a duplicate request is sent
+to the next model once the first has run past its rolling p95 latency, and
+the first answer wins.  Models whose recent error rate is too high are tried
+last until their errors age out of the window.  Streams fail over only before
+their first token: a stream with no token by ``first_token_factor`` times its
+model's rolling p95 time to first token (or ``timeout`` until there are enough
+samples) is cancelled for the next model, or, with hedging on, raced against
+it; the first to produce a token wins and the other is cancelled.  A sync attempt that times out is abandoned but keeps its
+thread until the provider answers, so each model has at most
+``max_in_flight`` calls running; a model at its cap is skipped like a failed
+one, and a slow provider cannot take every worker.
+
+``router.for_task(task)`` returns a ``RoutedModel``, which offers the same
+``invoke``/``stream``/``ainvoke``/``astream``/``with_structured_output``
+subset of the chat-model interface that the nodes use.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from queue import Empty, SimpleQueue
+
+from state import metrics
+
+TASKS = ("validate", "generate", "sentiment", "rewrite")
+
+
+class AllRoutesFailed(RuntimeError):
+    """Every model of a task failed; the message lists each model's error."""
+
+
+def build_model(spec: str):
+    """Chat model for a ``provider:model`` spec (``gemini``, ``groq`` or ``fake``)."""
+    provider, _, model = spec.partition(":")
+    provider = provider.strip().lower()
+    model = model.strip()
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model or "gemini-2.0-flash")
+    if provider == "groq":
+        try:
+            from langchain_groq import ChatGroq
+        except ImportError as e:
+            raise ImportError("LLM provider 'groq' needs the langchain_groq package") from e
+        return ChatGroq(model=model)
+    if provider == "fake":
+        from state.fake_llm import FakeChatModel
+        return FakeChatModel(
+            model=model or "fake-chat",
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0")),
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+            prefix_cache_words=int(os.getenv("FAKE_LLM_PREFIX_CACHE_WORDS", "0")),
+        )
+    raise ValueError(f"Unknown LLM provider {provider!r} in {spec!r}")
+
+
+class RollingStats:
+    """Latency and error rate over the last ``size`` calls no older than ``max_age`` seconds."""
+
+    def __init__(self, size=100, max_age=300.0):
+        self.size = size
+        self.max_age = max_age
+        self._samples = deque(maxlen=size)  # (finished_at, seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds, ok))
+
+    def recent(self) -> list:
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            return [sample for sample in self._samples if sample[0] >= cutoff]
+
+    def percentile(self, pct: float, min_samples=1):
+        latencies = sorted(seconds for _, seconds, ok in self.recent() if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[max(0, math.ceil(pct / 100 * len(latencies)) - 1)]
+
+    def error_rate(self, min_samples=1) -> float:
+        samples = self.recent()
+        if len(samples) < min_samples:
+            return 0.0
+        return sum(not ok for _, _, ok in samples) / len(samples)
+
+    def summary(self) -> dict:
+        samples = self.recent()
+        return {
+            "calls": len(samples),
+            "error_rate": round(self.error_rate(), 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+class Route:
+    """One model in a task's list; the client is built on first use."""
+
+    def __init__(self, spec: str, model=None, stats: RollingStats = None):
+        self.spec = spec
+        self._model = model
+        self._lock = threading.Lock()
+        self.stats = stats or RollingStats()
+        self.first_token = RollingStats()  # seconds to the first chunk of a stream
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = build_model(self.spec)
+        return self._model
+
+
+class _Attempt:
+    """One sync attempt on a route; the first side to ``settle`` it (the call or its timeout) records it."""
+
+    __slots__ = ("route", "deadline", "_lock", "_settled")
+
+    def __init__(self, route: Route, deadline: float):
+        self.route = route
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._settled = False
+
+    def settle(self) -> bool:
+        with self._lock:
+            first, self._settled = not self._settled, True
+        return first
+
+
+class _StreamAttempt:
+    """One stream on a route, racing for the first token."""
+
+    __slots__ = ("route", "start", "deadline", "expires", "stop", "task")
+
+    def __init__(self, route: Route, first_token_delay: float, timeout: float):
+        self.route = route
+        self.start = time.monotonic()
+        self.deadline = self.start + first_token_delay  # start the next model
+        self.expires = self.start + timeout  # give up on this one
+        self.stop = threading.Event()
+        self.task = None  # the pump task of an async stream
+
+
+class LLMRouter:
+    def __init__(self, routes: dict, *, timeout=30.0, hedge=False, hedge_min_samples=20,
+                 max_error_rate=0.5, health_min_samples=5, max_in_flight=16, first_token_factor=2.0):
+        """``routes`` maps a task (or ``"default"``) to its ordered ``Route`` list."""
+        self.routes = routes
+        self.timeout = timeout
+        self.first_token_factor = first_token_factor
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.max_error_rate = max_error_rate
+        self.health_min_samples = health_min_samples
+        self.max_in_flight = max_in_flight
+        specs = {route.spec for task_routes in routes.values() for route in task_routes}
+        self._slots = {spec: threading.BoundedSemaphore(max_in_flight) for spec in specs}
+        # Enough workers for every route at its cap.
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight * len(specs), thread_name_prefix="llm-router")
+
+    def for_task(self, task=None) -> "RoutedModel":
+        return RoutedModel(self, task)
+
+    def candidates(self, task) -> list:
+        routes = self.routes.get(task) or self.routes["default"]
+        healthy = [r for r in routes if r.stats.error_rate(self.health_min_samples) < self.max_error_rate]
+        return healthy + [r for r in routes if r not in healthy]
+
+    def hedge_delay(self, route: Route):
+        if not self.hedge:
+            return None
+        return route.stats.percentile(95, self.hedge_min_samples)
+
+    def first_token_delay(self, route: Route) -> float:
+        """How long a stream on ``route`` may go without a token before the next model is started."""
+        p95 = route.first_token.percentile(95, self.hedge_min_samples)
+        return self.timeout if p95 is None else min(self.timeout, p95 * self.first_token_factor)
+
+    def stats(self) -> dict:
+        seen = {}
+        for routes in self.routes.values():
+            for route in routes:
+                if route.spec not in seen:
+                    seen[route.spec] = {**route.stats.summary(), "first_token_p95": route.first_token.percentile(95)}
+        return seen
+
+    # --- sync ---
+    def _timed(self, attempt: _Attempt, call):
+        route = attempt.route
+        start = time.perf_counter()
+        try:
+            result = call(route.model)
+        except Exception:
+            if attempt.settle():
+                route.stats.record(time.perf_counter() - start, False)
+            raise
+        finally:
+            self._slots[route.spec].release()
+        # Not recorded again when the attempt already counted as timed out.
+        if attempt.settle():
+            route.stats.record(time.perf_counter() - start, True)
+        return result
+
+    def call(self, task, call):
+        """Run ``call(model)`` with failover and optional hedging; return the first success."""
+        queue = self.candidates(task)
+        pending = {}  # future -> _Attempt
+        errors = []
+        hedged = False
+
+        def launch():
+            while queue:
+                route = queue.pop(0)
+                if not self._slots[route.spec].acquire(blocking=False):
+                    errors.append(f"{route.spec}: {self.max_in_flight} calls already in flight")
+                    continue
+                attempt = _Attempt(route, time.monotonic() + self.timeout)
+                # Each attempt runs in a copy of the caller's context (callbacks, run config).
+                future = self._executor.submit(contextvars.copy_context().run, self._timed, attempt, call)
+                pending[future] = attempt
+                return
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            wait_for = min(attempt.deadline for attempt in pending.values()) - now
+            hedge_after = None
+            if not hedged and queue and len(pending) == 1:
+                attempt, = pending.values()
+                hedge_after = self.hedge_delay(attempt.route)
+                if hedge_after is not None:
+                    wait_for = min(wait_for, attempt.deadline - self.timeout + hedge_after - now)
+            done, _ = wait(list(pending), timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            for future in done:
+                route = pending.pop(future).route
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{route.spec}: {e}")
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                # An attempt that finished just now is left for the next wait to collect.
+                if now >= attempt.deadline and attempt.settle():
+                    # Abandoned; the thread finishes in the background and then frees its slot.
+                    del pending[future]
+                    attempt.route.stats.record(self.timeout, False)
+                    errors.append(f"{attempt.route.spec}: timed out after {self.timeout}s")
+            if queue and (not pending or (hedge_after is not None and not done)):
+                hedged = hedged or bool(pending)
+                metrics.LLM_RETRIES.inc(task=task or "default", reason="hedge" if pending else "failover")
+                launch()
+        raise AllRoutesFailed(f"all models failed for task {task!r}: " + "; ".join(errors))
+
+    def _pump(self, attempt: _StreamAttempt, open_stream, events: SimpleQueue):
+        """Feed a stream's chunks to ``events`` until it ends or ``attempt.stop`` is set."""
+        chunks = None
+        try:
+            chunks = iter(open_stream(attempt.route.model))
+            for chunk in chunks:
+                if attempt.stop.is_set():
+                    break
+                events.put((attempt, "chunk", chunk))
+            events.put((attempt, "end", None))
+        except Exception as e:
+            events.put((attempt, "error", e))
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._slots[attempt.route.spec].release()
+
+    def stream(self, task, open_stream):
+        """Stream from the first model to produce a token; see the module docstring."""
+        queue = self.candidates(task)
+        live = []
+        errors = []
+        events = SimpleQueue()  # (attempt, kind, payload)
+
+        def launch(reason):
+            while queue:
+                route = queue.pop(0)
+                if not self._slots[route.spec].acquire(blocking=False):
+                    errors.append(f"{route.spec}: {self.max_in_flight} calls already in flight")
+                    continue
+                if reason:
+                    metrics.LLM_RETRIES.inc(task=task or "default", reason=reason)
+                attempt = _StreamAttempt(route, self.first_token_delay(route), self.timeout)
+                live.append(attempt)
+                self._executor.submit(contextvars.copy_context().run, self._pump, attempt, open_stream, events)
+                return
+
+        def drop(attempt, error):
+            # The thread stops at its next chunk, or when the provider gives up.
+            attempt.stop.set()
+            live.remove(attempt)
+            attempt.route.stats.record(time.monotonic() - attempt.start, False)
+            errors.append(f"{attempt.route.spec}: {error}")
+
+        launch(None)
+        winner = None
+        try:
+            while live and winner is None:
+                wait_for = min(min(a.deadline, a.expires) for a in live) - time.monotonic()
+                try:
+                    attempt, kind, payload = events.get(timeout=max(0.0, wait_for))
+                except Empty:
+                    self._first_token_overdue(live, queue, launch, drop)
+                    continue
+                if attempt not in live:
+                    continue  # a dropped stream
+                if kind == "error":
+                    drop(attempt, payload)
+                    if not live:
+                        launch("failover")
+                    continue
+                winner = attempt
+                if kind == "chunk":
+                    winner.route.first_token.record(time.monotonic() - winner.start, True)
+                for loser in [a for a in live if a is not winner]:
+                    loser.stop.set()
+                live[:] = [winner]
+            if winner is None:
+                raise AllRoutesFailed(f"all models failed for task {task!r}: " + "; ".join(errors))
+            while True:
+                if kind == "end":
+                    winner.route.stats.record(time.monotonic() - winner.start, True)
+                    return
+                if kind == "error":
+                    winner.route.stats.record(time.monotonic() - winner.start, False)
+                    raise payload
+                yield payload
+                attempt, kind, payload = events.get()
+                while attempt is not winner:
+                    attempt, kind, payload = events.get()
+        finally:
+            for attempt in live:
+                attempt.stop.set()
+
+    def _first_token_overdue(self, live, queue, launch, drop):
+        """Start the next model for an overdue stream (racing it when hedging); drop expired streams."""
+        now = time.monotonic()
+        for attempt in list(live):
+            if now >= attempt.expires:
+                drop(attempt, f"no first token after {self.timeout}s")
+            elif now >= attempt.deadline:
+                attempt.deadline = math.inf
+                if queue and not self.hedge:
+                    drop(attempt, f"no first token after {now - attempt.start:.2f}s")
+                if queue:
+                    launch("hedge" if self.hedge else "failover")
+        if not live and queue:
+            launch("failover")
+
+    # --- async ---
+    async def _atimed(self, route: Route, call):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(route.model), self.timeout)
+        except asyncio.TimeoutError:
+            route.stats.record(self.timeout, False)
+            raise TimeoutError(f"timed out after {self.timeout}s") from None
+        except Exception:
+            route.stats.record(time.perf_counter() - start, False)
+            raise
+        route.stats.record(time.perf_counter() - start, True)
+        return result
+
+    async def acall(self, task, call):
+        """Async ``call``: losing hedged requests are cancelled."""
+        queue = self.candidates(task)
+        pending = {}  # task -> route
+        errors = []
+        hedged = False
+
+        def launch():
+            route = queue.pop(0)
+            pending[asyncio.ensure_future(self._atimed(route, call))] = route
+
+        launch()
+        try:
+            while pending:
+                hedge_after = None
+                if not hedged and queue and len(pending) == 1:
+                    hedge_after = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(list(pending), timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    route = pending.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        errors.append(f"{route.spec}: {e}")
+                if queue and (not pending or not done):
+                    hedged = hedged or bool(pending)
+                    metrics.LLM_RETRIES.inc(task=task or "default", reason="hedge" if pending else "failover")
+                    launch()
+        finally:
+            for future in pending:
+                future.cancel()
+        raise AllRoutesFailed(f"all models failed for task {task!r}: " + "; ".join(errors))
+
+    async def _apump(self, attempt: _StreamAttempt, open_stream, events: asyncio.Queue):
+        chunks = open_stream(attempt.route.model)
+        try:
+            async for chunk in chunks:
+                events.put_nowait((attempt, "chunk", chunk))
+            events.put_nowait((attempt, "end", None))
+        except Exception as e:
+            events.put_nowait((attempt, "error", e))
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+    async def astream(self, task, open_stream):
+        """Async ``stream``: overdue and losing streams are cancelled."""
+        queue = self.candidates(task)
+        live = []
+        errors = []
+        events = asyncio.Queue()  # (attempt, kind, payload)
+
+        def launch(reason):
+            route = queue.pop(0)
+            if reason:
+                metrics.LLM_RETRIES.inc(task=task or "default", reason=reason)
+            attempt = _StreamAttempt(route, self.first_token_delay(route), self.timeout)
+            attempt.task = asyncio.ensure_future(self._apump(attempt, open_stream, events))
+            live.append(attempt)
+
+        def drop(attempt, error):
+            attempt.task.cancel()
+            live.remove(attempt)
+            attempt.route.stats.record(time.monotonic() - attempt.start, False)
+            errors.append(f"{attempt.route.spec}: {error}")
+
+        launch(None)
+        winner = None
+        try:
+            while live and winner is None:
+                wait_for = min(min(a.deadline, a.expires) for a in live) - time.monotonic()
+                try:
+                    attempt, kind, payload = await asyncio.wait_for(events.get(), max(0.0, wait_for))
+                except asyncio.TimeoutError:
+                    self._first_token_overdue(live, queue, launch, drop)
+                    continue
+                if attempt not in live:
+                    continue
+                if kind == "error":
+                    drop(attempt, payload)
+                    if not live and queue:
+                        launch("failover")
+                    continue
+                winner = attempt
+                if kind == "chunk":
+                    winner.route.first_token.record(time.monotonic() - winner.start, True)
+                for loser in [a for a in live if a is not winner]:
+                    loser.task.cancel()
+                live[:] = [winner]
+            if winner is None:
+                raise AllRoutesFailed(f"all models failed for task {task!r}: " + "; ".join(errors))
+            while True:
+                if kind == "end":
+                    winner.route.stats.record(time.monotonic() - winner.start, True)
+                    return
+                if kind == "error":
+                    winner.route.stats.record(time.monotonic() - winner.start, False)
+                    raise payload
+                yield payload
+                attempt, kind, payload = await events.get()
+                while attempt is not winner:
+                    attempt, kind, payload = await events.get()
+        finally:
+            for attempt in live:
+                attempt.task.cancel()
+
+
+class RoutedModel:
+    """The chat-model calls used by the nodes, routed for one task."""
+
+    def __init__(self, router: LLMRouter, task=None, schema=None):
+        self.router = router
+        self.task = task
+        self.schema = schema
+        primary = (router.routes.get(task) or router.routes["default"])[0]
+        # Cache entries are keyed by the task's primary model.
+        self.model = primary.spec
+
+    def _runnable(self, model):
+        return model if self.schema is None else model.with_structured_output(self.schema)
+
+    def with_structured_output(self, schema, **kwargs):
+        return RoutedModel(self.router, self.task, schema)
+
+    def invoke(self, messages, **kwargs):
+        return self.router.call(self.task, lambda model: self._runnable(model).invoke(messages, **kwargs))
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.router.acall(self.task, lambda model: self._runnable(model).ainvoke(messages, **kwargs))
+
+    def stream(self, messages, **kwargs):
+        return self.router.stream(self.task, lambda model: model.stream(messages, **kwargs))
+
+    def astream(self, messages, **kwargs):
+        return self.router.astream(self.task, lambda model: model.astream(messages, **kwargs))
+
+
+def routes_from_env() -> dict:
+    """``LLM_ROUTE_DEFAULT`` and ``LLM_ROUTE_<TASK>`` as comma-separated ``provider:model`` lists."""
+    specs = {"default": os.getenv("LLM_ROUTE_DEFAULT", "")}
+    for task in TASKS:
+        specs[task] = os.getenv(f"LLM_ROUTE_{task.upper()}", "")
+    shared = {}  # one Route (client and stats) per spec, whichever tasks use it
+    routes = {}
+    for task, value in specs.items():
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        if names:
+            routes[task] = [shared.setdefault(name, Route(name)) for name in names]
+    if routes and "default" not in routes:
+        routes["default"] = next(iter(routes.values()))
+    return routes
+
+
+def router_from_env():
+    """An ``LLMRouter`` when any ``LLM_ROUTE_*`` is set, otherwise ``None``."""
+    routes = routes_from_env()
+    if not routes:
+        return None
+    return LLMRouter(
+        routes,
+        timeout=float(os.getenv("LLM_ROUTER_TIMEOUT_SECONDS", "30")),
+        hedge=os.getenv("LLM_ROUTER_HEDGE", "0") != "0",
+        hedge_min_samples=int(os.getenv("LLM_ROUTER_HEDGE_MIN_SAMPLES", "20")),
+        max_error_rate=float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5")),
+        max_in_flight=int(os.getenv("LLM_ROUTER_MAX_IN_FLIGHT", "16")),
+        first_token_factor=float(os.getenv("LLM_ROUTER_FIRST_TOKEN_FACTOR", "2")),
+    )
@@ -0,0 +1,200 @@
+"""Near-duplicate lookup of generated posts by topic similarity.
+
+The exact response cache only hits when the prompt is identical.  This index
+keeps an embedding of the topic of every post that passed post-validation,
+bucketed by model, tone and audience, and finds the most similar earlier topic for a new request:
+
+- at or above ``reuse_threshold`` the earlier post is returned as is and the
+  generation is skipped;
+- at or above ``adapt_threshold`` the earlier post is the starting point of a
+  rewrite for the new topic;
+- below that the post is generated from scratch.
+
+The default ``HashingEmbedder`` runs locally with no model download: hashed
+word and character-trigram features of the topic, with filler words dropped,
+so "AI in hiring" and "AI for hiring" land on the same vector.  Any LangChain
+``Embeddings`` object (e.g. ``GoogleGenerativeAIEmbeddings``) can be passed
+instead.  Entries live in a SQLite table next to the response cache, so every
+process sees the same index.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from typing import NamedTuple
+
+from state.cache import DEFAULT_CACHE_DB
+from state.checkpoint import SqliteConnectionPool
+
+# Filler only: contrast and question words ("vs", "how", "why", "what") change
+# what a post is about, so "Humans vs AI" must not match "Humans and AI" as is.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or our the their this to us we with your".split()
+)
+
+
+def canonical_topic(topic: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a topic."""
+    return " ".join(re.findall(r"[\w+#]+", (topic or "").casefold()))
+
+
+class HashingEmbedder:
+    """Local topic embedding: signed feature hashing of words and character trigrams."""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def features(self, text: str) -> list:
+        words = [w for w in canonical_topic(text).split() if w not in STOPWORDS]
+        features = [f"w:{w}" for w in words]
+        for word in words:
+            padded = f"<{word}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed_query(self, text: str) -> list:
+        vector = [0.0] * self.dim
+        for feature in self.features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            # Whole words weigh more than the trigrams they are made of.
+            weight = 2.0 if feature.startswith("w:") else 1.0
+            vector[index] += weight if digest[4] & 1 else -weight
+        return vector
+
+
+def normalize(vector) -> array:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array("f", (x / norm for x in vector))
+
+
+class Match(NamedTuple):
+    post: str
+    topic: str
+    score: float
+
+
+class SemanticPostIndex:
+    """SQLite-backed index of ``(model, tone, audience, topic) -> post``."""
+
+    def __init__(self, database=DEFAULT_CACHE_DB, embedder=None, reuse_threshold=0.92,
+                 adapt_threshold=0.75, max_entries=10000, bucket_limit=500, pool_size=4):
+        self.embedder = embedder or HashingEmbedder()
+        self.reuse_threshold = reuse_threshold
+        self.adapt_threshold = adapt_threshold
+        self.max_entries = max_entries
+        # Most recent entries compared per (model, tone, audience) bucket.
+        self.bucket_limit = bucket_limit
+        self.reused = 0
+        self.adapted = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self.pool = SqliteConnectionPool(database, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS semantic_posts (
+                    key TEXT PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    post TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS semantic_posts_bucket ON semantic_posts (bucket, created_at);
+                """
+            )
+
+    @staticmethod
+    def bucket(model: str, tone: str, audience: str) -> str:
+        return "\x1f".join([model or "", " ".join(tone.casefold().split()), " ".join(audience.casefold().split())])
+
+    def embed(self, topic: str) -> array:
+        return normalize(self.embedder.embed_query(canonical_topic(topic)))
+
+    def _count(self, match):
+        with self._stats_lock:
+            if match is None or match.score < self.adapt_threshold:
+                self.misses += 1
+            elif match.score >= self.reuse_threshold:
+                self.reused += 1
+            else:
+                self.adapted += 1
+
+    def lookup(self, model: str, topic: str, tone: str, audience: str):
+        """Closest earlier post in the bucket at or above ``adapt_threshold``, or ``None``."""
+        query = self.embed(topic)
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT topic, vector, post FROM semantic_posts WHERE bucket = ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (self.bucket(model, tone, audience), self.bucket_limit),
+            ).fetchall()
+        best = None
+        for prior_topic, blob, post in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            score = sum(a * b for a, b in zip(query, vector))
+            if best is None or score > best.score:
+                best = Match(post, prior_topic, score)
+        self._count(best)
+        return best if best is not None and best.score >= self.adapt_threshold else None
+
+    def add(self, model: str, topic: str, tone: str, audience: str, post: str):
+        """Index ``post`` under its topic; a later post for the same topic replaces it."""
+        bucket = self.bucket(model, tone, audience)
+        key = hashlib.sha256(f"{bucket}\x1f{canonical_topic(topic)}".encode("utf-8")).hexdigest()
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO semantic_posts (key, bucket, topic, vector, post, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, bucket, topic, self.embed(topic).tobytes(), post, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM semantic_posts WHERE key IN ("
+                " SELECT key FROM semantic_posts ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def clear(self):
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM semantic_posts")
+            conn.commit()
+
+    def stats(self) -> dict:
+        total = self.reused + self.adapted + self.misses
+        with self.pool.connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM semantic_posts").fetchone()[0]
+        return {
+            "reused": self.reused,
+            "adapted": self.adapted,
+            "misses": self.misses,
+            "hit_rate": (self.reused + self.adapted) / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+def embedder_from_env():
+    """``SEMANTIC_CACHE_EMBEDDINGS``: ``hash`` (local, default) or ``gemini:<model>``."""
+    spec = os.getenv("SEMANTIC_CACHE_EMBEDDINGS", "hash")
+    if spec.startswith("gemini:"):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=spec.split(":", 1)[1])
+    return HashingEmbedder()
+
+
+def semantic_index_from_env():
+    """Index configured by ``SEMANTIC_CACHE`` and friends, or ``None`` when it is off."""
+    if os.getenv("SEMANTIC_CACHE", "0").lower() in ("0", "false", "no", "off", ""):
+        return None
+    return SemanticPostIndex(
+        os.getenv("SEMANTIC_CACHE_DB", os.getenv("LLM_CACHE_DB", DEFAULT_CACHE_DB)),
+        embedder=embedder_from_env(),
+        reuse_threshold=float(os.getenv("SEMANTIC_CACHE_REUSE_THRESHOLD", "0.92")),
+        adapt_threshold=float(os.getenv("SEMANTIC_CACHE_ADAPT_THRESHOLD", "0.75")),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+    )
@@ -0,0 +1,140 @@
+"""Local fast path for classifying feedback as positive or negative.
+
+Most chat feedback is short and unambiguous ("looks good", "make it shorter").
+``classify`` handles it in microseconds with a few keyword rules backed by a
+small logistic-regression model stored in ``sentiment_model.json``.
+``local_sentiment`` returns a label only when the confidence reaches the
+threshold; otherwise the caller falls back to the LLM.  So does feedback made
+mostly of words the model never saw ("cringe", "redo"): its score would be
+little more than the bias.
+
+Retrain the model after editing the labelled data:
+
+    python -m state.sentiment train data/feedback_train.jsonl
+"""
+import json
+import math
+import os
+import random
+import re
+import sys
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_model.json")
+
+# Requests for a change; "but" turns praise into one ("nice, but ...").  Bare
+# negations are not cues: "don't change anything" is an approval.
+CHANGE_PATTERN = re.compile(
+    r"\b(but|make|add|remove|drop|cut|change|rewrite|shorten|shorter|longer|fewer|less|more|"
+    r"too|instead|fix|replace|improve|try again|start over|needs?|could|can you|"
+    r"please|avoid|use|include|mention|focus|target|split|end with|tone it)\b",
+    re.IGNORECASE,
+)
+APPROVAL_PATTERN = re.compile(
+    r"^\W*(looks? (good|great|perfect|fine)|perfect|love (it|this)|lgtm|ship it|post it|publish( it)?|"
+    r"approved?|(no( more)?|(i )?don'?t (want|need) any( more)?) (changes|edits)( needed| please)?|all good|good to go|nailed it|spot on|"
+    r"(that'?s|this is) (it|perfect|great)|yes|yep|ok(ay)?|👍)\W*$",
+    re.IGNORECASE,
+)
+RULE_CONFIDENCE = 0.97
+# Below this share of known words the model is guessing; report it as unsure.
+MIN_COVERAGE = 0.5
+UNSURE = 0.5
+
+_model = None
+
+
+def tokenize(text: str) -> list:
+    words = re.findall(r"[a-z']+|[^\w\s]", (text or "").lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def load_model() -> dict:
+    global _model
+    if _model is None:
+        with open(MODEL_PATH, encoding="utf-8") as f:
+            _model = json.load(f)
+    return _model
+
+
+def model_probability(text: str, model=None) -> float:
+    """Probability that ``text`` is positive according to the linear model."""
+    model = model or load_model()
+    weights = model["weights"]
+    score = model["bias"] + sum(weights.get(token, 0.0) for token in set(tokenize(text)))
+    return 1 / (1 + math.exp(-score))
+
+
+def coverage(text: str, model=None) -> float:
+    """Share of the words in ``text`` that the model has a weight for."""
+    weights = (model or load_model())["weights"]
+    words = re.findall(r"[a-z']+", (text or "").lower())
+    return sum(word in weights for word in words) / len(words) if words else 0.0
+
+
+def classify(text: str, model=None):
+    """Return ``(label, confidence)`` for a piece of feedback."""
+    text = (text or "").strip()
+    if not text:
+        return "negative", 0.0
+    if APPROVAL_PATTERN.match(text):
+        return "positive", RULE_CONFIDENCE
+    p_positive = model_probability(text, model)
+    if coverage(text, model) < MIN_COVERAGE:
+        return ("positive" if p_positive >= 0.5 else "negative"), UNSURE
+    if CHANGE_PATTERN.search(text):
+        if p_positive < 0.5:
+            return "negative", 1 - p_positive
+        if p_positive < 0.9:
+            # Change cue and model disagree: leave it to the LLM.
+            return "positive", UNSURE
+    if p_positive >= 0.5:
+        return "positive", p_positive
+    return "negative", 1 - p_positive
+
+
+def local_sentiment(text: str, threshold=None):
+    """Label from the local classifier, or ``None`` when it is not confident enough."""
+    if threshold is None:
+        threshold = float(os.getenv("SENTIMENT_LOCAL_THRESHOLD", "0.85"))
+    label, confidence = classify(text)
+    return label if confidence >= threshold else None
+
+
+def read_labelled(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def train(rows: list, epochs=200, learning_rate=0.5, l2=0.001, seed=7) -> dict:
+    """Fit a logistic regression over unigram and bigram presence features."""
+    examples = [(set(tokenize(row["text"])), 1.0 if row["label"] == "positive" else 0.0) for row in rows]
+    weights, bias = {}, 0.0
+    rng = random.Random(seed)
+    for _ in range(epochs):
+        rng.shuffle(examples)
+        for tokens, target in examples:
+            score = bias + sum(weights.get(t, 0.0) for t in tokens)
+            error = 1 / (1 + math.exp(-score)) - target
+            bias -= learning_rate * error
+            for t in tokens:
+                w = weights.get(t, 0.0)
+                weights[t] = w - learning_rate * (error + l2 * w)
+    weights = {t: round(w, 4) for t, w in sorted(weights.items()) if abs(w) >= 0.01}
+    return {"bias": round(bias, 4), "weights": weights}
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) < 2 or argv[0] != "train":
+        print("usage: python -m state.sentiment train LABELLED.jsonl [MODEL.json]")
+        return 2
+    model = train(read_labelled(argv[1]))
+    out = argv[2] if len(argv) > 2 else MODEL_PATH
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=0, sort_keys=True)
+    print(f"wrote {len(model['weights'])} weights to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
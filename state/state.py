@@ -1,144 +1,563 @@
-from langchain_core.messages import HumanMessage, AIMessage
-from typing import List, Optional, TypedDict
+from langchain_core.messages import HumanMessage
+from typing import Annotated, List, Optional, TypedDict
 from langchain_core.messages import BaseMessage
-import sqlite3
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
 from uuid import uuid4
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langgraph.graph import StateGraph, END
-import streamlit as st
+from langgraph.channels import DeltaChannel
+from langgraph.config import get_stream_writer
+from state.cache import cache_from_env, cache_key, canonical_labels
+from state.chat_render import FEEDBACK, FEEDBACK_USER, ORIGINAL, VALIDATION, VARIANT, ai_message
+from state.checkpoint import APPEND_FIELDS, append_items, saver_from_env
+from state.edits import EditError, apply_edits, encode_version, latest_draft, number_lines
+from state.gateway import gateway_from_env
+from state.ranking import rank_variants
+from state import metrics, prompts
+from state.router import LLMRouter, build_model, router_from_env
+from state.semantic_cache import semantic_index_from_env
+from state.sentiment import local_sentiment
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model= "gemini-2.0-flash")
+logger = logging.getLogger(__name__)
 
-conn = sqlite3.connect(database="linkedin.sqlite", check_same_thread=False)
+# Drafts generated per topic before the post validator is overruled and the
+# last draft goes to the human for review.
+MAX_GENERATION_ATTEMPTS = int(os.getenv("MAX_GENERATION_ATTEMPTS", "3"))
 
-saver = SqliteSaver(conn= conn)
+# Drafts generated in parallel per pass (multi pipeline). Each variant is
+# validated on its own; the best one becomes the draft, the others are shown
+# as alternatives so the user can pick one instead of asking for a rewrite.
+DRAFT_VARIANTS = max(1, int(os.getenv("DRAFT_VARIANTS", "1")))
+
+# "multi" runs one LLM call per check; "fused" folds the topic check, draft and
+# self-validation into one structured call, and sentiment into the rewrite call.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "multi").lower()
+
+# "full" rewrites the whole post on feedback; "edit" asks for line edits to the
+# current draft and applies them locally, falling back to a full rewrite when
+# most of the post has to change (multi pipeline).
+REWRITE_MODE = os.getenv("REWRITE_MODE", "full").lower()
+
+def create_llm():
+    """Per-task ``LLMRouter`` when ``LLM_ROUTE_*`` is set (see ``state.router``), otherwise
+    the single model selected by ``LLM_BACKEND``: ``gemini`` (default) or the offline ``fake``."""
+    router = router_from_env()
+    if router is not None:
+        return router
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "fake":
+        return build_model("fake:fake-chat")
+    return build_model("gemini:gemini-2.0-flash")
+
+# The LLM client, checkpointer, response cache and compiled graph are built on
+# first use, so importing this module (e.g. just for AgentState) stays cheap.
+_llm = None
+_saver = None
+_response_cache = None
+_semantic_index = None
+_semantic_index_loaded = False
+_gateway = None
+_graph = None
+_app = None
+_init_lock = threading.RLock()
+
+def get_llm(task=None):
+    """Chat model for ``task`` (``validate``, ``generate``, ``sentiment``, ``rewrite``)."""
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                _llm = create_llm()
+    if isinstance(_llm, LLMRouter):
+        return _llm.for_task(task)
+    return _llm
+
+def set_llm(new_llm):
+    """Swap the chat model (or ``LLMRouter``) used by every node (tests, benchmarks, other providers)."""
+    global _llm
+    _llm = new_llm
+
+def get_checkpointer():
+    global _saver
+    if _saver is None:
+        with _init_lock:
+            if _saver is None:
+                _saver = saver_from_env()
+    return _saver
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        with _init_lock:
+            if _response_cache is None:
+                _response_cache = cache_from_env()
+    return _response_cache
+
+def set_response_cache(cache):
+    global _response_cache
+    _response_cache = cache
+
+def get_gateway():
+    """Single-flight, rate limits and retries for upstream LLM calls (``state.gateway``)."""
+    global _gateway
+    if _gateway is None:
+        with _init_lock:
+            if _gateway is None:
+                _gateway = gateway_from_env()
+    return _gateway
+
+def set_gateway(gateway):
+    global _gateway
+    _gateway = gateway
+
+def get_semantic_index():
+    """Near-duplicate post index (``state.semantic_cache``), or ``None`` unless ``SEMANTIC_CACHE`` is on."""
+    global _semantic_index, _semantic_index_loaded
+    if not _semantic_index_loaded:
+        with _init_lock:
+            if not _semantic_index_loaded:
+                _semantic_index = semantic_index_from_env()
+                _semantic_index_loaded = True
+    return _semantic_index
+
+def set_semantic_index(index):
+    global _semantic_index, _semantic_index_loaded
+    _semantic_index, _semantic_index_loaded = index, True
+
+# Every Nth append to history/drafts stores a full snapshot; the checkpoints in
+# between hold only the new items, so their size stays flat as a chat grows.
+HISTORY_SNAPSHOT_EVERY = int(os.getenv("HISTORY_SNAPSHOT_EVERY", "50"))
 
 class AgentState(TypedDict):
     user_id: str
     topic: str
     tone: list[str]
     audience: list[str]
-    drafts: Optional[List[str]] = []
+    drafts: Annotated[List[str], DeltaChannel(append_items, snapshot_frequency=HISTORY_SNAPSHOT_EVERY)]
     best_post: Optional[str] = None
     feedback: Optional[str] = None
-    history: List[BaseMessage]
+    history: Annotated[List[BaseMessage], DeltaChannel(append_items, snapshot_frequency=HISTORY_SNAPSHOT_EVERY)]
     current_step: Optional[str] = None
     validation: Optional[str] = None
     on: str
     analysis: str
+    speculative_draft: Optional[str] = None
+    attempts: int = 0
 
 
-def input_node(state: AgentState) -> AgentState:
-    if state.get('history') is None:
-        state['history'] = []
+def input_node(state: AgentState) -> dict:
     # This node should only be used in CLI mode. In Streamlit, topic, tone, and audience are set by the UI.
-    # Remove input() and print() calls.
-    # Just return the state as is.
-    return state
+    # Nothing to update: the caller's input is already in the state.
+    return {}
 
 class Validator(BaseModel):
     response: str = Field("Topic, tone, target audience is valid for LinkedIn? if Yes then provide 'Valid', otherwise provide 'Invalid'", description="Response from the validator indicating if the post is suitable for LinkedIn.")
 
 # --- CACHED LLM HELPERS ---
-@st.cache_data(show_spinner="Validating topic, tone, and audience...")
+def token_writer():
+    """Stream writer of the running graph node, or ``None`` outside a graph run."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return None
+
+def emit_text(text: str):
+    """Send a finished piece of text down the same stream path as live tokens."""
+    writer = token_writer()
+    if writer:
+        writer({"event": "start"})
+        writer({"token": text})
+
+def sample_params(sample: int):
+    """Cache-key params and LLM kwargs for the ``sample``-th draw of the same prompt.
+
+    Sample 0 is the plain call. Retries get their own cache entry and a
+    slightly higher temperature so they don't return the rejected draft again.
+    """
+    if not sample:
+        return {}, {}
+    return {"sample": sample}, {"temperature": round(min(0.7 + 0.2 * sample, 1.5), 2)}
+
+def cached_llm_call(prompt, schema=None, field=None, stream=False, sample=0, task=None):
+    """Invoke the LLM through ``response_cache``; with ``schema``, return its ``field``
+    (or the whole object as a dict when ``field`` is None).
+
+    With ``stream=True`` inside a graph run, text is emitted on the ``custom``
+    stream as ``{"event": "start"}`` followed by ``{"token": ...}`` chunks. A
+    cache hit, or the answer of an identical request already in flight (see
+    ``state.gateway``), is replayed as a single chunk through the same path.
+    ``task`` selects the model when an ``LLMRouter`` is configured.
+    """
+    llm = get_llm(task)
+    response_cache = get_response_cache()
+    key_params, llm_kwargs = sample_params(sample)
+    key = cache_key(llm.model, prompt, schema, **key_params)
+    writer = token_writer() if stream else None
+    with metrics.llm_call(task, llm.model, sample, prompts.template_name(prompt)) as call:
+        cached = response_cache.get(key)
+        call.cache_hit = cached is not None
+        if cached is not None:
+            if writer:
+                emit_text(cached)
+            return cached
+        streamed = []
+
+        def upstream():
+            if schema is None and writer:
+                writer({"event": "start"})
+                result = ""
+                for chunk in llm.stream([HumanMessage(content=prompt)], **llm_kwargs):
+                    if chunk.content:
+                        writer({"token": chunk.content})
+                        streamed.append(True)
+                        result += chunk.content
+            elif schema is None:
+                result = llm.invoke([HumanMessage(content=prompt)], **llm_kwargs).content
+            else:
+                structured_llm = llm.with_structured_output(schema)
+                output = structured_llm.invoke([HumanMessage(content=prompt)], **llm_kwargs)
+                result = output.model_dump() if field is None else getattr(output, field)
+            response_cache.set(key, result)
+            return result
+
+        result, shared = get_gateway().call(key, llm.model, prompt, upstream, task=task,
+                                            usage=call.usage, started=lambda: bool(streamed))
+        if shared and writer:
+            emit_text(result)
+        return result
+
+# --- PROMPTS ---
+# Static instructions first, per-request fields last, so every call of a
+# template shares its prefix with the provider's prompt cache (see state.prompts).
+prompts.register(
+    "validator",
+    "You are a LinkedIn content expert. Review the topic, tone and target audience given at the end.\n"
+    "If the topic is professional, relevant, and the tone and audience are appropriate for LinkedIn, reply ONLY with 'Valid'. "
+    "Reply with 'Invalid' ONLY if there is a clear reason the post would be inappropriate for LinkedIn. "
+    "Do not provide any explanation, just reply with 'Valid' or 'Invalid'.",
+    'Topic: "{topic}"\nTone: "{tone}"\nTarget Audience: "{audience}"',
+)
+prompts.register(
+    "generate_post",
+    "You are a LinkedIn post generator. Create a post for the topic, tone and audience given at the end.\n\n"
+    "Requirements:\n"
+    "- Start with a strong hook to grab attention.\n"
+    "- Write a clear, concise, and engaging body that provides value to the audience.\n"
+    "- Maintain the given tone throughout.\n"
+    "- End with a call-to-action or thought-provoking question.\n"
+    "- Include relevant and trending hashtags (3-7).\n"
+    "- Ensure the post follows LinkedIn best practices for formatting and engagement.\n"
+    "- Avoid clichés and keep the language authentic.",
+    "Topic: {topic}\nTone: {tone}\nAudience: {audience}",
+)
+prompts.register(
+    "post_validation",
+    "You are a LinkedIn post validator. Analyze the topic, tone, target audience and draft post given at the end.\n"
+    "Your tasks:\n"
+    "- Determine if the post aligns with the topic and uses the specified tone.\n"
+    "- Ensure the post is appropriate for the target audience.\n"
+    "- Respond with 'Valid' if the post meets all criteria for LinkedIn suitability; otherwise, respond with 'Invalid'.",
+    'Topic: "{topic}"\nTone: "{tone}"\nTarget Audience: "{audience}"\nDraft Post: "{draft}"',
+)
+prompts.register(
+    "feedback_sentiment",
+    "You are a sentiment analysis expert. "
+    "Categorize the feedback given at the end as either positive or negative.\n"
+    "If the feedback suggests or requests any improvements, changes, or modifications to the current post, categorize it as 'negative'.\n"
+    "If the feedback indicates that the user does not want any improvements or changes, or is satisfied with the post as it is, categorize it as 'positive'.\n"
+    "Reply with only 'positive' or 'negative'.",
+    "Feedback: {feedback}",
+)
+prompts.register(
+    "collect_feedback",
+    "You are a LinkedIn post generator that generate posts based on user feedback.\n"
+    "Please analyze the feedback provided by the user, given at the end with the last draft, and suggest improvements to the last draft post.\n\n"
+    "Your task:\n"
+    "- Analyze the feedback and the last draft.\n"
+    "- Generate new post content that incorporates the feedback.\n"
+    "- Ensure the new post maintains the original topic, tone, and audience.",
+    "Topic: {topic}\nTone: {tone}\nAudience: {audience}\nFeedback: {feedback}\nLast Draft: {last_draft}",
+)
+prompts.register(
+    "edit_feedback",
+    "You are a LinkedIn post editor. Apply the user's feedback to the draft given at the end, whose lines are numbered.\n\n"
+    "Your task:\n"
+    "- If a few changes implement the feedback, set mode to 'edit' and list them as edits: 'replace' lines start..end with text, "
+    "'insert' text after line start (0 for the top), or 'delete' lines start..end. "
+    "Line numbers refer to the draft; do not repeat the numbers in text.\n"
+    "- If most of the post has to change, set mode to 'rewrite' and put the complete new post in post.\n"
+    "- Keep the original topic, tone, and audience.",
+    "Topic: {topic}\nTone: {tone}\nAudience: {audience}\nFeedback: {feedback}\nDraft:\n{numbered_draft}",
+)
+prompts.register(
+    "adapt_post",
+    "You are a LinkedIn post generator. Given at the end is a post written earlier for a closely related topic. "
+    "Adapt it into a post for the new topic, tone and audience.\n"
+    "Keep what still fits, change whatever is specific to the earlier topic, and keep the strong hook, "
+    "the call-to-action or question at the end, and 3-7 relevant hashtags.",
+    "Topic: {topic}\nTone: {tone}\nAudience: {audience}\nEarlier Topic: {prior_topic}\nEarlier Post: {prior_post}",
+)
+
+def validator_prompt(topic, tone, audience):
+    return prompts.render("validator", topic=topic, tone=tone, audience=audience)
+
+def generate_post_prompt(topic, tone, audience):
+    return prompts.render("generate_post", topic=topic, tone=tone, audience=audience)
+
+def post_validation_prompt(topic, tone, audience, draft):
+    return prompts.render("post_validation", topic=topic, tone=tone, audience=audience, draft=draft)
+
+def feedback_sentiment_prompt(feedback):
+    return prompts.render("feedback_sentiment", feedback=feedback)
+
+def collect_feedback_prompt(feedback, last_draft, topic, tone, audience):
+    return prompts.render("collect_feedback", feedback=feedback, last_draft=last_draft,
+                          topic=topic, tone=tone, audience=audience)
+
+def edit_feedback_prompt(feedback, last_draft, topic, tone, audience):
+    return prompts.render("edit_feedback", feedback=feedback, numbered_draft=number_lines(last_draft),
+                          topic=topic, tone=tone, audience=audience)
+
+def adapt_post_prompt(prior_post, prior_topic, topic, tone, audience):
+    return prompts.render("adapt_post", prior_post=prior_post, prior_topic=prior_topic,
+                          topic=topic, tone=tone, audience=audience)
+
+def variant_samples(attempt: int, variants=None) -> list:
+    """Sample indices of the variants of pass ``attempt``; distinct across passes."""
+    variants = variants or DRAFT_VARIANTS
+    return [attempt * variants + i for i in range(variants)]
+
 def cached_validator_llm(topic, tone, audience):
-    prompt = (
-        f"You are a LinkedIn content expert. Review the following:\n"
-        f"1. Topic: \"{topic}\"\n"
-        f"2. Tone: \"{tone}\"\n"
-        f"3. Target Audience: \"{audience}\"\n"
-        "If the topic is professional, relevant, and the tone and audience are appropriate for LinkedIn, reply ONLY with 'Valid'. "
-        "Reply with 'Invalid' ONLY if there is a clear reason the post would be inappropriate for LinkedIn. "
-        "Do not provide any explanation, just reply with 'Valid' or 'Invalid'."
-    )
-    return llm.invoke([HumanMessage(content=prompt)]).content
+    return cached_llm_call(validator_prompt(topic, tone, audience), task="validate")
+
+def generate_post_request(topic, tone, audience, attempt=0):
+    """``(post, prompt)`` for a first draft: a near-duplicate post to reuse as is,
+    or the prompt to run (adapting a similar earlier post when there is one).
+
+    Retries (``attempt > 0``) always generate from scratch, since the previous
+    draft for this topic was rejected.
+    """
+    index = get_semantic_index()
+    match = None
+    if index is not None and not attempt:
+        match = index.lookup(get_llm("generate").model, topic, tone, audience)
+    if match is None:
+        return None, generate_post_prompt(topic, tone, audience)
+    if match.score >= index.reuse_threshold:
+        logger.info("semantic cache: reusing the post for %r (%.2f)", match.topic, match.score)
+        return match.post, None
+    logger.info("semantic cache: adapting the post for %r (%.2f)", match.topic, match.score)
+    return None, adapt_post_prompt(match.post, match.topic, topic, tone, audience)
+
+def remember_post(topic, tone, audience, post):
+    """Index ``post`` for later near-duplicate requests; only posts that passed validation belong here."""
+    index = get_semantic_index()
+    if index is not None and post:
+        index.add(get_llm("generate").model, topic, tone, audience, post)
 
-@st.cache_data(show_spinner="Generating LinkedIn post...")
-def cached_generate_post_llm(topic, tone, audience):
-    prompt = f"""You are a LinkedIn post generator. Please create a post based on the following details:\n\n    - Topic: {topic}\n    - Tone: {tone}\n    - Audience: {audience}\n\n    Requirements:\n    - Start with a strong hook to grab attention.\n    - Write a clear, concise, and engaging body that provides value to these categories: {audience}.\n    - Maintain a {tone} tone throughout.\n    - End with a call-to-action or thought-provoking question.\n    - Include relevant and trending hashtags (3-7).\n    - Ensure the post follows LinkedIn best practices for formatting and engagement.\n    - Avoid clichés and keep the language authentic.\n    """
-    return llm.invoke([HumanMessage(content=prompt)]).content
+def cached_generate_post_llm(topic, tone, audience, attempt=0, stream=True):
+    post, prompt = generate_post_request(topic, tone, audience, attempt)
+    if post is not None:
+        if stream:
+            emit_text(post)
+        return post
+    return cached_llm_call(prompt, stream=stream, sample=attempt, task="generate")
 
-@st.cache_data(show_spinner="Validating generated post...")
 def cached_post_validation_llm(topic, tone, audience, draft):
-    prompt = f"""
-You are a LinkedIn post validator. Please analyze the following details:
-1. Topic: \"{topic}\"
-2. Tone: \"{tone}\"
-3. Target Audience: \"{audience}\"
-4. Draft Post: \"{draft}\"
-Your tasks:
-- Determine if the post aligns with the topic and uses the specified tone.
-- Ensure the post is appropriate for the target audience.
-- Respond with 'Valid' if the post meets all criteria for LinkedIn suitability; otherwise, respond with 'Invalid'.
-"""
-    structured_llm = llm.with_structured_output(PostValidator)
-    return structured_llm.invoke([HumanMessage(content=prompt)]).response
-
-@st.cache_data(show_spinner="Analyzing feedback sentiment...")
+    return cached_llm_call(post_validation_prompt(topic, tone, audience, draft), PostValidator, "response", task="validate")
+
 def cached_feedback_sentiment_llm(feedback):
-    prompt = (
-        "You are a sentiment analysis expert. "
-        "Categorize the following feedback as either positive or negative.\n"
-        "If the feedback suggests or requests any improvements, changes, or modifications to the current post, categorize it as 'negative'.\n"
-        "If the feedback indicates that the user does not want any improvements or changes, or is satisfied with the post as it is, categorize it as 'positive'.\n"
-        f"Feedback: {feedback}\n"
-        "Reply with only 'positive' or 'negative'."
-    )
-    structure_llm = llm.with_structured_output(FeedbackGrader)
-    return structure_llm.invoke([HumanMessage(content=prompt)]).sentiment
+    return cached_llm_call(feedback_sentiment_prompt(feedback), FeedbackGrader, "sentiment", task="sentiment")
+
+def feedback_sentiment(feedback):
+    """Classify feedback locally when confident; otherwise ask the LLM."""
+    return local_sentiment(feedback) or cached_feedback_sentiment_llm(feedback)
 
-@st.cache_data(show_spinner="Generating improved post based on feedback...")
 def cached_collect_feedback_llm(feedback, last_draft, topic, tone, audience):
-    prompt = f"""You are a LinkedIn post generator that generate posts based on user feedback.\n    Please analyze the feedback provided by the user and suggest improvements to the last draft post.\n\n    Feedback: {feedback}\n    Last Draft: {last_draft}\n\n    Your task:\n    - Analyze the feedback and the last draft.\n    - Generate new post content that incorporates the feedback.\n    - Ensure the new post maintains the original {topic}, {tone}, and {audience}.\n    """
-    return llm.invoke([HumanMessage(content=prompt)]).content
+    return cached_llm_call(collect_feedback_prompt(feedback, last_draft, topic, tone, audience), stream=True, task="rewrite")
 
-# --- NODES (replace LLM calls with cached helpers) ---
-def validator_node(state: AgentState) -> AgentState:
-    topic = state['topic']
-    tone = state['tone']
-    audience = state['audience']
+def cached_edit_feedback_llm(feedback, last_draft, topic, tone, audience):
+    return cached_llm_call(edit_feedback_prompt(feedback, last_draft, topic, tone, audience), PostEdits, task="rewrite")
+
+def edited_post(last_draft: str, result: dict) -> str:
+    """The post described by a ``PostEdits`` answer; ``EditError`` if it is unusable."""
+    if result.get('mode') == 'rewrite':
+        if not (result.get('post') or '').strip():
+            raise EditError("rewrite without a post")
+        return result['post']
+    return apply_edits(last_draft, result.get('edits') or [])
+
+def rewrite_post(feedback, last_draft, topic, tone, audience) -> str:
+    """The draft improved per ``feedback``, by line edits with ``REWRITE_MODE=edit``."""
+    if REWRITE_MODE == "edit":
+        try:
+            post = edited_post(last_draft, cached_edit_feedback_llm(feedback, last_draft, topic, tone, audience))
+        except EditError as error:
+            logger.info("edit rewrite unusable (%s); regenerating the post", error)
+        else:
+            emit_text(post)
+            return post
+    return cached_collect_feedback_llm(feedback, last_draft, topic, tone, audience)
+
+# --- STATE UPDATES (shared by the sync nodes and state.async_graph) ---
+# Each helper returns a partial update. ``history`` and ``drafts`` are
+# append-only channels, so they only ever carry the new messages/drafts.
+def merge_updates(*updates: dict) -> dict:
+    """Combine partial updates; ``history`` and ``drafts`` lists are concatenated."""
+    merged = {}
+    for update in updates:
+        for key, value in update.items():
+            if key in APPEND_FIELDS and key in merged:
+                merged[key] = merged[key] + value
+            else:
+                merged[key] = value
+    return merged
+
+def prompt_fields(state: AgentState):
+    """``(topic, tone, audience)`` formatted the way the prompts expect them.
+
+    Tone and audience are put in canonical order and the topic's whitespace is
+    collapsed, so reordered or re-spaced requests share prompts and cache entries.
+    """
+    topic = state.get('topic')
+    if isinstance(topic, str):
+        topic = " ".join(topic.split())
+    audience = canonical_labels(state.get('audience'))
     audience_str = ', '.join(audience) if isinstance(audience, list) else str(audience)
-    response_content = cached_validator_llm(topic, str(tone), audience_str)
-    print(f"[DEBUG] LLM raw response: {response_content}")
-    state['current_step'] = "validate_node"
-    state['history'].append(AIMessage(content=f"Validation Node: Response - {response_content}"))
+    return topic, str(canonical_labels(state.get('tone'))), audience_str
+
+def record_validation(state: AgentState, response_content: str) -> dict:
+    logger.debug("validator raw response: %s", response_content)
+    update = {
+        'current_step': "validate_node",
+        'history': [ai_message(f"Validation Node: Response - {response_content}")],
+    }
     result = response_content.strip().lower()
     if 'valid' in result:
-        state['validation'] = 'Valid'
+        update['validation'] = 'Valid'
     else:
-        print("[DEBUG] LLM did not return 'Valid', treating as 'Invalid'")
-        state['validation'] = 'Invalid'
-    print(f"[Current Step] {state['current_step']}")
-    return state
+        logger.info("validator did not return 'Valid', treating the topic as invalid")
+        update['validation'] = 'Invalid'
+    return update
+
+def record_draft(state: AgentState, post_content: str) -> dict:
+    return {
+        'drafts': [post_content],
+        'attempts': (state.get('attempts') or 0) + 1,
+        'user_id': str(uuid4()),
+        'current_step': "Generating Post",
+        'history': [ai_message(f"Generated Post: {post_content}", ORIGINAL)],
+    }
+
+def record_variants(state: AgentState, ranked: list) -> dict:
+    """Partial update for ranked ``Variant``s (best first).
+
+    ``drafts[-1]`` is the current draft everywhere (validation, rewrites, the
+    API), so the variants are appended worst to best. The chat shows the best
+    one first, followed by the alternatives.
+    """
+    best, alternatives = ranked[0], ranked[1:]
+    update = merge_updates(record_draft(state, best.post), {
+        'history': [ai_message(f"Alternative draft {i}: {variant.post}", VARIANT)
+                    for i, variant in enumerate(alternatives, start=2)],
+    })
+    update['drafts'] = [variant.post for variant in reversed(ranked)]
+    return update
+
+def check_post_validation_inputs(state: AgentState):
+    if not all([state.get('topic'), state.get('tone'), state.get('audience'), state.get('drafts')]):
+        raise ValueError("Missing user information for post validation!")
+
+def record_post_validation(state: AgentState, response: str) -> dict:
+    update = {
+        'current_step': "post_validation",
+        'on': response,
+        'history': [ai_message(f"Post Validation Node: Validation result - {response}", VALIDATION)],
+    }
+    logger.debug("post validation: %s", response)
+    if response == "Valid":
+        # Speculative drafts, rejected drafts and losing variants never reach the index.
+        remember_post(*prompt_fields(state), current_draft(state))
+    if retry_budget_spent({**state, **update}):
+        update['history'].append(ai_message(
+            f"Post Validation Node: No draft passed validation after {state['attempts']} attempts. "
+            "Please review the latest draft and tell me what to change.",
+            VALIDATION,
+        ))
+    return update
+
+def retry_budget_spent(state: AgentState) -> bool:
+    return state['on'] != "Valid" and (state.get('attempts') or 0) >= MAX_GENERATION_ATTEMPTS
+
+def check_feedback_inputs(state: AgentState):
+    if not state.get('drafts'):
+        raise ValueError("No drafts found for user!")
+
+def record_feedback(state: AgentState, human_feedback, sentiment: str) -> dict:
+    if sentiment == "positive" and human_feedback:
+        message = ai_message(f"Positive feedback received: {human_feedback}", FEEDBACK_USER)
+    elif sentiment == "negative" and human_feedback:
+        message = ai_message(f"Negative feedback received: {human_feedback}", FEEDBACK_USER)
+    else:
+        message = ai_message(f"Feedback received: {human_feedback}")
+    return {'feedback': human_feedback, 'analysis': sentiment, 'history': [message]}
+
+def current_draft(state: AgentState) -> str:
+    """``drafts[-1]`` as a full post; rewrites are stored as diffs (see ``state.edits``)."""
+    return latest_draft(state.get('drafts'))
+
+def record_rewrite(state: AgentState, improved_post: str) -> dict:
+    return {
+        'drafts': [encode_version(current_draft(state), improved_post)],
+        'current_step': "Collecting feedback from human",
+        'history': [ai_message(f"Generated post based on feedback: {improved_post}", FEEDBACK)],
+        'best_post': improved_post,
+    }
+
+# --- NODES (replace LLM calls with cached helpers) ---
+def validator_node(state: AgentState) -> dict:
+    topic, tone, audience_str = prompt_fields(state)
+    response_content = cached_validator_llm(topic, tone, audience_str)
+    return record_validation(state, response_content)
 
 def validation_router(state: AgentState) -> str:
-    print(f"[DEBUG] validation_router: validation status is {state['validation']}")
+    logger.debug("validation_router: validation = %s", state['validation'])
     if state['validation'] == 'Valid':
         return "generate_post_node"
     return END
 
-def generate_post_node(state: AgentState) -> AgentState:
-    if state.get('drafts') is None:
-        state['drafts'] = []
-    if state.get('history') is None:
-        state['history'] = []
-    topic = state['topic']
-    tone = state['tone']
-    audience = state['audience']
-    audience_str = ', '.join(audience) if isinstance(audience, list) else str(audience)
-    post_content = cached_generate_post_llm(topic, str(tone), audience_str)
-    user_id = str(uuid4())
-    state['drafts'].append(post_content)
-    state['user_id'] = user_id
-    state['current_step'] = "Generating Post"
-    state['history'].append(AIMessage(content=f"Generated Post: {post_content}"))
-    return state
+def generate_post_node(state: AgentState) -> dict:
+    topic, tone, audience_str = prompt_fields(state)
+    if DRAFT_VARIANTS > 1:
+        return record_variants(state, generate_variants(topic, tone, audience_str, state.get('attempts') or 0))
+    post_content = cached_generate_post_llm(topic, tone, audience_str, state.get('attempts') or 0)
+    return record_draft(state, post_content)
+
+def draft_and_validate(topic, tone, audience, sample, stream):
+    post = cached_generate_post_llm(topic, tone, audience, sample, stream=stream)
+    return post, cached_post_validation_llm(topic, tone, audience, post)
+
+def generate_variants(topic, tone, audience, attempt=0) -> list:
+    """Generate and validate ``DRAFT_VARIANTS`` drafts in parallel; return them ranked.
+
+    Only the first variant streams tokens. post_validation_node then re-checks
+    the chosen draft from the response cache without another LLM call.
+    """
+    samples = variant_samples(attempt)
+    with ThreadPoolExecutor(max_workers=len(samples)) as pool:
+        futures = [
+            # Each variant runs in a copy of the node's context (stream writer, run config).
+            pool.submit(contextvars.copy_context().run, draft_and_validate, topic, tone, audience, sample, i == 0)
+            for i, sample in enumerate(samples)
+        ]
+        results = [future.result() for future in futures]
+    return rank_variants([post for post, _ in results], [validation for _, validation in results])
 
 class PostValidator(BaseModel):
     response: str = Field(
@@ -146,119 +565,277 @@ class PostValidator(BaseModel):
         description="Response from the validator indicating if the post is suitable for LinkedIn."
     )
 
-def post_validation_node(state: AgentState) -> AgentState:
-    if state.get('history') is None:
-        state['history'] = []
-    topic = state.get('topic')
-    tone = state.get('tone')
-    audience = state.get('audience')
-    drafts = state.get('drafts')
-    if not all([topic, tone, audience, drafts]):
-        raise ValueError("Missing user information for post validation!")
-    audience_str = ', '.join(audience) if isinstance(audience, list) else str(audience)
-    response = cached_post_validation_llm(topic, str(tone), audience_str, drafts[-1])
-    state['current_step'] = "post_validation"
-    print(f"Validating Post: {state['current_step']}")
-    state['on'] = response
-    state['history'].append(AIMessage(content=f"Post Validation Node: Validation result - {response}"))
-    return state
+def post_validation_node(state: AgentState) -> dict:
+    check_post_validation_inputs(state)
+    topic, tone, audience_str = prompt_fields(state)
+    response = cached_post_validation_llm(topic, tone, audience_str, current_draft(state))
+    return record_post_validation(state, response)
 
 def on_validation_router(state: AgentState) -> str:
-    print(f"[DEBUG] on_validation_router: on = {state['on']}")
-    if state['on'] == "Valid":
+    logger.debug("on_validation_router: on = %s", state['on'])
+    if state['on'] == "Valid" or retry_budget_spent(state):
         return "human_feedback_node"
     return "generate_post_node"
 
 
 class FeedbackGrader(BaseModel):
     sentiment: str = Field(..., description="The sentiment category of the feedback (positive, negative).")
-def human_feedback_node(state: AgentState) -> AgentState:
-    if state.get('history') is None:
-        state['history'] = []
-    drafts = state['drafts']
-    user_id = state['user_id']
-    if not drafts:
-        raise ValueError("No drafts found for user!")
+
+class LineEdit(BaseModel):
+    op: str = Field(..., description="'replace', 'insert' or 'delete'.")
+    start: int = Field(..., description="First line number to replace or delete; for 'insert', the line to insert after (0 for the top).")
+    end: int = Field(0, description="Last line number to replace or delete (same as start for one line); unused for 'insert'.")
+    text: str = Field("", description="New text for 'replace' and 'insert'; may span several lines.")
+
+class PostEdits(BaseModel):
+    mode: str = Field(..., description="'edit' when a few line edits implement the feedback, 'rewrite' when most of the post has to change.")
+    edits: List[LineEdit] = Field(default_factory=list, description="The edits for mode 'edit'.")
+    post: str = Field("", description="The complete new post, only for mode 'rewrite'.")
+
+def human_feedback_node(state: AgentState) -> dict:
+    check_feedback_inputs(state)
     human_feedback = state.get('feedback', '')
-    sentiment = cached_feedback_sentiment_llm(human_feedback)
-    state['feedback'] = human_feedback
-    state['analysis'] = sentiment
-    if sentiment == "positive" and human_feedback:
-        state['history'].append(
-            AIMessage(content=f"Positive feedback received: {human_feedback}")
-        )
-    elif sentiment == "negative" and human_feedback:
-        state['history'].append(
-            AIMessage(content=f"Negative feedback received: {human_feedback}")
-        )
-    else:
-        state['history'].append(
-            AIMessage(content=f"Feedback received: {human_feedback}")
-        )
-    return state
+    sentiment = feedback_sentiment(human_feedback)
+    return record_feedback(state, human_feedback, sentiment)
 
 def sentiment_routing(state: AgentState) -> str:
-    print(f"[DEBUG] sentiment_routing: analysis = {state['analysis']}")
+    logger.debug("sentiment_routing: analysis = %s", state['analysis'])
     if state['analysis'] == 'positive':
         return END
     return "collect_feedback_node"
 
-def collect_feedback_node(state: AgentState) -> AgentState:
-    if state.get('history') is None:
-        state['history'] = []
-    feedback = state['feedback']
-    draft = state['drafts']
-    topic = state.get('topic')
-    tone = state.get('tone')
-    audience = state.get('audience')
-    last_draft = draft[-1]
-    audience_str = ', '.join(audience) if isinstance(audience, list) else str(audience)
-    improved_post = cached_collect_feedback_llm(feedback, last_draft, topic, str(tone), audience_str)
-    state['current_step'] = "Collecting feedback from human"
-    state['history'].append(
-        AIMessage(content=f"Generated post based on feedback: {improved_post}")
-    )
-    state['best_post'] = improved_post
-    return state
+def collect_feedback_node(state: AgentState) -> dict:
+    topic, tone, audience_str = prompt_fields(state)
+    improved_post = rewrite_post(state['feedback'], current_draft(state), topic, tone, audience_str)
+    return record_rewrite(state, improved_post)
 
-def post(state: AgentState) -> None:
+def post(state: AgentState) -> dict:
     best_post  = state['best_post']
     # Instead of print, append to history
-    state['history'].append(AIMessage(content="Post sent to LinkedIn (simulated). PING ==> PONG"))
-    return None
+    return {'history': [ai_message("Post sent to LinkedIn (simulated). PING ==> PONG")]}
 # --------------------------------------
 
-graph = StateGraph(AgentState)
-
-# Add nodes
-graph.add_node("input_node", input_node)
-graph.add_node("validator_node", validator_node)
-graph.add_node("generate_post_node", generate_post_node)
-graph.add_node("post_validation_node", post_validation_node)
-graph.add_node("human_feedback_node", human_feedback_node)
-graph.add_node("collect_feedback_node", collect_feedback_node)
-graph.add_node("post", post)
-
-# Set entry point
-graph.set_entry_point("input_node")
-
-# Add edges between nodes
-graph.add_edge("input_node", "validator_node")
-graph.add_conditional_edges("validator_node", validation_router, {
-    "generate_post_node": "generate_post_node",
-    END: END
-})  # validation_router returns next node name
-graph.add_edge("generate_post_node", "post_validation_node")
-graph.add_conditional_edges("post_validation_node", on_validation_router, {
-    "human_feedback_node": "human_feedback_node",
-    "generate_post_node": "generate_post_node"
-})  # post_validation_router returns next node name
-graph.add_conditional_edges("human_feedback_node", sentiment_routing, {
-    END: END,
-    "collect_feedback_node": "collect_feedback_node"
-})
-graph.add_edge("collect_feedback_node", "post")
-graph.add_edge("post", END)  # After collecting feedback, go to post
-
-
-app = graph.compile(checkpointer= saver)
\ No newline at end of file
+# --- FUSED PIPELINE (PIPELINE_MODE=fused) ---
+class FusedPost(BaseModel):
+    topic_valid: str = Field(..., description="'Valid' if the topic, tone and audience suit LinkedIn, otherwise 'Invalid'.")
+    post: str = Field(..., description="The LinkedIn post. Empty when topic_valid is 'Invalid'.")
+    post_valid: str = Field(..., description="'Valid' if the post matches the topic, tone and audience, otherwise 'Invalid'.")
+
+class FusedRewrite(BaseModel):
+    sentiment: str = Field(..., description="'positive' if the user is satisfied with the post, 'negative' if they ask for changes.")
+    post: str = Field(..., description="The improved post for 'negative' feedback; empty for 'positive'.")
+
+prompts.register(
+    "fused_generate",
+    "You are a LinkedIn content expert. Do all three steps in one answer, for the topic, tone and target audience given at the end.\n"
+    "1. Decide whether the topic, tone and target audience are appropriate for LinkedIn. "
+    "Set topic_valid to 'Invalid' ONLY if there is a clear reason the post would be inappropriate, otherwise 'Valid'.\n"
+    "2. If valid, write the post in `post`:\n"
+    "    - Start with a strong hook to grab attention.\n"
+    "    - Write a clear, concise, and engaging body that provides value to the audience.\n"
+    "    - Maintain the given tone throughout.\n"
+    "    - End with a call-to-action or thought-provoking question.\n"
+    "    - Include relevant and trending hashtags (3-7).\n"
+    "    - Ensure the post follows LinkedIn best practices for formatting and engagement.\n"
+    "    - Avoid clichés and keep the language authentic.\n"
+    "3. Review your post: set post_valid to 'Valid' if it aligns with the topic, uses the specified tone "
+    "and suits the audience, otherwise 'Invalid'.",
+    'Topic: "{topic}"\nTone: "{tone}"\nTarget Audience: "{audience}"',
+)
+prompts.register(
+    "fused_feedback",
+    "You are a LinkedIn post generator that revises posts based on user feedback. "
+    "The feedback and the last draft are given at the end.\n\n"
+    "Set sentiment to 'negative' if the feedback suggests or requests any improvements, changes, or modifications, "
+    "and to 'positive' if the user is satisfied with the post as it is.\n"
+    "If negative, write the new post in `post`, incorporating the feedback and keeping the original "
+    "topic, tone, and audience. If positive, leave `post` empty.",
+    "Topic: {topic}\nTone: {tone}\nAudience: {audience}\nFeedback: {feedback}\nLast Draft: {last_draft}",
+)
+
+def fused_generate_prompt(topic, tone, audience):
+    return prompts.render("fused_generate", topic=topic, tone=tone, audience=audience)
+
+def fused_feedback_prompt(feedback, last_draft, topic, tone, audience):
+    return prompts.render("fused_feedback", feedback=feedback, last_draft=last_draft,
+                          topic=topic, tone=tone, audience=audience)
+
+def cached_fused_generate_llm(topic, tone, audience, attempt=0):
+    return cached_llm_call(fused_generate_prompt(topic, tone, audience), FusedPost, sample=attempt, task="generate")
+
+def cached_fused_feedback_llm(feedback, last_draft, topic, tone, audience):
+    return cached_llm_call(fused_feedback_prompt(feedback, last_draft, topic, tone, audience), FusedRewrite, task="rewrite")
+
+def fused_generate_node(state: AgentState) -> dict:
+    attempt = state.get('attempts') or 0
+    topic, tone, audience_str = prompt_fields(state)
+    result = cached_fused_generate_llm(topic, tone, audience_str, attempt)
+    update = {}
+    if attempt == 0:
+        update = record_validation(state, result['topic_valid'])
+        if update['validation'] != 'Valid':
+            return update
+    emit_text(result['post'])
+    update = merge_updates(update, record_draft(state, result['post']))
+    return merge_updates(update, record_post_validation({**state, **update}, result['post_valid']))
+
+def fused_router(state: AgentState) -> str:
+    if state['validation'] != 'Valid':
+        return END
+    return on_validation_router(state)
+
+def fused_feedback_node(state: AgentState) -> dict:
+    check_feedback_inputs(state)
+    human_feedback = state.get('feedback', '')
+    if local_sentiment(human_feedback) == 'positive':
+        # Approval needs no rewrite, so the fused call can be skipped entirely.
+        return record_feedback(state, human_feedback, 'positive')
+    topic, tone, audience_str = prompt_fields(state)
+    result = cached_fused_feedback_llm(human_feedback, current_draft(state), topic, tone, audience_str)
+    update = record_feedback(state, human_feedback, result['sentiment'])
+    if result['sentiment'] != 'positive':
+        emit_text(result['post'])
+        update = merge_updates(update, record_rewrite(state, result['post']))
+    return update
+
+def build_fused_graph() -> StateGraph:
+    """Two LLM calls per post instead of three, plus one per feedback turn instead of two.
+
+    Node names match the multi-call graph so the interrupt and feedback
+    resume logic work unchanged.
+    """
+    graph = StateGraph(AgentState)
+    graph.add_node("input_node", metrics.instrument_node("input_node", input_node))
+    graph.add_node("generate_post_node", metrics.instrument_node("generate_post_node", fused_generate_node))
+    graph.add_node("human_feedback_node", metrics.instrument_node("human_feedback_node", fused_feedback_node))
+    graph.add_node("post", metrics.instrument_node("post", post))
+    graph.set_entry_point("input_node")
+    graph.add_edge("input_node", "generate_post_node")
+    graph.add_conditional_edges("generate_post_node", fused_router, {
+        "human_feedback_node": "human_feedback_node",
+        "generate_post_node": "generate_post_node",
+        END: END
+    })
+    graph.add_conditional_edges("human_feedback_node", sentiment_routing, {
+        END: END,
+        "collect_feedback_node": "post"
+    })  # the rewrite already happened inside human_feedback_node
+    graph.add_edge("post", END)
+    return graph
+
+def build_graph(nodes: dict) -> StateGraph:
+    """Wire the LinkedIn graph; ``nodes`` maps node names to sync or async callables."""
+    graph = StateGraph(AgentState)
+
+    # Add nodes
+    for name, node in nodes.items():
+        graph.add_node(name, metrics.instrument_node(name, node))
+
+    # Set entry point
+    graph.set_entry_point("input_node")
+
+    # Add edges between nodes
+    graph.add_edge("input_node", "validator_node")
+    graph.add_conditional_edges("validator_node", validation_router, {
+        "generate_post_node": "generate_post_node",
+        END: END
+    })  # validation_router returns next node name
+    graph.add_edge("generate_post_node", "post_validation_node")
+    graph.add_conditional_edges("post_validation_node", on_validation_router, {
+        "human_feedback_node": "human_feedback_node",
+        "generate_post_node": "generate_post_node"
+    })  # post_validation_router returns next node name
+    graph.add_conditional_edges("human_feedback_node", sentiment_routing, {
+        END: END,
+        "collect_feedback_node": "collect_feedback_node"
+    })
+    graph.add_edge("collect_feedback_node", "post")
+    graph.add_edge("post", END)  # After collecting feedback, go to post
+    return graph
+
+
+GRAPH_NODES = {
+    "input_node": input_node,
+    "validator_node": validator_node,
+    "generate_post_node": generate_post_node,
+    "post_validation_node": post_validation_node,
+    "human_feedback_node": human_feedback_node,
+    "collect_feedback_node": collect_feedback_node,
+    "post": post,
+}
+
+# Pause before feedback so each feedback turn resumes from the checkpoint
+# instead of re-running validation and generation.
+INTERRUPT_BEFORE = ["human_feedback_node"]
+
+def get_graph() -> StateGraph:
+    """The uncompiled graph for ``PIPELINE_MODE``."""
+    global _graph
+    if _graph is None:
+        with _init_lock:
+            if _graph is None:
+                _graph = build_fused_graph() if PIPELINE_MODE == "fused" else build_graph(GRAPH_NODES)
+    return _graph
+
+def get_app():
+    """The graph compiled with the shared checkpointer, built on first use."""
+    global _app
+    if _app is None:
+        with _init_lock:
+            if _app is None:
+                _app = get_graph().compile(checkpointer= get_checkpointer(), interrupt_before=INTERRUPT_BEFORE)
+    return _app
+
+
+def feedback_turn_input(state: AgentState, config: dict, graph_app=None, new_messages=None):
+    """Prepare the saved thread for a feedback turn and return the graph input.
+
+    Returns ``None`` (resume from the checkpoint) when there is a draft to give
+    feedback on, so only the sentiment and rewrite nodes run. A thread that
+    never produced a draft is replayed from ``input_node`` with ``state``.
+    Callers that don't hold the transcript pass the user's ``new_messages``
+    instead of a full ``state['history']``.
+    """
+    graph_app = graph_app or get_app()
+    snapshot = graph_app.get_state(config)
+    if new_messages is None:
+        # ``state['history']`` is the saved transcript plus the user's new
+        # messages; only the new ones are appended to the thread.
+        new_messages = state['history'][len(snapshot.values.get('history') or []):]
+    if not snapshot.values.get('drafts'):
+        return {**state, 'history': new_messages, 'drafts': []}
+    update = {'feedback': state.get('feedback'), 'history': new_messages}
+    if "human_feedback_node" in snapshot.next:
+        graph_app.update_state(config, update)
+    else:
+        # The previous turn already finished; re-enter through the router in
+        # front of human_feedback_node so the graph continues there.
+        as_node = "post_validation_node" if "post_validation_node" in graph_app.nodes else "generate_post_node"
+        graph_app.update_state(config, update, as_node=as_node)
+    return None
+
+
+def run_graph(graph_input, config: dict, on_token=None, on_step=None) -> AgentState:
+    """Run the graph to its next pause and return the resulting state.
+
+    With ``on_token`` or ``on_step`` the graph is driven through
+    ``app.stream``: ``on_token`` receives the text streamed so far by the
+    generating node, ``on_step`` each new ``current_step``.
+    """
+    app = get_app()
+    with metrics.graph_run("sync"):
+        if on_token is None and on_step is None:
+            return app.invoke(graph_input, config)
+        result = None
+        text = ""
+        for mode, chunk in app.stream(graph_input, config, stream_mode=["custom", "values"]):
+            if mode == "values":
+                if on_step and chunk.get("current_step") != (result or {}).get("current_step"):
+                    on_step(chunk.get("current_step"))
+                result = chunk
+            elif chunk.get("event") == "start":
+                text = ""
+            elif "token" in chunk and on_token:
+                text += chunk["token"]
+                on_token(text)
+        return result
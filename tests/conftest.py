@@ -0,0 +1,10 @@
+"""Run the suite offline: the fake LLM and throwaway databases, never the real ones."""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="viral-post-tests-")
+os.environ.setdefault("GOOGLE_API_KEY", "offline-test")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_BACKEND", "none")
+os.environ.setdefault("CHECKPOINT_DB", os.path.join(_tmp, "checkpoints.sqlite"))
+os.environ.setdefault("JOBS_DB", os.path.join(_tmp, "jobs.sqlite"))
@@ -0,0 +1,16 @@
+import asyncio
+
+import httpx
+
+from state.api import app
+
+
+def test_concurrent_creates_of_one_thread_id_run_once():
+    body = {"topic": "AI in hiring", "tone": "professional", "audience": "developers", "thread_id": "dup"}
+
+    async def create_three():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*[client.post("/threads", json=body) for _ in range(3)])
+
+    responses = asyncio.run(create_three())
+    assert sorted(response.status_code for response in responses) == [200, 409, 409]
@@ -0,0 +1,36 @@
+import json
+import logging
+
+from state import batch
+
+
+def jobs(*ids):
+    return [{"id": job_id, "topic": f"Topic {job_id}", "tone": [], "audience": []} for job_id in ids]
+
+
+def fake_run_job(job, max_retries=5):
+    return {"id": job["id"], "topic": job["topic"], "status": "ok", "elapsed": 0.0}
+
+
+def test_resume_reruns_a_row_cut_off_mid_line(tmp_path, monkeypatch, caplog):
+    output = tmp_path / "drafts.jsonl"
+    output.write_text(
+        json.dumps({"id": "a", "status": "ok"}) + "\n"
+        + json.dumps({"id": "b", "status": "error"}) + "\n"
+        + '{"id": "c", "status": "o',  # the crash cut this row off
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(batch, "run_job", fake_run_job)
+
+    with caplog.at_level(logging.WARNING, logger="state.batch"):
+        assert batch.finished_ids(str(output)) == {"a"}
+    assert "drafts.jsonl:3" in caplog.text
+
+    assert batch.run_batch(jobs("a", "b", "c"), str(output), concurrency=1) == 2
+    assert batch.finished_ids(str(output)) == {"a", "b", "c"}
+    assert batch.run_batch(jobs("a", "b", "c"), str(output)) == 0
+
+
+def test_missing_output_means_nothing_is_done(tmp_path):
+    assert batch.finished_ids(str(tmp_path / "none.jsonl")) == set()
+    assert not batch.ends_mid_line(str(tmp_path / "none.jsonl"))
@@ -0,0 +1,31 @@
+from state.cache import SqliteResponseCache, cache_key
+
+
+def test_cache_key_keeps_inner_whitespace():
+    assert cache_key("m", "  Write a post\n") == cache_key("m", "Write a post\n ")
+    assert cache_key("m", "Line one\n\nLine two") != cache_key("m", "Line one Line two")
+
+
+def stored_hits(cache, key):
+    with cache.pool.connection() as conn:
+        return conn.execute("SELECT hits FROM llm_cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    cache = SqliteResponseCache(str(tmp_path / "cache.sqlite"), touch_interval=3600)
+    cache.set("k", {"text": "post"})
+    for _ in range(5):
+        assert cache.get("k") == {"text": "post"}
+    assert stored_hits(cache, "k") == 0
+    assert cache.stats()["hits"] == 5
+    assert stored_hits(cache, "k") == 5
+
+
+def test_eviction_uses_recency_of_unwritten_hits(tmp_path):
+    cache = SqliteResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2, touch_interval=3600)
+    cache.set("old", 1)
+    cache.set("new", 2)
+    cache.get("old")
+    cache.set("newest", 3)
+    assert cache.get("old") == 1
+    assert cache.get("new") is None
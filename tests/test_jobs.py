@@ -0,0 +1,44 @@
+import sqlite3
+import threading
+
+import pytest
+
+from state.jobs import DONE, FAILED, JobActive, JobRunner, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def config(thread_id="t1"):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_submit_is_rejected_while_the_thread_has_an_active_job(store):
+    release = threading.Event()
+    runner = JobRunner(store, lambda *args: release.wait(5))
+    first = runner.submit(None, config())
+    with pytest.raises(JobActive) as busy:
+        runner.submit(None, config())
+    assert busy.value.job_id == first
+    assert runner.submit(None, config("t2"))  # other threads are not blocked
+    release.set()
+    runner.shutdown()
+    assert store.get(first)["status"] == DONE
+    assert runner.active("t1") is None
+
+
+def test_job_fails_when_it_cannot_be_marked_running(store, monkeypatch):
+    runner = JobRunner(store, lambda *args: None)
+    update = store.update
+
+    def busy_update(job_id, **fields):
+        if fields.get("status") == "running":
+            raise sqlite3.OperationalError("database is locked")
+        update(job_id, **fields)
+
+    monkeypatch.setattr(store, "update", busy_update)
+    job_id = runner.submit(None, config())
+    runner.shutdown()
+    assert store.get(job_id)["status"] == FAILED
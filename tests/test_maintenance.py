@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+import state.state as core
+from state import maintenance
+from state.cache import ResponseCache
+from state.checkpoint import PooledSqliteSaver, SqliteConnectionPool, new_thread_config, serde_from_env
+from state.fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def session(tmp_path):
+    core.set_llm(FakeChatModel())
+    core.set_response_cache(ResponseCache())
+    saver = PooledSqliteSaver(SqliteConnectionPool(str(tmp_path / "checkpoints.sqlite")), serde=serde_from_env())
+    graph_app = core.get_graph().compile(checkpointer=saver, interrupt_before=core.INTERRUPT_BEFORE)
+    config = new_thread_config()
+    state = core.AgentState(
+        user_id="", topic="Growing a remote team", tone=["professional"], audience=["managers"],
+        drafts=[], best_post=None, feedback=None, history=[], current_step=None,
+        validation=None, on="", analysis="",
+    )
+    graph_app.invoke(state, config)
+    yield saver, graph_app, config
+    saver.pool.close()
+
+
+def feedback_turn(graph_app, config, text):
+    state = graph_app.get_state(config).values
+    state["history"].append(HumanMessage(content=text))
+    state["feedback"] = text
+    graph_app.invoke(core.feedback_turn_input(state, config, graph_app), config)
+
+
+def checkpoint_count(saver, config):
+    with saver.cursor(transaction=False) as cur:
+        cur.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (config["configurable"]["thread_id"],))
+        return cur.fetchone()[0]
+
+
+def test_prune_keeps_thread_state(session):
+    saver, graph_app, config = session
+    for turn in range(4):
+        feedback_turn(graph_app, config, f"Change #{turn}: make the hook shorter.")
+    before = graph_app.get_state(config).values
+
+    assert maintenance.prune(saver, keep=3) > 0
+    assert checkpoint_count(saver, config) == 3
+    after = graph_app.get_state(config).values
+    assert after["history"] == before["history"]
+    assert after["drafts"] == before["drafts"]
+
+    feedback_turn(graph_app, config, "Change again: add a question at the end.")
+    assert len(graph_app.get_state(config).values["history"]) > len(before["history"])
+
+
+def test_prune_does_not_lose_a_turn_written_while_it_runs(session, monkeypatch):
+    saver, graph_app, config = session
+    for turn in range(3):
+        feedback_turn(graph_app, config, f"Change #{turn}: make the hook shorter.")
+    before = graph_app.get_state(config).values["history"]
+    compact = maintenance.compact
+    writer = threading.Thread(target=feedback_turn, args=(graph_app, config, "Change it while pruning."))
+
+    def compact_while_a_session_writes(*args):
+        writer.start()
+        time.sleep(0.3)  # the session tries to commit between the scan and the deletes
+        compact(*args)
+
+    monkeypatch.setattr(maintenance, "compact", compact_while_a_session_writes)
+    maintenance.prune(saver, keep=2)
+    writer.join()
+
+    history = graph_app.get_state(config).values["history"]
+    assert history[:len(before)] == before
+    assert "Change it while pruning." in [message.content for message in history]
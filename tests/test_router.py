@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from state.router import LLMRouter, Route
+
+
+class StreamingModel:
+    def __init__(self, name, first_token):
+        self.name = name
+        self.first_token = first_token
+
+    def stream(self, messages):
+        time.sleep(self.first_token)
+        yield from (f"{self.name}{i}" for i in range(3))
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.first_token)
+        for i in range(3):
+            yield f"{self.name}{i}"
+
+
+def warmed_router(**kwargs):
+    primary = Route("primary", StreamingModel("p", 0.01))
+    router = LLMRouter({"default": [primary, Route("backup", StreamingModel("b", 0))]},
+                       timeout=5, hedge_min_samples=3, **kwargs)
+    for _ in range(3):
+        list(router.for_task().stream([]))
+    return router, primary
+
+
+def test_stalled_stream_fails_over_at_its_first_token_deadline():
+    router, primary = warmed_router()
+    primary._model = StreamingModel("p", 2)
+    start = time.perf_counter()
+    assert list(router.for_task().stream([])) == ["b0", "b1", "b2"]
+    assert time.perf_counter() - start < 1
+
+
+def test_hedged_stream_keeps_the_first_model_to_answer():
+    router, primary = warmed_router(hedge=True)
+    router.routes["default"][1]._model = StreamingModel("b", 2)
+    primary._model = StreamingModel("p", 0.1)
+    assert list(router.for_task().stream([])) == ["p0", "p1", "p2"]
+
+
+def test_stalled_async_stream_fails_over():
+    router, primary = warmed_router()
+    primary._model = StreamingModel("p", 2)
+
+    async def collect():
+        return [chunk async for chunk in router.for_task().astream([])]
+
+    start = time.perf_counter()
+    assert asyncio.run(collect()) == ["b0", "b1", "b2"]
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,39 @@
+import pytest
+
+from state.semantic_cache import SemanticPostIndex
+
+BUCKET = ("model", "professional", "developers")
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SemanticPostIndex(str(tmp_path / "semantic.sqlite"))
+
+
+def lookup(index, topic):
+    model, tone, audience = BUCKET
+    return index.lookup(model, topic, tone, audience)
+
+
+def add(index, topic, post):
+    model, tone, audience = BUCKET
+    index.add(model, topic, tone, audience, post)
+
+
+@pytest.mark.parametrize("indexed, requested", [
+    ("Humans vs AI", "Humans and AI"),
+    ("Humans and AI", "Humans vs AI"),
+    ("Why remote work fails", "How remote work fails"),
+    ("What is leadership", "Leadership"),
+])
+def test_contrast_and_question_words_block_reuse(index, indexed, requested):
+    add(index, indexed, "an earlier post")
+    match = lookup(index, requested)
+    assert match is None or match.score < index.reuse_threshold
+
+
+def test_filler_words_still_match(index):
+    add(index, "AI in hiring", "an earlier post")
+    match = lookup(index, "AI for hiring")
+    assert match is not None and match.score >= index.reuse_threshold
+    assert match.post == "an earlier post"
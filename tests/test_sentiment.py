@@ -0,0 +1,26 @@
+import pytest
+
+from state.sentiment import UNSURE, classify, coverage, local_sentiment
+
+
+@pytest.mark.parametrize("text", ["I hate it", "this is terrible", "no", "bad", "this sucks",
+                                  "wrong audience", "redo", "cringe"])
+def test_short_negative_feedback_is_never_confidently_positive(text):
+    assert local_sentiment(text) in (None, "negative")
+
+
+@pytest.mark.parametrize("text", ["redo", "cringe", "zzxq", "brrr wibble"])
+def test_unknown_words_go_to_the_llm(text):
+    assert coverage(text) < 0.5
+    assert classify(text)[1] == UNSURE
+    assert local_sentiment(text) is None
+
+
+@pytest.mark.parametrize("text, label", [
+    ("this is terrible", "negative"),
+    ("make it shorter", "negative"),
+    ("no more changes needed", "positive"),
+    ("looks good", "positive"),
+])
+def test_clear_feedback_is_decided_locally(text, label):
+    assert local_sentiment(text) == label